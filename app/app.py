@@ -1,20 +1,36 @@
+import click
 from flask import Flask
-from .config import Config
-from .extensions import db, login_manager, migrate
-from .commands import create_admin, init_db
-from .database import init_database
+from .config import Config, json_config_version, refresh_config_if_changed
+from .extensions import db, login_manager, init_migrate
+from .commands import create_admin, init_db, dispatch_outbox, check_query_plans_command, rescan_files
+from .commands import vendor_assets_command, build_assets_command, archive_events_command
 import os
-import logging
 
 def create_app():
-    """Create and configure an instance of the Flask application."""
+    """
+    Create and configure an instance of the Flask application.
+
+    Nothing here touches the database, so every gunicorn worker starts quickly;
+    the schema and the admin user are set up once by ``init_migrations.py`` (or
+    ``flask init-db``) before the workers start.
+    """
     app = Flask(__name__)
     app.config.from_object('app.config.Config')
 
+    # JSON log lines written by a background thread
+    from .utils.logging_setup import configure_logging
+    configure_logging(app)
+
     # Initialize extensions
     db.init_app(app)
-    migrate.init_app(app, db)
     login_manager.init_app(app)
+    # Migrations are only needed by CLI commands such as `flask db upgrade`
+    if click.get_current_context(silent=True) is not None:
+        init_migrate(app)
+    
+    # Tune SQLite connections (WAL, busy timeout, cache sizes)
+    from .database import apply_sqlite_profile
+    apply_sqlite_profile(app)
     
     # Register blueprints
     from .routes.main import bp as main_bp
@@ -23,6 +39,7 @@ def create_app():
     from .routes.bookings import bp as bookings_bp
     from .routes.files import bp as files_bp
     from .routes.config import bp as config_bp
+    from .routes.archive import bp as archive_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp)
@@ -30,31 +47,65 @@ def create_app():
     app.register_blueprint(bookings_bp)
     app.register_blueprint(files_bp)
     app.register_blueprint(config_bp)
+    app.register_blueprint(archive_bp)
 
     # Configure upload directory
     app.config['UPLOAD_FOLDER'] = os.path.join(app.instance_path, 'uploads')
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+    # Register CLI commands
+    app.cli.add_command(create_admin)
+    app.cli.add_command(init_db)
+    app.cli.add_command(dispatch_outbox)
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(rescan_files)
+    app.cli.add_command(vendor_assets_command)
+    app.cli.add_command(build_assets_command)
+    app.cli.add_command(archive_events_command)
+
+    # Pick up config.json changes saved by other workers
+    app.extensions['config_version'] = json_config_version
+    app.before_request(lambda: refresh_config_if_changed(app))
+
+    # Per-endpoint latency, SQL, template and email timings for /metrics
+    from .utils.metrics import init_metrics
+    init_metrics(app)
+
+    # Keep the cached public event listing in sync with the database
+    from .utils.listing_cache import init_listing_cache
+    init_listing_cache(app)
+
+    # Appearance settings as a fingerprinted stylesheet instead of inline CSS
+    from .utils.theme import init_theme
+    init_theme(app)
+
+    # Fingerprinted static assets built by `flask build-assets`
+    from .utils.assets import init_assets
+    init_assets(app)
+
+    # Serve Flask-Login's user lookups from a per-worker cache
+    from .utils.user_cache import init_user_cache
+    init_user_cache(app)
+
+    # Move past events to the archive database periodically
+    if app.config['ARCHIVE_INTERVAL_HOURS'] > 0:
+        from .utils.archive import start_archive_worker
+        start_archive_worker(app)
+
+    # Drain the email outbox in-process when no separate dispatcher runs
+    if app.config['EMAIL_OUTBOX_WORKER']:
+        from .utils.outbox import start_outbox_worker
+        start_outbox_worker(app)
+
     # Set up user loader for Flask-Login
     @login_manager.user_loader
     def load_user(user_id):
         """Load a user given the ID."""
-        from .models import User
-        return User.query.get(int(user_id))
+        from .utils.user_cache import load_cached_user
+        return load_cached_user(user_id)
 
     return app
 
-def init_app():
-    """Initialize the application, including database setup."""
-    app = create_app()
-    with app.app_context():
-        from .database import init_database
-        init_database()
-    return app
-
-# Create the Flask application instance
-app = init_app()
-
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5001))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
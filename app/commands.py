@@ -1,4 +1,6 @@
 import click
+import time
+from flask import current_app
 from flask.cli import with_appcontext
 from .models.models import db, User
 
@@ -22,6 +24,101 @@ def create_admin(username, password):
 @click.command('init-db')
 @with_appcontext
 def init_db():
-    """Initialize the database."""
-    db.create_all()
+    """Create missing tables and the admin user (once, before starting the server)."""
+    from .database import init_database
+    init_database()
     click.echo('Database initialized.')
+
+
+@click.command('dispatch-outbox')
+@click.option('--watch', is_flag=True, help='Keep draining the outbox until interrupted.')
+@click.option('--interval', default=5.0, show_default=True, help='Seconds between runs with --watch.')
+@click.option('--batch-size', default=None, type=int, help='Maximum emails per run.')
+@with_appcontext
+def dispatch_outbox(watch, interval, batch_size):
+    """Send queued emails from the outbox."""
+    from .utils.outbox import dispatch_pending, flush_metrics
+
+    app = current_app._get_current_object()
+    try:
+        while True:
+            stats = dispatch_pending(batch_size=batch_size)
+            flush_metrics(app)
+            if any(stats.values()) or not watch:
+                click.echo(f"Sent: {stats['sent']}, retried: {stats['retried']}, failed: {stats['failed']}, "
+                           f"digests: {stats['digests']}")
+            if not watch:
+                return
+            db.session.remove()
+            time.sleep(interval)
+    finally:
+        flush_metrics(app)
+
+@click.command('rescan-files')
+@with_appcontext
+def rescan_files():
+    """Store files copied into the upload folder and drop stale index entries."""
+    from .utils.file_index import rescan
+
+    stats = rescan()
+    click.echo(f"Added: {stats['added']}, updated: {stats['updated']}, removed: {stats['removed']}, "
+               f"unreferenced content removed: {stats['orphans']}")
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans_command():
+    """Fail if a hot query falls back to a full table scan."""
+    from .utils.query_plans import check_query_plans
+
+    failures = 0
+    for name, plan, has_full_scan in check_query_plans():
+        status = 'FULL SCAN' if has_full_scan else 'ok'
+        click.echo(f'[{status}] {name}')
+        for detail in plan:
+            click.echo(f'    {detail}')
+        failures += has_full_scan
+
+    if failures:
+        raise click.ClickException(f'{failures} queries use a full table scan')
+    click.echo('All hot queries use indexes.')
+
+@click.command('vendor-assets')
+@click.option('--force', is_flag=True, help='Download files that already exist again.')
+@with_appcontext
+def vendor_assets_command(force):
+    """Verify Bootstrap and Bootstrap Icons in static/vendor/, downloading missing files."""
+    from flask import current_app
+    from .utils.assets import vendor_assets
+
+    try:
+        downloaded = vendor_assets(current_app.static_folder, force=force, log=click.echo)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Downloaded: {downloaded}')
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """Minify, fingerprint and precompress static files into static/dist/."""
+    from flask import current_app
+    from .utils.assets import build_assets
+
+    manifest = build_assets(current_app.static_folder)
+    for source, built in sorted(manifest.items()):
+        click.echo(f'{source} -> {built}')
+    click.echo(f'Built {len(manifest)} assets.')
+
+@click.command('archive-events')
+@click.option('--older-than-days', type=int, default=None, help='Default: ARCHIVE_AFTER_DAYS.')
+@click.option('--batch-size', type=int, default=None, help='Events per batch. Default: ARCHIVE_BATCH_SIZE.')
+@click.option('--dry-run', is_flag=True, help='Only count the events and bookings that would be moved.')
+@with_appcontext
+def archive_events_command(older_than_days, batch_size, dry_run):
+    """Move past events and their bookings to the archive database."""
+    from .utils.archive import archive_past_events
+
+    stats = archive_past_events(older_than_days=older_than_days, batch_size=batch_size, dry_run=dry_run)
+    if stats['skipped']:
+        raise click.ClickException('Another process is archiving right now')
+    verb = 'Would archive' if dry_run else 'Archived'
+    click.echo(f"{verb} {stats['events']} events with {stats['bookings']} bookings")
@@ -1,22 +1,23 @@
 import os
 import json
 from dotenv import load_dotenv
-from flask import current_app
+from flask import current_app, has_app_context
 import time
+import threading
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Load JSON configuration
 def load_json_config():
-    config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.json')
+    path = config_path()
     try:
-        if os.path.exists(config_path):
+        if os.path.exists(path):
             # Get the modification time of the file
-            mod_time = os.path.getmtime(config_path)
+            mod_time = os.path.getmtime(path)
             
             # Read the file with explicit encoding
-            with open(config_path, 'r', encoding='utf-8') as f:
+            with open(path, 'r', encoding='utf-8') as f:
                 config_data = json.load(f)
                 
             # Store the modification time in the config data for tracking
@@ -47,44 +48,100 @@ def load_json_config():
         print(f"Error loading JSON config: {e}")
         return {"_last_modified": time.time()}
 
+def config_path():
+    """Path of the JSON configuration file."""
+    return os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.json')
+
+def config_version():
+    """Cheap change stamp of the JSON configuration file, or None if it is missing."""
+    try:
+        stat = os.stat(config_path())
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+def apply_json_config(app_config, json_config):
+    """Copy the JSON configuration into a Flask config mapping."""
+    app_config['WEBSITE_NAME'] = json_config.get('website', {}).get('name', 'Veranstaltungsmanager')
+    app_config['WEBSITE_TITLE'] = json_config.get('website', {}).get('title', 'Veranstaltungsverwaltung')
+    app_config['WEBSITE_DESCRIPTION'] = json_config.get('website', {}).get('description', 'Plattform zur Verwaltung von Veranstaltungen und Buchungen')
+    app_config['WEBSITE_WELCOME_HEADING'] = json_config.get('website', {}).get('welcome_heading', 'Willkommen bei Event Management')
+    app_config['WEBSITE_WELCOME_TEXT'] = json_config.get('website', {}).get('welcome_text', 'Durchstöbern und buchen Sie kommende Veranstaltungen.')
+    app_config['CONTACT_EMAIL'] = json_config.get('contact', {}).get('email', '')
+    app_config['CONTACT_PHONE'] = json_config.get('contact', {}).get('phone', '')
+    app_config['PRIMARY_COLOR'] = json_config.get('appearance', {}).get('primary_color', '#212529')
+    app_config['SECONDARY_COLOR'] = json_config.get('appearance', {}).get('secondary_color', '#6c757d')
+    app_config['BUTTON_COLOR'] = json_config.get('appearance', {}).get('button_color', '#0080ff')
+    app_config['LOGO_ICON'] = json_config.get('appearance', {}).get('logo_icon', 'bi-calendar-event')
+
+_reload_lock = threading.Lock()
+
 # Function to reload configuration
-def reload_config():
+def reload_config(app=None):
     """Reload the configuration from the JSON file and update the Flask app config."""
-    if current_app:
-        # Force reload by clearing any cached data
-        config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.json')
+    app = app or (current_app._get_current_object() if has_app_context() else None)
+    if app is None:
+        return False
+
+    path = config_path()
+    
+    # Ensure the file exists
+    if not os.path.exists(path):
+        app.logger.error(f"Configuration file not found at {path}")
+        return False
         
-        # Ensure the file exists
-        if not os.path.exists(config_path):
-            current_app.logger.error(f"Configuration file not found at {config_path}")
-            return False
-            
+    with _reload_lock:
         try:
+            # Stamp first: a write racing with this read changes the stamp again
+            version = config_version()
+            
             # Load fresh configuration data
-            with open(config_path, 'r', encoding='utf-8') as f:
+            with open(path, 'r', encoding='utf-8') as f:
                 json_config = json.load(f)
             
             # Update application configuration
-            current_app.config['WEBSITE_NAME'] = json_config.get('website', {}).get('name', 'Veranstaltungsmanager')
-            current_app.config['WEBSITE_TITLE'] = json_config.get('website', {}).get('title', 'Veranstaltungsverwaltung')
-            current_app.config['WEBSITE_DESCRIPTION'] = json_config.get('website', {}).get('description', 'Plattform zur Verwaltung von Veranstaltungen und Buchungen')
-            current_app.config['WEBSITE_WELCOME_HEADING'] = json_config.get('website', {}).get('welcome_heading', 'Willkommen bei Event Management')
-            current_app.config['WEBSITE_WELCOME_TEXT'] = json_config.get('website', {}).get('welcome_text', 'Durchstöbern und buchen Sie kommende Veranstaltungen.')
-            current_app.config['CONTACT_EMAIL'] = json_config.get('contact', {}).get('email', '')
-            current_app.config['CONTACT_PHONE'] = json_config.get('contact', {}).get('phone', '')
-            current_app.config['PRIMARY_COLOR'] = json_config.get('appearance', {}).get('primary_color', '#212529')
-            current_app.config['SECONDARY_COLOR'] = json_config.get('appearance', {}).get('secondary_color', '#6c757d')
-            current_app.config['BUTTON_COLOR'] = json_config.get('appearance', {}).get('button_color', '#0080ff')
-            current_app.config['LOGO_ICON'] = json_config.get('appearance', {}).get('logo_icon', 'bi-calendar-event')
+            apply_json_config(app.config, json_config)
+            app.extensions['config_version'] = version
             
-            current_app.logger.info(f"Configuration reloaded successfully from {config_path}")
+            app.logger.info(f"Configuration reloaded successfully from {path}")
             return True
         except Exception as e:
-            current_app.logger.error(f"Error reloading configuration: {e}")
+            app.logger.error(f"Error reloading configuration: {e}")
             return False
-    return False
+
+def refresh_config_if_changed(app):
+    """
+    Reload the JSON configuration if another worker changed it.
+
+    Called before every request; the file is stat()ed at most once per
+    CONFIG_CHECK_INTERVAL_MS and only parsed when its stamp changed.
+    """
+    now = time.monotonic()
+    interval = app.config.get('CONFIG_CHECK_INTERVAL_MS', 1000) / 1000.0
+    if now - app.extensions.get('config_checked_at', 0.0) < interval:
+        return
+    app.extensions['config_checked_at'] = now
+
+    if config_version() != app.extensions.get('config_version'):
+        reload_config(app)
+
+def sqlalchemy_engine_options(database_uri):
+    """Engine and pool options; in-memory SQLite uses a static pool without sizing."""
+    busy_timeout_ms = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
+    options = {
+        'connect_args': {'timeout': busy_timeout_ms / 1000.0},
+    }
+    if database_uri.startswith('sqlite') and (database_uri.endswith(':memory:') or database_uri in ('sqlite://', 'sqlite:///')):
+        return options
+    options.update({
+        'pool_size': int(os.environ.get('SQLALCHEMY_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('SQLALCHEMY_MAX_OVERFLOW', 5)),
+        'pool_timeout': int(os.environ.get('SQLALCHEMY_POOL_TIMEOUT', 30)),
+    })
+    return options
 
 # Load the JSON configuration
+json_config_version = config_version()
 json_config = load_json_config()
 
 class Config:
@@ -95,6 +152,19 @@ class Config:
     # SQLAlchemy configuration
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///instance/data.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = sqlalchemy_engine_options(SQLALCHEMY_DATABASE_URI)
+    # Archived events and bookings; a relative SQLite path is inside the instance folder
+    ARCHIVE_DATABASE_URL = os.environ.get('ARCHIVE_DATABASE_URL', 'sqlite:///archive.db')
+    SQLALCHEMY_BINDS = {'archive': ARCHIVE_DATABASE_URL}
+    
+    # SQLite tuning profile, applied to every new connection
+    SQLITE_TUNING = os.environ.get('SQLITE_TUNING', 'True').lower() == 'true'
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # milliseconds
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # bytes
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -20000))  # negative: KiB
+    SQLITE_TEMP_STORE = os.environ.get('SQLITE_TEMP_STORE', 'MEMORY')
     
     # Admin credentials
     ADMIN_USERNAME = os.environ.get('ADMIN_USERNAME', 'admin')
@@ -112,25 +182,94 @@ class Config:
     # Mailjet configuration
     MAILJET_API_KEY = os.environ.get('MAILJET_API_KEY')
     MAILJET_API_SECRET = os.environ.get('MAILJET_API_SECRET')
+    MAILJET_BACKEND = os.environ.get('MAILJET_BACKEND', 'mailjet')  # 'fake' records mails in memory
+    
+    # Email outbox configuration
+    EMAIL_OUTBOX_WORKER = os.environ.get('EMAIL_OUTBOX_WORKER', 'False').lower() == 'true'
+    EMAIL_OUTBOX_INTERVAL = float(os.environ.get('EMAIL_OUTBOX_INTERVAL', 5))
+    EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE', 50))
+    EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 8))
+    EMAIL_OUTBOX_BACKOFF_SECONDS = int(os.environ.get('EMAIL_OUTBOX_BACKOFF_SECONDS', 30))
+    EMAIL_OUTBOX_BACKOFF_MAX_SECONDS = int(os.environ.get('EMAIL_OUTBOX_BACKOFF_MAX_SECONDS', 3600))
+    
+    # Messages per Mailjet send call (the v3.1 API accepts up to 50)
+    MAILJET_BATCH_SIZE = int(os.environ.get('MAILJET_BATCH_SIZE', 50))
+    
+    # 'immediate': one admin email per booking; 'digest': one summary per event
+    # every ADMIN_DIGEST_INTERVAL seconds (sent by the outbox dispatcher)
+    ADMIN_NOTIFICATION_MODE = os.environ.get('ADMIN_NOTIFICATION_MODE', 'immediate').lower()
+    ADMIN_DIGEST_INTERVAL = int(os.environ.get('ADMIN_DIGEST_INTERVAL', 900))
     
     BASE_URL = os.environ.get('BASE_URL', 'http://localhost:5001')
     
-    # Website configuration from JSON
-    WEBSITE_NAME = json_config.get('website', {}).get('name', 'Veranstaltungsmanager')
-    WEBSITE_TITLE = json_config.get('website', {}).get('title', 'Veranstaltungsverwaltung')
-    WEBSITE_DESCRIPTION = json_config.get('website', {}).get('description', 'Plattform zur Verwaltung von Veranstaltungen und Buchungen')
-    WEBSITE_WELCOME_HEADING = json_config.get('website', {}).get('welcome_heading', 'Willkommen bei Event Management')
-    WEBSITE_WELCOME_TEXT = json_config.get('website', {}).get('welcome_text', 'Durchstöbern und buchen Sie kommende Veranstaltungen.')
-    
-    # Contact information
-    CONTACT_EMAIL = json_config.get('contact', {}).get('email', '')
-    CONTACT_PHONE = json_config.get('contact', {}).get('phone', '')
-    
-    # Appearance settings
-    PRIMARY_COLOR = json_config.get('appearance', {}).get('primary_color', '#212529')
-    SECONDARY_COLOR = json_config.get('appearance', {}).get('secondary_color', '#6c757d')
-    BUTTON_COLOR = json_config.get('appearance', {}).get('button_color', '#0080ff')
-    LOGO_ICON = json_config.get('appearance', {}).get('logo_icon', 'bi-calendar-event')
+    # Maximum age in seconds of the cached public event listing
+    INDEX_CACHE_TTL = int(os.environ.get('INDEX_CACHE_TTL', 300))
+    
+    # Per-worker cache of users loaded by Flask-Login (seconds, entries)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 300))
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 256))
+    
+    # Live seat counts: seconds between version checks of the broadcaster,
+    # seconds between polls of pages without a stream, and open SSE streams
+    # allowed per worker (each holds a gunicorn thread; 0 = pages always poll)
+    SEATS_POLL_INTERVAL = float(os.environ.get('SEATS_POLL_INTERVAL', 0.5))
+    SEATS_CLIENT_POLL = int(os.environ.get('SEATS_CLIENT_POLL', 5))
+    SEATS_STREAM_LIMIT = int(os.environ.get('SEATS_STREAM_LIMIT', 0))
+    SEATS_STREAM_MAX_AGE = int(os.environ.get('SEATS_STREAM_MAX_AGE', 300))
+    
+    # Waiting room of events with an admission limit: ticket database, seconds an
+    # admitted visitor has to book, seconds after which an unpolled ticket is
+    # skipped, and poll interval of the waiting room page
+    ADMISSION_DB = os.environ.get('ADMISSION_DB')
+    ADMISSION_WINDOW = int(os.environ.get('ADMISSION_WINDOW', 300))
+    ADMISSION_ABANDON_AFTER = int(os.environ.get('ADMISSION_ABANDON_AFTER', 30))
+    ADMISSION_CLIENT_POLL = int(os.environ.get('ADMISSION_CLIENT_POLL', 3))
+    
+    # Archiving: events that started more than ARCHIVE_AFTER_DAYS days ago move
+    # with their bookings to the archive database in batches of ARCHIVE_BATCH_SIZE
+    # events; ARCHIVE_INTERVAL_HOURS > 0 also runs it from a background thread
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 180))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 200))
+    ARCHIVE_INTERVAL_HOURS = float(os.environ.get('ARCHIVE_INTERVAL_HOURS', 0))
+    ARCHIVE_PER_PAGE = int(os.environ.get('ARCHIVE_PER_PAGE', 50))
+    
+    # Entries per page on the downloads page
+    FILES_PER_PAGE = int(os.environ.get('FILES_PER_PAGE', 50))
+    
+    # Largest accepted upload in bytes, and seconds before an idle chunked upload is discarded
+    MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', 512 * 1024 * 1024))
+    MAX_CONTENT_LENGTH = MAX_UPLOAD_SIZE
+    UPLOAD_SESSION_TTL = int(os.environ.get('UPLOAD_SESSION_TTL', 86400))
+    
+    # Who sends download bodies: '' (the worker), 'x-accel' (nginx) or 'x-sendfile'
+    FILES_OFFLOAD = os.environ.get('FILES_OFFLOAD', '').lower()
+    # nginx 'internal' location that maps to UPLOAD_FOLDER
+    FILES_ACCEL_PREFIX = os.environ.get('FILES_ACCEL_PREFIX', '/protected-uploads/')
+    # max-age for download links that carry the content hash
+    FILES_CACHE_MAX_AGE = int(os.environ.get('FILES_CACHE_MAX_AGE', 31536000))
+    
+    # Logging: level of the app logger, 'json' or 'text' lines, and sampling of
+    # records below WARNING per logger, e.g. "werkzeug=0.1,app.app=0.5"
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()
+    LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES', '')
+    
+    # Request metrics, aggregated across workers in instance/metrics.db
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+    METRICS_DB = os.environ.get('METRICS_DB')
+    # Lets a Prometheus scraper read /metrics with "Authorization: Bearer <token>"
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # Milliseconds between checks of config.json for changes made by other workers
+    CONFIG_CHECK_INTERVAL_MS = int(os.environ.get('CONFIG_CHECK_INTERVAL_MS', 1000))
+
+# Website, contact and appearance settings from config.json, copied with the
+# same mapping reload_config applies to a running app
+_json_settings = {}
+apply_json_config(_json_settings, json_config)
+for _name, _value in _json_settings.items():
+    setattr(Config, _name, _value)
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -1,11 +1,31 @@
 import os
 import shutil
 from flask import current_app
-from .extensions import db, migrate
+from sqlalchemy import event, inspect
+from .extensions import db
 from .models.models import User
 
+def ensure_admin_user():
+    """Create the configured admin user if it does not exist yet."""
+    admin = User.query.filter_by(username=current_app.config['ADMIN_USERNAME']).first()
+    if not admin:
+        current_app.logger.info("Creating admin user...")
+        admin = User(
+            username=current_app.config['ADMIN_USERNAME'],
+            is_admin=True
+        )
+        admin.set_password(current_app.config['ADMIN_PASSWORD'])
+        db.session.add(admin)
+        db.session.commit()
+        current_app.logger.info("Admin user created successfully")
+
 def init_database():
-    """Initialize the database and run migrations."""
+    """
+    Create the tables of a database without migration history and the admin user.
+
+    Runs once before the application is served (``flask init-db``), never at
+    import time or per worker.
+    """
     current_app.logger.info("Starting database initialization...")
     current_app.logger.info(f"Database URL: {current_app.config['SQLALCHEMY_DATABASE_URI']}")
     current_app.logger.info(f"Instance path: {current_app.instance_path}")
@@ -14,25 +34,45 @@ def init_database():
         # Ensure instance directory exists
         os.makedirs(current_app.instance_path, exist_ok=True)
         
-        # Create tables
-        current_app.logger.info("Creating database tables...")
-        db.create_all()
+        # Databases with a migration history get new tables from their
+        # revisions; create_all would add them first and break the upgrade
+        if 'alembic_version' in inspect(db.engine).get_table_names():
+            current_app.logger.info("Schema is managed by migrations, skipping create_all")
+        else:
+            current_app.logger.info("Creating database tables...")
+            db.create_all()
         
-        # Create admin user if it doesn't exist
-        with current_app.app_context():
-            admin = User.query.filter_by(username=current_app.config['ADMIN_USERNAME']).first()
-            if not admin:
-                current_app.logger.info("Creating admin user...")
-                admin = User(
-                    username=current_app.config['ADMIN_USERNAME'],
-                    is_admin=True
-                )
-                admin.set_password(current_app.config['ADMIN_PASSWORD'])
-                db.session.add(admin)
-                db.session.commit()
-                current_app.logger.info("Admin user created successfully")
-            
+        ensure_admin_user()
         return True
     except Exception as e:
         current_app.logger.error(f"Database initialization failed: {str(e)}")
         raise
+
+def apply_sqlite_profile(app):
+    """Set the configured PRAGMAs on every new connection of the app's SQLite engines, binds included."""
+    if not app.config.get('SQLITE_TUNING'):
+        return
+
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(app.config['SQLITE_BUSY_TIMEOUT'])}",
+        f"PRAGMA journal_mode = {app.config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous = {app.config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA mmap_size = {int(app.config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size = {int(app.config['SQLITE_CACHE_SIZE'])}",
+        f"PRAGMA temp_store = {app.config['SQLITE_TEMP_STORE']}",
+    ]
+
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    for engine in engines:
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', _set_sqlite_pragmas)
@@ -1,8 +1,18 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_migrate import Migrate
 
 db = SQLAlchemy()
-migrate = Migrate()
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
+
+def init_migrate(app):
+    """
+    Register Flask-Migrate with the app.
+
+    Flask-Migrate imports Alembic, a large share of the import time, so it is
+    only loaded where migrations are used: Flask CLI commands and init_migrations.py.
+    """
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+        from .models.models import include_schema_name
+        Migrate(app, db, include_name=include_schema_name)
@@ -1 +1 @@
-from .models import User, Event, Booking
+from .models import User, Event, Booking, EmailOutbox, StoredFile, ArchivedEvent, ArchivedBooking
@@ -2,10 +2,13 @@ from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timezone, timedelta
 from ..extensions import db
+from sqlalchemy import update, func, select, table, column, literal_column, false, or_, and_
+from sqlalchemy import event as sa_event
 from sqlalchemy.orm import validates
 import pytz
 from flask import current_app
 import threading
+import re
 
 def get_utc_now():
     """Get current UTC time."""
@@ -48,6 +51,20 @@ class Event(db.Model):
     address = db.Column(db.String(200), nullable=True)
     is_visible = db.Column(db.Boolean, default=True, nullable=False)
     price = db.Column(db.Float, nullable=False, default=0.0)
+    # Concurrent booking attempts admitted from the waiting room; None = no queue
+    admission_limit = db.Column(db.Integer, nullable=True)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=True, default=get_utc_now, onupdate=get_utc_now)
+    
+    __table_args__ = (
+        # Public listing: is_visible = 1 AND date >= now ORDER BY date
+        db.Index('ix_event_visible_date', 'is_visible', 'date'),
+        # Admin listing and API pagination: date >= now ORDER BY date, id
+        db.Index('ix_event_date', 'date'),
+    )
+    
+    # Fields exposed through the JSON API
+    API_FIELDS = ('id', 'title', 'description', 'date', 'capacity', 'bookings', 'available',
+                  'room', 'address', 'price', 'is_visible', 'updated_at')
     
     # Add relationship to bookings
     event_bookings = db.relationship('Booking', backref='event', lazy=True, 
@@ -99,6 +116,13 @@ class Event(db.Model):
             raise ValueError("Capacity must be greater than 0")
         return capacity
 
+    @validates('admission_limit')
+    def validate_admission_limit(self, key, admission_limit):
+        """Validate that the admission limit is empty or positive."""
+        if admission_limit is not None and admission_limit <= 0:
+            raise ValueError("Admission limit must be greater than 0")
+        return admission_limit
+
     @validates('price')
     def validate_price(self, key, price):
         """Validate that price is not negative."""
@@ -107,13 +131,195 @@ class Event(db.Model):
         return price
 
     @classmethod
-    def get_future_events(cls, include_invisible=False):
-        """Get all events that haven't happened yet."""
+    def future_events_query(cls, include_invisible=False):
+        """Query for events that haven't happened yet, ordered by date."""
         now = get_local_now()
         query = cls.query.filter(cls.date >= now)
         if not include_invisible:
             query = query.filter_by(is_visible=True)
-        return query.order_by(cls.date.asc()).all()
+        return query.order_by(cls.date.asc())
+
+    @classmethod
+    def get_future_events(cls, include_invisible=False):
+        """Get all events that haven't happened yet."""
+        return cls.future_events_query(include_invisible).all()
+
+    @property
+    def available(self):
+        """Number of seats that can still be booked."""
+        return max(0, self.capacity - (self.bookings or 0))
+
+    @property
+    def last_modified(self):
+        """Time of the last change as an aware UTC datetime (epoch if unknown)."""
+        if self.updated_at is None:
+            return datetime.fromtimestamp(0, timezone.utc)
+        if self.updated_at.tzinfo is None:
+            return self.updated_at.replace(tzinfo=timezone.utc)
+        return self.updated_at
+
+    def to_dict(self, fields=None):
+        """Serialize the event, optionally restricted to the given API fields."""
+        data = {}
+        for field in fields or self.API_FIELDS:
+            value = getattr(self, field)
+            if field == 'updated_at':
+                value = self.last_modified
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            data[field] = value
+        return data
+
+    @classmethod
+    def reserve_seat(cls, event_id):
+        """Atomically take one seat. Returns False if the event is sold out."""
+        result = db.session.execute(
+            update(cls)
+            .where(cls.id == event_id)
+            .where(func.coalesce(cls.bookings, 0) < cls.capacity)
+            .values(bookings=func.coalesce(cls.bookings, 0) + 1)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    @classmethod
+    def release_seat(cls, event_id):
+        """Atomically give one seat back, never going below zero."""
+        db.session.execute(
+            update(cls)
+            .where(cls.id == event_id)
+            .where(cls.bookings > 0)
+            .values(bookings=cls.bookings - 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    @classmethod
+    def search_query(cls, text=None, date_from=None, date_to=None, price_min=None, price_max=None,
+                     include_invisible=False):
+        """
+        Query for upcoming events matching a full-text search and filters.
+
+        Args:
+            text (str): Words to find in title, description, room or address; every
+                word must match, also as the start of a longer word
+            date_from (datetime): Earliest start (never before now)
+            date_to (datetime): Latest start
+            price_min (float): Lowest price
+            price_max (float): Highest price
+            include_invisible (bool): Also return hidden events
+
+        Returns:
+            Query ordered by (date, id), suitable for keyset pagination
+        """
+        match = fts_match_expression(text)
+        matched_ids = None
+        if match:
+            ids = db.session.execute(
+                _search_matches(match).limit(SELECTIVE_SEARCH_MATCHES + 1)
+            ).scalars().all()
+            if len(ids) <= SELECTIVE_SEARCH_MATCHES:
+                matched_ids = ids
+        return cls.build_search_query(match, matched_ids, date_from=date_from, date_to=date_to,
+                                      price_min=price_min, price_max=price_max,
+                                      include_invisible=include_invisible)
+
+    @classmethod
+    def build_search_query(cls, match, matched_ids=None, date_from=None, date_to=None, price_min=None,
+                           price_max=None, include_invisible=False):
+        """
+        Build the query of ``search_query`` without touching the database.
+
+        Args:
+            match (str): FTS5 expression from ``fts_match_expression``, or None
+            matched_ids (list): All text matches if there are at most
+                SELECTIVE_SEARCH_MATCHES; None matches in a subquery instead
+            date_from, date_to, price_min, price_max, include_invisible: As for ``search_query``
+
+        Returns:
+            Query ordered by (date, id)
+        """
+        date, is_visible = cls.date, cls.is_visible
+        if match:
+            if matched_ids is not None:
+                # Few matches: look them up by primary key and sort them. Hiding
+                # the indexed columns keeps SQLite from walking the date index
+                # through all upcoming events instead.
+                text_filter = cls.id.in_(matched_ids) if matched_ids else false()
+                date, is_visible = _unindexed(cls.date), _unindexed(cls.is_visible)
+            else:
+                # Otherwise walk the date index and stop after the first page
+                text_filter = cls.id.in_(_search_matches(match))
+
+        now = get_local_now()
+        query = cls.query.filter(date >= max(date_from, now) if date_from else date >= now)
+        if not include_invisible:
+            query = query.filter(is_visible.is_(True))
+        if date_to is not None:
+            query = query.filter(date <= date_to)
+        if price_min is not None:
+            query = query.filter(cls.price >= price_min)
+        if price_max is not None:
+            query = query.filter(cls.price <= price_max)
+        if match:
+            query = query.filter(text_filter)
+        return query.order_by(cls.date.asc(), cls.id.asc())
+
+# Full-text search over events: an FTS5 table that indexes the event table
+# (external content) and is kept in sync by triggers. Booking counter updates
+# do not touch the indexed columns and therefore skip the index.
+EVENT_SEARCH = table('event_fts', column('rowid'))
+# Up to this many text matches are passed to the event query as an id list
+SELECTIVE_SEARCH_MATCHES = 200
+
+def _search_matches(match):
+    """Rowids of the events matching an FTS5 expression."""
+    return select(EVENT_SEARCH.c.rowid).where(literal_column(EVENT_SEARCH.name).match(match))
+
+EVENT_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS event_fts USING fts5("
+    "title, description, room, address, content='event', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_ai AFTER INSERT ON event BEGIN "
+    "INSERT INTO event_fts (rowid, title, description, room, address) "
+    "VALUES (new.id, new.title, new.description, new.room, new.address); END",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_ad AFTER DELETE ON event BEGIN "
+    "INSERT INTO event_fts (event_fts, rowid, title, description, room, address) "
+    "VALUES ('delete', old.id, old.title, old.description, old.room, old.address); END",
+    "CREATE TRIGGER IF NOT EXISTS event_fts_au AFTER UPDATE OF title, description, room, address ON event BEGIN "
+    "INSERT INTO event_fts (event_fts, rowid, title, description, room, address) "
+    "VALUES ('delete', old.id, old.title, old.description, old.room, old.address); "
+    "INSERT INTO event_fts (rowid, title, description, room, address) "
+    "VALUES (new.id, new.title, new.description, new.room, new.address); END",
+)
+
+def _unindexed(column):
+    """The column with SQLite's unary ``+``, which rules out index lookups on it."""
+    return literal_column(f'+{column.table.name}.{column.name}', type_=column.type)
+
+def fts_match_expression(text):
+    """Turn user input into an FTS5 query: every word quoted and matched as a prefix."""
+    words = re.findall(r'\w+', text or '')
+    return ' '.join(f'"{word}"*' for word in words) or None
+
+def is_search_index_table(name):
+    """True for the FTS5 table and its shadow tables, which the models do not describe."""
+    return name == 'event_fts' or name.startswith('event_fts_')
+
+def include_schema_name(name, type_, parent_names):
+    """Alembic ``include_name`` hook that leaves the search index out of schema comparisons."""
+    return not (type_ == 'table' and is_search_index_table(name))
+
+def create_event_search_index(connection):
+    """Create the event search index and its triggers if missing, filling it from existing events."""
+    if connection.dialect.name != 'sqlite':
+        return
+    exists = connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'event_fts'").first()
+    for statement in EVENT_SEARCH_DDL:
+        connection.exec_driver_sql(statement)
+    if not exists:
+        connection.exec_driver_sql("INSERT INTO event_fts (event_fts) VALUES ('rebuild')")
+
+sa_event.listen(Event.__table__, 'after_create', lambda target, connection, **kw: create_event_search_index(connection))
 
 class Booking(db.Model):
     __tablename__ = 'booking'
@@ -131,4 +337,144 @@ class Booking(db.Model):
     
     __table_args__ = (
         db.UniqueConstraint('user_id', 'event_id', name='uq_user_event'),
+        # Registrations of an event, newest first; also serves event_id lookups
+        db.Index('ix_booking_event_created', 'event_id', 'created_at'),
+        db.Index('ix_booking_email', 'email'),
     )
+
+    @classmethod
+    def for_event_query(cls, event_id):
+        """Query for the registrations of an event, newest first."""
+        return cls.query.filter_by(event_id=event_id).order_by(cls.created_at.desc())
+
+# Past events and their bookings moved out of the hot tables by
+# utils/archive.py. They live in a separate SQLite file (the "archive" bind),
+# keep their ids and are only read afterwards.
+
+class ArchivedEvent(db.Model):
+    __bind_key__ = 'archive'
+    __tablename__ = 'archived_event'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    date = db.Column(db.DateTime(timezone=True), nullable=False)
+    capacity = db.Column(db.Integer, nullable=False)
+    bookings = db.Column(db.Integer, default=0)
+    room = db.Column(db.String(100), nullable=True)
+    address = db.Column(db.String(200), nullable=True)
+    is_visible = db.Column(db.Boolean, default=True, nullable=False)
+    price = db.Column(db.Float, nullable=False, default=0.0)
+    admission_limit = db.Column(db.Integer, nullable=True)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    archived_at = db.Column(db.DateTime(timezone=True), nullable=False, default=get_utc_now)
+
+    __table_args__ = (
+        # Archive listing, newest events first
+        db.Index('ix_archived_event_date', 'date'),
+    )
+
+    @classmethod
+    def listing_query(cls):
+        """Query for archived events, most recent first."""
+        return cls.query.order_by(cls.date.desc(), cls.id.desc())
+
+class ArchivedBooking(db.Model):
+    __bind_key__ = 'archive'
+    __tablename__ = 'archived_booking'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    event_id = db.Column(db.Integer, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(120), nullable=False)
+    phone = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True))
+
+    __table_args__ = (
+        db.Index('ix_archived_booking_event_created', 'event_id', 'created_at'),
+    )
+
+    @classmethod
+    def for_event_query(cls, event_id):
+        """Query for the archived registrations of an event, newest first."""
+        return cls.query.filter_by(event_id=event_id).order_by(cls.created_at.desc())
+
+class EmailOutbox(db.Model):
+    """Outgoing email persisted with the transaction that produced it."""
+    __tablename__ = 'email_outbox'
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)  # JSON encoded list of addresses
+    text_part = db.Column(db.Text, nullable=True)
+    html_part = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed; digest, digested
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime(timezone=True), nullable=False, default=get_utc_now)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), default=get_utc_now)
+    sent_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    # Items collected for a digest email: the digest they belong to and their data (JSON)
+    digest_key = db.Column(db.String(100), nullable=True)
+    payload = db.Column(db.Text, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+        db.Index('ix_email_outbox_status_digest', 'status', 'digest_key', 'created_at'),
+    )
+
+    @classmethod
+    def due_query(cls, now):
+        """Query for entries that should be (re)tried at ``now``, oldest first."""
+        return (cls.query
+                .filter(cls.status.in_(('pending', 'sending')))
+                .filter(cls.next_attempt_at <= now)
+                .order_by(cls.next_attempt_at.asc(), cls.id.asc()))
+
+class StoredFile(db.Model):
+    """Metadata of a file in UPLOAD_FOLDER, so listings need no directory scan."""
+    __tablename__ = 'stored_file'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(255), unique=True, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=True)  # Content in the file store, see utils/file_store.py
+    size = db.Column(db.BigInteger, nullable=False, default=0)
+    content_type = db.Column(db.String(100), nullable=False, default='application/octet-stream')
+    modified_at = db.Column(db.DateTime(timezone=True), nullable=False, default=get_utc_now)
+
+    __table_args__ = (
+        # File list page: ORDER BY modified_at DESC, id DESC
+        db.Index('ix_stored_file_modified', 'modified_at', 'id'),
+        # Reference checks before stored content is deleted
+        db.Index('ix_stored_file_sha256', 'sha256'),
+    )
+
+    @classmethod
+    def listing_query(cls):
+        """Query for the file list, newest first."""
+        return cls.query.order_by(cls.modified_at.desc(), cls.id.desc())
+
+    @classmethod
+    def page_query(cls, after=None, before=None):
+        """
+        Keyset query for one page of the file list.
+
+        Args:
+            after (tuple): (modified_at, id) of the last entry of the previous page
+            before (tuple): (modified_at, id) of the first entry of the next page;
+                the rows come back oldest first and must be reversed
+
+        Returns:
+            Query: Unlimited query; the caller applies the page size
+        """
+        if after:
+            modified_at, file_id = after
+            # The plain range bound lets SQLite seek in ix_stored_file_modified
+            return cls.listing_query().filter(cls.modified_at <= modified_at).filter(or_(
+                cls.modified_at < modified_at,
+                and_(cls.modified_at == modified_at, cls.id < file_id)
+            ))
+        if before:
+            modified_at, file_id = before
+            return cls.query.filter(cls.modified_at >= modified_at).filter(or_(
+                cls.modified_at > modified_at,
+                and_(cls.modified_at == modified_at, cls.id > file_id)
+            )).order_by(cls.modified_at.asc(), cls.id.asc())
+        return cls.listing_query()
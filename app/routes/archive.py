@@ -0,0 +1,58 @@
+"""Read-only access to archived events and their registrations."""
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from flask_login import login_required, current_user
+from functools import wraps
+from ..models import ArchivedEvent, ArchivedBooking
+from ..utils.archive import ensure_archive_schema
+from .main import registrations_export, EXPORT_FORMATS
+
+bp = Blueprint('archive', __name__, url_prefix='/archive')
+
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_admin:
+            flash('Zugriff verweigert. Sie benötigen Administratorrechte.', 'danger')
+            return redirect(url_for('main.index'))
+        # A fresh installation has no archive file until the first run
+        ensure_archive_schema()
+        return f(*args, **kwargs)
+    return decorated_function
+
+@bp.route('/')
+@login_required
+@admin_required
+def archived_events():
+    """Render one page of archived events, most recent first."""
+    page = max(request.args.get('page', 1, type=int) or 1, 1)
+    per_page = current_app.config['ARCHIVE_PER_PAGE']
+
+    # One extra row tells whether there is a next page without a COUNT query
+    events = ArchivedEvent.listing_query().offset((page - 1) * per_page).limit(per_page + 1).all()
+    return render_template(
+        'archive/list.html',
+        events=events[:per_page],
+        page=page,
+        has_next=len(events) > per_page
+    )
+
+@bp.route('/<int:event_id>/registrations')
+@login_required
+@admin_required
+def view_registrations(event_id):
+    event = ArchivedEvent.query.get_or_404(event_id)
+    bookings = ArchivedBooking.for_event_query(event_id).all()
+    return render_template('archive/registrations.html', event=event, bookings=bookings)
+
+@bp.route('/<int:event_id>/export')
+@login_required
+@admin_required
+def export_registrations(event_id):
+    """Export archived registrations as Excel (default), CSV or NDJSON file."""
+    export_format = request.args.get('format', 'xlsx').lower()
+    if export_format not in EXPORT_FORMATS:
+        flash('Unbekanntes Exportformat.', 'danger')
+        return redirect(url_for('archive.view_registrations', event_id=event_id))
+
+    event = ArchivedEvent.query.get_or_404(event_id)
+    return registrations_export(event, export_format, ArchivedBooking)
@@ -3,7 +3,8 @@ from flask_login import login_required, current_user
 import json
 import os
 import time
-from ..config import load_json_config, reload_config
+from ..config import load_json_config, reload_config, config_path as json_config_path
+from ..utils.theme import build_stylesheet
 
 bp = Blueprint('config', __name__, url_prefix='/config')
 
@@ -15,7 +16,7 @@ def edit_config():
         flash('Sie haben keine Berechtigung, diese Seite aufzurufen.', 'danger')
         return redirect(url_for('main.index'))
     
-    config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'config.json')
+    config_path = json_config_path()
     
     if request.method == 'POST':
         try:
@@ -42,20 +43,22 @@ def edit_config():
             # Update last modified timestamp
             current_config['_last_modified'] = time.time()
             
-            # Save the updated config - KORRIGIERT: fsync innerhalb des with-Blocks
+            # Serialize first so the file is rewritten in a single write. It is
+            # updated in place because it may be a bind-mounted file
+            content = json.dumps(current_config, indent=2, ensure_ascii=False)
             with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(current_config, f, indent=2, ensure_ascii=False)
+                f.write(content)
                 # Ensure file is written to disk before closing
                 f.flush()
                 os.fsync(f.fileno())
             
-            # Wait a moment to ensure file is fully written
-            time.sleep(0.1)
-            
-            # Reload the configuration
+            # Reload the configuration here; other workers notice the new
+            # file stamp on their next request
             success = reload_config()
             
             if success:
+                # Pages link the new stylesheet right away
+                build_stylesheet(current_app._get_current_object())
                 flash('Konfiguration erfolgreich aktualisiert.', 'success')
             else:
                 flash('Konfiguration gespeichert, aber Neuladen fehlgeschlagen. Bitte versuchen Sie es erneut.', 'warning')
@@ -100,7 +103,7 @@ def debug_config():
         return redirect(url_for('main.index'))
     
     # Get the current config file content
-    config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'config.json')
+    config_path = json_config_path()
     
     try:
         with open(config_path, 'r', encoding='utf-8') as f:
@@ -1,13 +1,273 @@
-from flask import Blueprint, jsonify
+"""JSON event API with keyset pagination and conditional GET support."""
+import base64
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, jsonify, request, abort, current_app
+from flask_login import current_user
+from sqlalchemy import func, or_, and_
+from ..extensions import db
+from ..models import Event
+from ..models.models import get_local_now
+from ..utils import seat_updates, listing_cache
 
 bp = Blueprint('events', __name__, url_prefix='/events')
 
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def _is_admin():
+    return current_user.is_authenticated and current_user.is_admin
+
+def _parse_fields():
+    """Return the requested subset of API fields, or None for all of them."""
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+    fields = [field.strip() for field in raw.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in Event.API_FIELDS]
+    if unknown:
+        abort(400, description=f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def _encode_cursor(event):
+    payload = json.dumps([event.date.isoformat(), event.id]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+def _decode_cursor(cursor):
+    try:
+        date_str, event_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(date_str), int(event_id)
+    except Exception:
+        abort(400, description='Invalid cursor')
+
+def _http_date(value):
+    """Truncate to whole seconds, the resolution of HTTP dates."""
+    return value.replace(microsecond=0)
+
+def _not_modified(etag, last_modified):
+    """Return True if the client's validators still match."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return _http_date(last_modified) <= request.if_modified_since
+    return False
+
+def _conditional_response(payload, etag, last_modified):
+    """Build a JSON response, or an empty 304 if the client is up to date."""
+    if _not_modified(etag, last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(payload)
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = _http_date(last_modified)
+    response.headers['Cache-Control'] = 'private, no-cache' if _is_admin() else 'public, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+def parse_search_filters(args):
+    """
+    Read the search filters of a request.
+
+    Args:
+        args: Query parameters with ``q``, ``from`` and ``to`` (YYYY-MM-DD, UTC)
+            and ``min_price``/``max_price``
+
+    Returns:
+        dict: Keyword arguments for ``Event.search_query``, empty without filters
+
+    Raises:
+        ValueError: With a user facing message for malformed dates or prices
+    """
+    filters = {}
+    text = args.get('q', '').strip()
+    if text:
+        filters['text'] = text
+    for name, key in (('from', 'date_from'), ('to', 'date_to')):
+        value = args.get(name, '').strip()
+        if not value:
+            continue
+        try:
+            day = datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+        except ValueError:
+            raise ValueError(f'Ungültiges Datum: {value}')
+        # The end date includes the whole day
+        filters[key] = day + timedelta(days=1) - timedelta(microseconds=1) if key == 'date_to' else day
+    for name, key in (('min_price', 'price_min'), ('max_price', 'price_max')):
+        value = args.get(name, '').strip().replace(',', '.')
+        if not value:
+            continue
+        try:
+            filters[key] = float(value)
+        except ValueError:
+            raise ValueError(f'Ungültiger Preis: {value}')
+        if filters[key] < 0:
+            raise ValueError(f'Ungültiger Preis: {value}')
+    return filters
+
+def search_events(filters, include_invisible, limit, cursor=None):
+    """
+    Return one page of search results.
+
+    Args:
+        filters (dict): Result of ``parse_search_filters``
+        include_invisible (bool): Also return hidden events
+        limit (int): Page size
+        cursor (str): ``next_cursor`` of the previous page
+
+    Returns:
+        tuple: (events, next_cursor or None)
+    """
+    query = Event.search_query(include_invisible=include_invisible, **filters)
+    if cursor:
+        after_date, after_id = _decode_cursor(cursor)
+        query = query.filter(or_(
+            Event.date > after_date,
+            and_(Event.date == after_date, Event.id > after_id)
+        ))
+    events = query.limit(limit + 1).all()
+    has_more = len(events) > limit
+    events = events[:limit]
+    return events, (_encode_cursor(events[-1]) if has_more else None)
+
+def _page_size():
+    try:
+        return min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        abort(400, description='Invalid limit')
+
+def _visible_events_query():
+    query = Event.query.filter(Event.date >= get_local_now())
+    if not _is_admin():
+        query = query.filter(Event.is_visible.is_(True))
+    return query
+
+def _listing_last_modified(last_updated):
+    """
+    Latest moment at which the upcoming events listing can have changed.
+
+    ``max(updated_at)`` misses deleted events and events that left the listing
+    because they started, so the listing version stamp (replaced by every commit
+    touching events or bookings) and the start of the latest past event count too.
+    """
+    candidates = [last_updated, listing_cache.changed_at()]
+    started = Event.query.filter(Event.date < get_local_now())
+    if not _is_admin():
+        started = started.filter(Event.is_visible.is_(True))
+    last_started = started.with_entities(func.max(Event.date)).scalar()
+    if last_started is not None:
+        # Naive dates are local wall-clock times, like get_local_now()
+        candidates.append(last_started.astimezone())
+    return max((value for value in candidates if value is not None), default=None)
+
 @bp.route('/', methods=['GET'])
 def list_events():
-    """List all events."""
-    return jsonify({"message": "Events listing endpoint"})
+    """
+    List upcoming events ordered by date.
+
+    Query parameters:
+        limit: Page size (default 20, maximum 100)
+        after: Cursor returned as ``next_cursor`` by the previous page
+        fields: Comma separated subset of ``Event.API_FIELDS``
+    """
+    fields = _parse_fields()
+    limit = _page_size()
+
+    query = _visible_events_query()
+
+    # Validators cover the whole result set, so any change invalidates every page
+    last_updated, total = query.with_entities(func.max(Event.updated_at), func.count(Event.id)).one()
+    if last_updated is not None and last_updated.tzinfo is None:
+        last_updated = last_updated.replace(tzinfo=timezone.utc)
+    last_modified = _listing_last_modified(last_updated)
+    state = f"{last_modified.isoformat() if last_modified else ''}|{total}|{_is_admin()}|{request.query_string.decode()}"
+    etag = hashlib.sha1(state.encode('utf-8')).hexdigest()
+    if _not_modified(etag, last_modified):
+        return _conditional_response(None, etag, last_modified)
+
+    cursor = request.args.get('after')
+    if cursor:
+        after_date, after_id = _decode_cursor(cursor)
+        query = query.filter(or_(
+            Event.date > after_date,
+            and_(Event.date == after_date, Event.id > after_id)
+        ))
+
+    events = query.order_by(Event.date.asc(), Event.id.asc()).limit(limit + 1).all()
+    has_more = len(events) > limit
+    events = events[:limit]
+
+    payload = {
+        'events': [event.to_dict(fields) for event in events],
+        'next_cursor': _encode_cursor(events[-1]) if has_more else None
+    }
+    return _conditional_response(payload, etag, last_modified)
+
+@bp.route('/search', methods=['GET'])
+def search():
+    """
+    Full-text search over upcoming events, ordered by date.
+
+    Query parameters:
+        q: Words to find in title, description, room or address (prefix match)
+        from, to: Date range as YYYY-MM-DD
+        min_price, max_price: Price range
+        limit, after, fields: As for the listing
+    """
+    fields = _parse_fields()
+    limit = _page_size()
+    try:
+        filters = parse_search_filters(request.args)
+    except ValueError as e:
+        abort(400, description=str(e))
+    events, next_cursor = search_events(filters, _is_admin(), limit, request.args.get('after'))
+    response = jsonify({
+        'events': [event.to_dict(fields) for event in events],
+        'next_cursor': next_cursor
+    })
+    response.headers['Cache-Control'] = 'private, no-cache' if _is_admin() else 'public, no-cache'
+    response.vary.add('Cookie')
+    return response
 
 @bp.route('/<int:event_id>', methods=['GET'])
 def get_event(event_id):
-    """Get a specific event."""
-    return jsonify({"message": f"Get event {event_id}"})
+    """Get a specific event. Supports ``fields`` like the listing."""
+    fields = _parse_fields()
+    event = db.session.get(Event, event_id)
+    if event is None or (not event.is_visible and not _is_admin()):
+        return jsonify({"error": "Event not found"}), 404
+
+    etag = f"{event.id}-{event.last_modified.timestamp()}-{event.bookings}"
+    if fields:
+        etag = f"{etag}-{','.join(fields)}"
+    return _conditional_response(event.to_dict(fields), etag, event.last_modified)
+
+@bp.route('/seats', methods=['GET'])
+def seat_snapshot():
+    """Remaining seats of all visible upcoming events, served from memory."""
+    etag, seats = seat_updates.snapshot(current_app._get_current_object())
+    if seats is None:
+        abort(503, description='Seat counts are not available yet')
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify({'seats': {str(event_id): remaining for event_id, remaining in seats.items()}})
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@bp.route('/seats/stream', methods=['GET'])
+def seat_stream():
+    """Server-Sent Events with seat count changes; 503 when this worker has no stream slot left."""
+    app = current_app._get_current_object()
+    if not seat_updates.open_stream(app):
+        response = current_app.response_class(status=503)
+        response.headers['Retry-After'] = str(app.config.get('SEATS_CLIENT_POLL', 5))
+        return response
+    response = current_app.response_class(seat_updates.stream(app), mimetype='text/event-stream')
+    response.call_on_close(seat_updates.close_stream)
+    response.headers['Cache-Control'] = 'no-cache'
+    # Let nginx pass the events through instead of buffering them
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
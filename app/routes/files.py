@@ -1,13 +1,16 @@
 """File management routes."""
-from flask import Blueprint, render_template, send_from_directory, redirect, url_for
-from flask import request, current_app, flash
+import base64
+import json
+from flask import Blueprint, render_template, redirect, url_for
+from flask import request, current_app, flash, jsonify, abort
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
-import os
-from pathlib import Path
-from datetime import datetime
-import mimetypes
+from werkzeug.utils import secure_filename, send_file as werkzeug_send_file
+from datetime import datetime, timezone
 from functools import wraps
+from ..extensions import db
+from ..models import StoredFile
+from ..utils import file_store
+from ..utils.file_index import link_file, unlink_file, release_content
 
 bp = Blueprint('files', __name__)
 
@@ -20,14 +23,17 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def get_file_info(file_path: Path) -> dict:
-    """Get file metadata."""
-    stat = file_path.stat()
+def get_file_info(entry) -> dict:
+    """Get display metadata for an indexed file."""
+    modified_at = entry.modified_at
+    if modified_at.tzinfo is None:
+        modified_at = modified_at.replace(tzinfo=timezone.utc)
     return {
-        'name': file_path.name,
-        'size': get_human_size(stat.st_size),
-        'modified': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
-        'type': mimetypes.guess_type(file_path.name)[0] or 'application/octet-stream'
+        'name': entry.name,
+        'sha256': entry.sha256,
+        'size': get_human_size(entry.size),
+        'modified': modified_at.astimezone().strftime('%Y-%m-%d %H:%M:%S'),
+        'type': entry.content_type
     }
 
 def get_human_size(size_bytes):
@@ -38,25 +44,43 @@ def get_human_size(size_bytes):
         size_bytes /= 1024
     return f"{size_bytes:.1f} TB"
 
-def get_all_files():
-    """Get list of all files with their info."""
-    files_dir = Path(current_app.config['UPLOAD_FOLDER'])
-    files = []
-    
-    if files_dir.exists():
-        for file_path in files_dir.glob('*'):
-            if file_path.is_file():
-                files.append(get_file_info(file_path))
-    
-    return sorted(files, key=lambda x: x['modified'], reverse=True)
+def _encode_cursor(entry):
+    payload = json.dumps([entry.modified_at.isoformat(), entry.id]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+def _decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        modified_str, file_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(modified_str), int(file_id)
+    except Exception:
+        abort(400, description='Invalid cursor')
 
 @bp.route('/files')
 def file_list_page():
-    """Render the file list page."""
-    files = get_all_files()
+    """Render one page of the file list from the metadata index."""
+    per_page = current_app.config.get('FILES_PER_PAGE', 50)
+    after = _decode_cursor(request.args.get('after'))
+    before = None if after else _decode_cursor(request.args.get('before'))
+
+    # Keyset pagination: each page continues from the (modified_at, id) of its
+    # neighbour, so the index lookup never walks the rows of earlier pages.
+    # One extra row tells whether there is another page without a COUNT query.
+    entries = StoredFile.page_query(after, before).limit(per_page + 1).all()
+    has_more = len(entries) > per_page
+    entries = entries[:per_page]
+    if before:
+        entries.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = bool(after), has_more
+
     return render_template(
         'files/list.html',
-        files=files,
+        files=[get_file_info(entry) for entry in entries],
+        prev_cursor=_encode_cursor(entries[0]) if entries and has_prev else None,
+        next_cursor=_encode_cursor(entries[-1]) if entries and has_next else None,
         is_admin=current_user.is_authenticated and current_user.is_admin
     )
 
@@ -64,7 +88,7 @@ def file_list_page():
 @login_required
 @admin_required
 def upload_file():
-    """Handle file upload."""
+    """Handle a form upload; the body is streamed into the content store."""
     if 'file' not in request.files:
         flash('No file provided', 'error')
         return redirect(url_for('files.file_list_page'))
@@ -76,35 +100,188 @@ def upload_file():
     
     if file:
         filename = secure_filename(file.filename)
-        upload_folder = Path(current_app.config['UPLOAD_FOLDER'])
-        upload_folder.mkdir(parents=True, exist_ok=True)
-        
-        file_path = upload_folder / filename
-        file.save(str(file_path))
+        try:
+            sha256, size = file_store.store_stream(file.stream)
+        except ValueError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('files.file_list_page'))
+        previous = link_file(filename, sha256, size)
+        db.session.commit()
+        release_content(previous)
         flash('File uploaded successfully', 'success')
     
     return redirect(url_for('files.file_list_page'))
 
+def _admin_json_required():
+    """Return an error response for non-admins of the JSON upload API, else None."""
+    if not current_user.is_authenticated or not current_user.is_admin:
+        return jsonify({'error': 'Admin access required'}), 403
+    return None
+
+def _parse_content_range(header):
+    """Parse ``bytes <start>-<end>/<total>`` and return the start offset, or None."""
+    try:
+        unit, spec = header.split(' ', 1)
+        start = int(spec.split('-', 1)[0])
+    except (AttributeError, ValueError):
+        return None
+    return start if unit == 'bytes' and start >= 0 else None
+
+@bp.route('/files/uploads', methods=['POST'])
+def create_upload():
+    """
+    Start a chunked upload.
+
+    JSON body:
+        filename: Name to store the file under
+        size: Total size in bytes
+    """
+    denied = _admin_json_required()
+    if denied:
+        return denied
+
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    if not filename or not isinstance(data.get('size'), int):
+        return jsonify({'error': 'filename and size are required'}), 400
+    try:
+        status = file_store.create_upload(filename, data['size'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 413
+    return jsonify(status), 201
+
+@bp.route('/files/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Report how many bytes of a chunked upload have arrived, to resume it."""
+    denied = _admin_json_required()
+    if denied:
+        return denied
+
+    status = file_store.upload_status(upload_id)
+    if status is None:
+        return jsonify({'error': 'Unknown upload'}), 404
+    return jsonify(status)
+
+@bp.route('/files/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """
+    Append a chunk sent with ``Content-Range: bytes <start>-<end>/<total>``.
+
+    A chunk that does not start at the current offset is rejected with 409 and
+    the offset to continue from. The upload is stored once the last byte arrives.
+    """
+    denied = _admin_json_required()
+    if denied:
+        return denied
+
+    if file_store.upload_status(upload_id) is None:
+        return jsonify({'error': 'Unknown upload'}), 404
+    start = _parse_content_range(request.headers.get('Content-Range'))
+    if start is None:
+        return jsonify({'error': 'Content-Range header required'}), 400
+
+    try:
+        status = file_store.append_chunk(upload_id, start, request.stream)
+    except file_store.UploadOffsetMismatch as e:
+        return jsonify({'error': str(e), 'offset': e.offset}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 413
+
+    if status['offset'] < status['size']:
+        return jsonify(status)
+
+    filename, sha256, size = file_store.finish_upload(upload_id)
+    previous = link_file(filename, sha256, size)
+    db.session.commit()
+    release_content(previous)
+    current_app.logger.info(f"Stored upload {filename} ({size} bytes, sha256 {sha256})")
+    return jsonify({**status, 'done': True, 'sha256': sha256})
+
+@bp.route('/files/uploads/<upload_id>', methods=['DELETE'])
+def cancel_upload(upload_id):
+    """Abort a chunked upload and discard the received bytes."""
+    denied = _admin_json_required()
+    if denied:
+        return denied
+
+    if not file_store.cancel_upload(upload_id):
+        return jsonify({'error': 'Unknown upload'}), 404
+    return '', 204
+
 @bp.route('/files/delete/<filename>', methods=['POST'])
 @login_required
 @admin_required
 def delete_file_route(filename):
     """Handle file deletion."""
-    file_path = Path(current_app.config['UPLOAD_FOLDER']) / secure_filename(filename)
+    existed, sha256 = unlink_file(secure_filename(filename))
     
-    if file_path.exists():
-        file_path.unlink()
+    if existed:
+        db.session.commit()
+        release_content(sha256)
         flash('File deleted successfully', 'success')
     else:
         flash('File not found', 'error')
     
     return redirect(url_for('files.file_list_page'))
 
+def _accel_response(entry, modified_at):
+    """Let a fronting nginx send the body from an internal location (X-Accel-Redirect)."""
+    prefix = current_app.config['FILES_ACCEL_PREFIX'].rstrip('/')
+    response = current_app.response_class(mimetype=entry.content_type)
+    response.headers.set('Content-Disposition', 'attachment', filename=entry.name)
+    response.headers['X-Accel-Redirect'] = f"{prefix}/{file_store.object_key(entry.sha256)}"
+    response.set_etag(entry.sha256)
+    response.last_modified = modified_at
+    response = response.make_conditional(request)
+    if response.status_code == 304:
+        del response.headers['X-Accel-Redirect']
+    return response
+
 @bp.route('/files/download/<filename>')
 def download_file(filename):
-    """Download a specific file."""
-    return send_from_directory(
-        current_app.config['UPLOAD_FOLDER'],
-        filename,
-        as_attachment=True
-    )
+    """
+    Download a specific file.
+
+    The content hash is the strong ETag, so If-None-Match and If-Range work and
+    Range requests are answered with 206. Links that carry the current hash as
+    ``v`` never change their content and are cacheable for a year; plain links
+    are revalidated on every use. With FILES_OFFLOAD set, nginx (X-Accel-Redirect)
+    or another front end (X-Sendfile) transfers the body instead of the worker.
+    """
+    entry = StoredFile.query.filter_by(name=filename).first()
+    if entry is None or entry.sha256 is None:
+        abort(404)
+    path = file_store.object_path(entry.sha256)
+    if not path.exists():
+        abort(404)
+
+    modified_at = entry.modified_at
+    if modified_at.tzinfo is None:
+        modified_at = modified_at.replace(tzinfo=timezone.utc)
+
+    offload = current_app.config.get('FILES_OFFLOAD')
+    if offload == 'x-accel':
+        response = _accel_response(entry, modified_at)
+    else:
+        response = werkzeug_send_file(
+            path,
+            request.environ,
+            mimetype=entry.content_type,
+            as_attachment=True,
+            download_name=entry.name,
+            conditional=True,
+            etag=entry.sha256,
+            last_modified=modified_at,
+            use_x_sendfile=offload == 'x-sendfile',
+            response_class=current_app.response_class
+        )
+        response.accept_ranges = 'bytes'
+
+    response.cache_control.public = True
+    if request.args.get('v') == entry.sha256:
+        response.cache_control.no_cache = None
+        response.cache_control.max_age = current_app.config.get('FILES_CACHE_MAX_AGE', 31536000)
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
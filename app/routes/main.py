@@ -1,42 +1,65 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, send_file
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, send_file, get_template_attribute
+from flask import Response, stream_with_context
 from flask_login import login_required, current_user
 from ..models.models import Event, Booking, db
 from datetime import datetime, timezone
 from sqlalchemy import text
 from ..utils.email import send_event_registration_confirmation, send_admin_registration_notification
-import traceback
+from ..utils import listing_cache, seat_updates, admission, theme, assets
+from ..utils.metrics import render_metrics
+from .events import parse_search_filters, search_events
+from markupsafe import Markup
+import logging
 import io
-from openpyxl import Workbook
+import csv
+import json
+import tempfile
+import hmac
 
 bp = Blueprint('main', __name__)
 
+# Events per page when the index is filtered
+SEARCH_PAGE_SIZE = 30
+
 @bp.route('/')
 def index():
-    current_app.logger.info("Accessing index route")
-    current_app.logger.info(f"User authenticated: {current_user.is_authenticated}")
-    if current_user.is_authenticated:
-        current_app.logger.info(f"User is admin: {current_user.is_admin}")
-
-    # Debug: Check all events in database
-    all_events = Event.query.all()
-    current_app.logger.info(f"Total events in database: {len(all_events)}")
-    for event in all_events:
-        current_app.logger.info(f"Event in DB: {event.title}, Date: {event.date}, Visible: {event.is_visible}")
+    try:
+        filters = parse_search_filters(request.args)
+    except ValueError as e:
+        flash(str(e), 'danger')
+        filters = {}
+    cursor = request.args.get('after')
+    if filters or cursor:
+        # Filtered results are paginated and never come from the listing cache
+        is_admin = current_user.is_authenticated and current_user.is_admin
+        events, next_cursor = search_events(filters, is_admin, SEARCH_PAGE_SIZE, cursor)
+        next_args = {key: value for key, value in request.args.items() if key != 'after'}
+        next_url = url_for('main.index', after=next_cursor, **next_args) if next_cursor else None
+        if is_admin:
+            return render_template('index.html', events=events, next_url=next_url, filtered=True)
+        customer_event_list = get_template_attribute('_customer_event_list.html', 'customer_event_list')
+        return render_template('index.html', event_list_html=Markup(customer_event_list(events)),
+                               events=events, next_url=next_url, filtered=True)
 
     if current_user.is_authenticated and current_user.is_admin:
         # Admin sees all future events, including invisible ones
         events = Event.get_future_events(include_invisible=True)
-        current_app.logger.info(f"Admin view - Future events count: {len(events)}")
-        for event in events:
-            current_app.logger.info(f"Admin future event: {event.title}, Date: {event.date}")
+        if current_app.logger.isEnabledFor(logging.DEBUG):
+            current_app.logger.debug(f"Admin view - Future events count: {len(events)}")
+            for event in events:
+                current_app.logger.debug(f"Admin future event: {event.title}, Date: {event.date}")
         return render_template('index.html', events=events)
-    else:
-        # Non-admin users only see visible future events
+
+    # Non-admin users only see visible future events, served from the cache
+    event_list_html = listing_cache.get_listing()
+    if event_list_html is None:
+        version = listing_cache.current_version()
         events = Event.get_future_events(include_invisible=False)
-        current_app.logger.info(f"User view - Future events count: {len(events)}")
-        for event in events:
-            current_app.logger.info(f"User future event: {event.title}, Date: {event.date}")
-        return render_template('index.html', events=events)
+        current_app.logger.debug(f"User view - Future events count: {len(events)}")
+        customer_event_list = get_template_attribute('_customer_event_list.html', 'customer_event_list')
+        event_list_html = customer_event_list(events)
+        listing_cache.store_listing(version, event_list_html, events)
+    return render_template('index.html', event_list_html=Markup(event_list_html))
 
 @bp.route('/event/create', methods=['GET', 'POST'])
 @login_required
@@ -50,6 +73,7 @@ def create_event():
             room = request.form.get('room')
             address = request.form.get('address')
             price = float(request.form.get('price', 0))
+            admission_limit = int(request.form['admission_limit']) if request.form.get('admission_limit') else None
             
             # Parse the date and make it timezone-aware
             date = datetime.strptime(date_str, '%Y-%m-%dT%H:%M').replace(tzinfo=timezone.utc)
@@ -61,7 +85,8 @@ def create_event():
                 capacity=capacity,
                 room=room,
                 address=address,
-                price=price
+                price=price,
+                admission_limit=admission_limit
             )
             db.session.add(event)
             db.session.commit()
@@ -70,14 +95,14 @@ def create_event():
             return redirect(url_for('main.index'))
         except ValueError as e:
             db.session.rollback()
-            current_app.logger.error(f"Fehler bei der Erstellung der Veranstaltung: {str(e)}\n{traceback.format_exc()}")
+            current_app.logger.exception(f"Fehler bei der Erstellung der Veranstaltung: {str(e)}")
             flash(str(e), 'danger')
             return render_template('create_event.html', 
                                 default_date=date_str,
                                 form_data=request.form)
         except Exception as e:
             db.session.rollback()
-            current_app.logger.error(f"Fehler bei der Erstellung der Veranstaltung: {str(e)}\n{traceback.format_exc()}")
+            current_app.logger.exception(f"Fehler bei der Erstellung der Veranstaltung: {str(e)}")
             flash('Ein Fehler ist aufgetreten, während die Veranstaltung erstellt wurde.', 'danger')
             return render_template('create_event.html', 
                                 default_date=date_str,
@@ -86,13 +111,33 @@ def create_event():
     default_date = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M')
     return render_template('create_event.html', default_date=default_date)
 
+def _needs_admission(event):
+    """True if the visitor has to go through the event's waiting room first."""
+    if not event.admission_limit or event.bookings >= event.capacity:
+        return False
+    if current_user.is_authenticated and current_user.is_admin:
+        return False
+    return not admission.is_admitted(admission.session_token(event.id))
+
+def _leave_queue(event_id):
+    """Give the visitor's admission slot to the next one in the waiting room."""
+    token = admission.session_token(event_id)
+    if token:
+        admission.finish(token)
+        admission.remember(event_id, None)
+
 @bp.route('/event/<int:event_id>/book', methods=['GET', 'POST'])
 def book_event(event_id):
     """Book an event."""
     event = Event.query.get_or_404(event_id)
     
+    if _needs_admission(event):
+        return redirect(url_for('main.booking_queue', event_id=event_id))
+    
     if request.method == 'POST':
+        # Cheap early exit; the authoritative check is the reservation below
         if event.bookings >= event.capacity:
+            _leave_queue(event_id)
             flash('Diese Veranstaltung ist leider ausgebucht!', 'error')
             return redirect(url_for('main.index'))
         
@@ -103,34 +148,65 @@ def book_event(event_id):
         booking = Booking(event_id=event_id, name=name, email=email, phone=phone)
         
         try:
-            # Start transaction
-            db.session.begin_nested()  # Create a savepoint
+            # Take a seat with a single conditional UPDATE instead of
+            # reading and writing the counter in Python
+            if not Event.reserve_seat(event_id):
+                db.session.rollback()
+                _leave_queue(event_id)
+                flash('Diese Veranstaltung ist leider ausgebucht!', 'error')
+                return redirect(url_for('main.index'))
+            db.session.expire(event, ['bookings'])
             
-            # Add booking and increment counter
             db.session.add(booking)
-            event.bookings += 1
-            
-            # Try to send confirmation email to user first
-            send_event_registration_confirmation(email, event)
             
-            # Send notification to admin
+            # Queue confirmation email to user and notification to admin
+            # in the outbox; they are committed together with the booking
+            send_event_registration_confirmation(email, event, deferred=True)
             user_data = {'name': name, 'email': email, 'phone': phone}
-            send_admin_registration_notification(event, user_data)
+            send_admin_registration_notification(event, user_data, deferred=True)
             
-            # If emails sent successfully, commit the transaction
             db.session.commit()
+            seat_updates.notify()
+            _leave_queue(event_id)
             
             return redirect(url_for('main.book_event', event_id=event_id, success='true'))
             
         except Exception as e:
-            # Roll back to the savepoint
+            # Gives the seat back and drops the queued emails
             db.session.rollback()
-            current_app.logger.error(f"Fehler bei der Buchung: {str(e)}\n{traceback.format_exc()}")
+            current_app.logger.exception(f"Fehler bei der Buchung: {str(e)}")
             flash('Bei der Verarbeitung Ihrer Buchung ist ein Fehler aufgetreten. Bitte versuchen Sie es erneut.', 'error')
             return redirect(url_for('main.book_event', event_id=event_id))
     
     return render_template('book_event.html', event=event)
 
+@bp.route('/event/<int:event_id>/queue')
+def booking_queue(event_id):
+    """Waiting room of an event with an admission limit."""
+    event = Event.query.get_or_404(event_id)
+    if not _needs_admission(event):
+        return redirect(url_for('main.book_event', event_id=event_id))
+    
+    status = admission.ticket_status(admission.session_token(event_id))
+    if status is None or status['state'] in ('expired', 'done'):
+        token = admission.join(event_id, event.admission_limit)
+        admission.remember(event_id, token)
+        status = admission.ticket_status(token)
+    if status['state'] == 'admitted':
+        return redirect(url_for('main.book_event', event_id=event_id))
+    return render_template('booking_queue.html', event=event, status=status)
+
+@bp.route('/event/<int:event_id>/queue/status')
+def booking_queue_status(event_id):
+    """Position of the visitor's ticket; polled by the waiting room without touching the event."""
+    status = admission.ticket_status(admission.session_token(event_id))
+    if status is None:
+        return jsonify({'state': 'unknown'}), 404
+    _, seats = seat_updates.snapshot(current_app._get_current_object(), timeout=1)
+    if seats is not None and seats.get(event_id) == 0:
+        status['state'] = 'sold_out'
+    return jsonify(status)
+
 @bp.route('/event/<int:event_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_event(event_id):
@@ -149,7 +225,8 @@ def edit_event(event_id):
                 'capacity': int(request.form.get('capacity', 10)),
                 'room': request.form.get('room'),
                 'address': request.form.get('address'),
-                'price': float(request.form.get('price', 0))
+                'price': float(request.form.get('price', 0)),
+                'admission_limit': int(request.form['admission_limit']) if request.form.get('admission_limit') else None
             }
             
             # Update all fields at once
@@ -168,11 +245,11 @@ def edit_event(event_id):
             
         except ValueError as e:
             db.session.rollback()
-            current_app.logger.error(f"Fehler bei der Aktualisierung der Veranstaltung: {str(e)}\n{traceback.format_exc()}")
+            current_app.logger.exception(f"Fehler bei der Aktualisierung der Veranstaltung: {str(e)}")
             flash(str(e), 'danger')
         except Exception as e:
             db.session.rollback()
-            current_app.logger.error(f"Fehler bei der Aktualisierung der Veranstaltung: {str(e)}\n{traceback.format_exc()}")
+            current_app.logger.exception(f"Fehler bei der Aktualisierung der Veranstaltung: {str(e)}")
             flash('Ein Fehler ist aufgetreten, während die Veranstaltung aktualisiert wurde.', 'danger')
     
     return render_template('edit_event.html', event=event)
@@ -198,6 +275,7 @@ def copy_event(event_id):
             room=original_event.room,
             address=original_event.address,
             price=original_event.price,
+            admission_limit=original_event.admission_limit,
             bookings=0  # Start with 0 bookings
         )
         
@@ -208,12 +286,12 @@ def copy_event(event_id):
         return redirect(url_for('main.index'))
     except ValueError as e:
         db.session.rollback()
-        current_app.logger.error(f"Fehler bei der Kopie der Veranstaltung: {str(e)}\n{traceback.format_exc()}")
+        current_app.logger.exception(f"Fehler bei der Kopie der Veranstaltung: {str(e)}")
         flash(str(e), 'danger')
         return redirect(url_for('main.index'))
     except Exception as e:
         db.session.rollback()
-        current_app.logger.error(f"Fehler bei der Kopie der Veranstaltung: {str(e)}\n{traceback.format_exc()}")
+        current_app.logger.exception(f"Fehler bei der Kopie der Veranstaltung: {str(e)}")
         flash('Ein Fehler ist aufgetreten, während die Veranstaltung kopiert wurde.', 'danger')
         return redirect(url_for('main.index'))
 
@@ -229,7 +307,7 @@ def toggle_visibility(event_id):
         return redirect(url_for('main.index'))
     except Exception as e:
         db.session.rollback()
-        current_app.logger.error(f"Fehler bei der Aktualisierung der Sichtbarkeit der Veranstaltung: {str(e)}\n{traceback.format_exc()}")
+        current_app.logger.exception(f"Fehler bei der Aktualisierung der Sichtbarkeit der Veranstaltung: {str(e)}")
         flash('Fehler bei der Aktualisierung der Sichtbarkeit der Veranstaltung', 'danger')
         return redirect(url_for('main.index'))
 
@@ -237,71 +315,128 @@ def toggle_visibility(event_id):
 @login_required
 def view_registrations(event_id):
     event = Event.query.get_or_404(event_id)
-    bookings = Booking.query.filter_by(event_id=event_id).order_by(Booking.created_at.desc()).all()
+    bookings = Booking.for_event_query(event_id).all()
     return render_template('registrations.html', event=event, bookings=bookings)
 
+EXPORT_HEADERS = ["Name", "Telefonnummer", "E-Mail"]
+EXPORT_BATCH_SIZE = 1000
+
+def _iter_export_rows(event_id, booking_model=Booking):
+    """Yield (name, phone, email) tuples in batches without loading all bookings."""
+    query = (booking_model.for_event_query(event_id)
+             .with_entities(booking_model.name, booking_model.phone, booking_model.email)
+             .execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for row in query:
+        yield tuple(row)
+
+def _stream_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # Byte order mark so Excel detects UTF-8
+    buffer.write('\ufeff')
+    writer.writerow(EXPORT_HEADERS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _stream_ndjson(rows):
+    keys = ('name', 'phone', 'email')
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(keys, row)), ensure_ascii=False))
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+def _build_xlsx(rows):
+    """Write the workbook in write-only mode to a temporary file on disk."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet("Registrierungen")
+    worksheet.append(EXPORT_HEADERS)
+    for row in rows:
+        worksheet.append(row)
+
+    excel_file = tempfile.TemporaryFile()
+    workbook.save(excel_file)
+    excel_file.seek(0)
+    return excel_file
+
+EXPORT_FORMATS = ('xlsx', 'csv', 'ndjson')
+
+def registrations_export(event, export_format, booking_model=Booking):
+    """
+    Build the download response for an event's registrations.
+
+    Args:
+        event: Event (or archived event) whose registrations are exported
+        export_format (str): One of EXPORT_FORMATS
+        booking_model: Booking or ArchivedBooking
+
+    Returns:
+        Response
+    """
+    # Generate a filename with the event date in YYYY-MM-DD format
+    event_date_str = event.date.strftime('%Y-%m-%d')
+    filename = f"{event_date_str}-Anmeldungen.{export_format}"
+    rows = _iter_export_rows(event.id, booking_model)
+    
+    if export_format == 'xlsx':
+        return send_file(
+            _build_xlsx(rows),
+            as_attachment=True,
+            download_name=filename,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    
+    if export_format == 'csv':
+        body, mimetype = _stream_csv(rows), 'text/csv; charset=utf-8'
+    else:
+        body, mimetype = _stream_ndjson(rows), 'application/x-ndjson; charset=utf-8'
+    
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 @bp.route('/event/<int:event_id>/export')
 @login_required
 def export_registrations(event_id):
-    """Export event registrations as Excel file."""
+    """Export event registrations as Excel (default), CSV or NDJSON file."""
     # Ensure user is admin
     if not current_user.is_admin:
         flash('Zugriff verweigert. Sie benötigen Administratorrechte.', 'danger')
         return redirect(url_for('main.index'))
     
-    event = Event.query.get_or_404(event_id)
-    bookings = Booking.query.filter_by(event_id=event_id).order_by(Booking.created_at.desc()).all()
-    
-    # Create a workbook and select the active worksheet
-    workbook = Workbook()
-    worksheet = workbook.active
-    worksheet.title = "Registrierungen"
-    
-    # Add headers
-    headers = ["Name", "Telefonnummer", "E-Mail"]
-    for col_num, header in enumerate(headers, 1):
-        worksheet.cell(row=1, column=col_num, value=header)
+    export_format = request.args.get('format', 'xlsx').lower()
+    if export_format not in EXPORT_FORMATS:
+        flash('Unbekanntes Exportformat.', 'danger')
+        return redirect(url_for('main.view_registrations', event_id=event_id))
     
-    # Add data
-    for row_num, booking in enumerate(bookings, 2):
-        worksheet.cell(row=row_num, column=1, value=booking.name)
-        worksheet.cell(row=row_num, column=2, value=booking.phone)
-        worksheet.cell(row=row_num, column=3, value=booking.email)
-    
-    # Create a BytesIO object to store the Excel file
-    excel_file = io.BytesIO()
-    workbook.save(excel_file)
-    excel_file.seek(0)
-    
-    # Generate a filename with the event date in YYYY-MM-DD format
-    event_date_str = event.date.strftime('%Y-%m-%d')
-    filename = f"{event_date_str}-Anmeldungen.xlsx"
-    
-    return send_file(
-        excel_file,
-        as_attachment=True,
-        download_name=filename,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
+    event = Event.query.get_or_404(event_id)
+    return registrations_export(event, export_format)
 
 @bp.route('/booking/<int:booking_id>/delete', methods=['POST'])
 @login_required
 def delete_booking(booking_id):
     booking = Booking.query.get_or_404(booking_id)
-    event = Event.query.get(booking.event_id)
-    
-    # Decrement the bookings count
-    event.bookings = max(0, event.bookings - 1)
     
-    # Delete the booking
+    # Delete the booking and decrement the bookings count
     try:
+        Event.release_seat(booking.event_id)
         db.session.delete(booking)
         db.session.commit()
         flash('Anmeldung erfolgreich gelöscht.', 'success')
         return redirect(url_for('main.view_registrations', event_id=booking.event_id))
     except Exception as e:
         db.session.rollback()
-        current_app.logger.error(f"Fehler bei der Löschung der Anmeldung: {str(e)}\n{traceback.format_exc()}")
+        current_app.logger.exception(f"Fehler bei der Löschung der Anmeldung: {str(e)}")
         flash('Ein Fehler ist aufgetreten, während die Anmeldung gelöscht wurde.', 'error')
         return redirect(url_for('main.view_registrations', event_id=booking.event_id))
 
@@ -325,10 +460,20 @@ def delete_event(event_id):
         return redirect(url_for('main.index'))
     except Exception as e:
         db.session.rollback()
-        current_app.logger.error(f"Fehler bei der Löschung der Veranstaltung: {str(e)}\n{traceback.format_exc()}")
+        current_app.logger.exception(f"Fehler bei der Löschung der Veranstaltung: {str(e)}")
         flash('Ein Fehler ist aufgetreten, während die Veranstaltung gelöscht wurde.', 'error')
         return redirect(url_for('main.index'))
 
+@bp.route('/theme/<filename>')
+def theme_stylesheet(filename):
+    """Stylesheet with the configured colors; the name changes with the colors."""
+    return theme.send_stylesheet(filename)
+
+@bp.route('/assets/<path:filename>')
+def asset(filename):
+    """Fingerprinted static asset from ``flask build-assets``."""
+    return assets.send_asset(filename)
+
 @bp.route('/health')
 def health_check():
     """Health check endpoint for Docker container."""
@@ -341,10 +486,22 @@ def health_check():
             'timestamp': datetime.now(timezone.utc).isoformat()
         }), 200
     except Exception as e:
-        current_app.logger.error(f"Fehler bei der Überprüfung der Gesundheit: {str(e)}\n{traceback.format_exc()}")
+        current_app.logger.exception(f"Fehler bei der Überprüfung der Gesundheit: {str(e)}")
         return jsonify({
             'status': 'unhealthy',
             'database': 'disconnected',
             'error': str(e),
             'timestamp': datetime.now(timezone.utc).isoformat()
         }), 503
+
+@bp.route('/metrics')
+def metrics():
+    """Prometheus metrics for all workers, for admins or a scraper with METRICS_TOKEN."""
+    token = current_app.config.get('METRICS_TOKEN')
+    authorization = request.headers.get('Authorization', '')
+    has_token = bool(token) and hmac.compare_digest(authorization, f'Bearer {token}')
+    if not has_token and not (current_user.is_authenticated and current_user.is_admin):
+        return jsonify({'error': 'Forbidden'}), 403
+
+    return Response(render_metrics(current_app._get_current_object()),
+                    mimetype='text/plain; version=0.0.4')
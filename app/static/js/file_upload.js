@@ -0,0 +1,92 @@
+// Chunked, resumable uploads for the downloads page.
+// Falls back to the plain form upload if the upload API is not reachable.
+document.addEventListener('DOMContentLoaded', function() {
+    const input = document.getElementById('fileInput');
+    if (!input || !window.fetch || !window.localStorage) {
+        return;
+    }
+    const form = input.form;
+    const status = document.getElementById('uploadStatus');
+    const apiUrl = form.dataset.uploadsUrl;
+    const chunkSize = 5 * 1024 * 1024;
+
+    function sessionKey(file) {
+        return `upload:${file.name}:${file.size}:${file.lastModified}`;
+    }
+
+    async function startOrResume(file) {
+        const saved = localStorage.getItem(sessionKey(file));
+        if (saved) {
+            const response = await fetch(`${apiUrl}/${saved}`);
+            if (response.ok) {
+                return response.json();
+            }
+        }
+        const response = await fetch(apiUrl, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({filename: file.name, size: file.size})
+        });
+        if (!response.ok) {
+            throw new Error((await response.json()).error);
+        }
+        const session = await response.json();
+        localStorage.setItem(sessionKey(file), session.upload_id);
+        return session;
+    }
+
+    async function upload(file) {
+        const session = await startOrResume(file);
+        let offset = session.offset;
+        let retries = 0;
+        do {
+            const end = Math.min(offset + chunkSize, file.size);
+            status.textContent = `${Math.round(100 * offset / Math.max(file.size, 1))} %`;
+            let response;
+            try {
+                response = await fetch(`${apiUrl}/${session.upload_id}`, {
+                    method: 'PUT',
+                    headers: {'Content-Range': `bytes ${offset}-${Math.max(end - 1, 0)}/${file.size}`},
+                    body: file.slice(offset, end)
+                });
+            } catch (error) {
+                // Network error: ask the server where to continue
+                if (++retries > 5) {
+                    throw error;
+                }
+                await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+                offset = (await (await fetch(`${apiUrl}/${session.upload_id}`)).json()).offset;
+                continue;
+            }
+            const result = await response.json();
+            if (response.status === 409) {
+                offset = result.offset;
+                continue;
+            }
+            if (!response.ok) {
+                throw new Error(result.error);
+            }
+            retries = 0;
+            offset = result.offset;
+            if (result.done) {
+                localStorage.removeItem(sessionKey(file));
+                return;
+            }
+        } while (true);
+    }
+
+    input.onchange = null;
+    input.addEventListener('change', async function() {
+        const file = input.files[0];
+        if (!file) {
+            return;
+        }
+        try {
+            await upload(file);
+            window.location.reload();
+        } catch (error) {
+            status.textContent = '';
+            form.submit();
+        }
+    });
+});
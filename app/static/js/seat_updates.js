@@ -0,0 +1,90 @@
+// Live remaining-seat counts on the event listing and the booking page.
+// Uses the Server-Sent Events stream when the server offers one and polls the
+// snapshot (cheap 304s while nothing changes) otherwise.
+(function() {
+    const script = document.currentScript;
+    const snapshotUrl = script.dataset.snapshotUrl;
+    const streamUrl = script.dataset.streamUrl;
+    const pollMs = (parseInt(script.dataset.pollSeconds, 10) || 5) * 1000;
+
+    function badge(remaining) {
+        return remaining > 0
+            ? `<span class="badge bg-success">${remaining} Plätze frei</span>`
+            : '<span class="badge bg-danger">Ausgebucht</span>';
+    }
+
+    function updateCard(card, remaining) {
+        const capacity = parseInt(card.dataset.capacity, 10);
+        const badgeElement = card.querySelector('[data-seats-badge]');
+        const booked = card.querySelector('[data-seats-booked]');
+        const action = card.querySelector('[data-seats-action]');
+        if (badgeElement) {
+            badgeElement.innerHTML = badge(remaining);
+        }
+        if (booked && !isNaN(capacity)) {
+            booked.textContent = `${capacity - remaining}/${capacity} belegt`;
+        }
+        if (action) {
+            action.innerHTML = remaining > 0
+                ? `<a href="${card.dataset.bookUrl}" class="btn btn-primary w-100">Jetzt buchen</a>`
+                : '<button class="btn btn-secondary" disabled>Ausgebucht</button>';
+        }
+        const count = card.querySelector('[data-seats-remaining]');
+        if (count) {
+            count.textContent = remaining;
+            ['book-button', 'additional-book-button'].forEach(function(id) {
+                const button = document.getElementById(id);
+                if (button && remaining <= 0) {
+                    button.disabled = true;
+                    button.textContent = 'Ausgebucht';
+                }
+            });
+        }
+    }
+
+    function apply(seats) {
+        document.querySelectorAll('[data-seats-event]').forEach(function(card) {
+            const remaining = seats[card.dataset.seatsEvent];
+            if (remaining !== undefined) {
+                updateCard(card, remaining);
+            }
+        });
+    }
+
+    let etag = null;
+
+    async function poll() {
+        try {
+            const response = await fetch(snapshotUrl, {headers: etag ? {'If-None-Match': etag} : {}});
+            if (response.status === 200) {
+                etag = response.headers.get('ETag');
+                apply((await response.json()).seats);
+            }
+        } catch (e) {
+            // Try again with the next poll
+        }
+        setTimeout(poll, document.hidden ? pollMs * 6 : pollMs);
+    }
+
+    function start() {
+        if (!document.querySelector('[data-seats-event]')) {
+            return;
+        }
+        if (streamUrl && window.EventSource) {
+            const source = new EventSource(streamUrl);
+            source.addEventListener('seats', function(e) {
+                apply(JSON.parse(e.data));
+            });
+            source.onerror = function() {
+                // The browser reconnects by itself unless the server refused the stream
+                if (source.readyState === EventSource.CLOSED) {
+                    poll();
+                }
+            };
+            return;
+        }
+        poll();
+    }
+
+    document.addEventListener('DOMContentLoaded', start);
+})();
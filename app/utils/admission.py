@@ -0,0 +1,211 @@
+"""Waiting room for events with an admission limit.
+
+Visitors of such an event get an ordered ticket and wait until fewer than
+``admission_limit`` tickets of the event are admitted; only admitted
+visitors can submit the booking form, so at most that many booking attempts
+contend on the event row. Tickets live in a small SQLite file in the
+instance folder, shared by all gunicorn workers, so polling the waiting room
+never touches the application database.
+
+A ticket is admitted until its booking finishes or ADMISSION_WINDOW seconds
+have passed. Waiting tickets that were not polled for ADMISSION_ABANDON_AFTER
+seconds are skipped, so closed tabs do not hold up the queue.
+"""
+import math
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from flask import current_app, session
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ticket (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_id INTEGER NOT NULL,
+    token TEXT NOT NULL UNIQUE,
+    admission_limit INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'waiting',
+    created_at REAL NOT NULL,
+    seen_at REAL NOT NULL,
+    admitted_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_ticket_event_status ON ticket (event_id, status, id);
+"""
+
+# Waiting tickets refresh their seen_at at most this often (seconds)
+TOUCH_INTERVAL = 5
+# Booking time assumed for the wait estimate until real bookings finished
+DEFAULT_BOOKING_SECONDS = 60
+# Tickets are deleted this long after they were created
+RETENTION = 86400
+
+_local = threading.local()
+
+def _db_path(app):
+    return app.config.get('ADMISSION_DB') or os.path.join(app.instance_path, 'admission.db')
+
+def _connect():
+    """Per-thread connection to the ticket database, reopened after a fork."""
+    app = current_app
+    path = _db_path(app)
+    cached = getattr(_local, 'connection', None)
+    if cached is not None and cached[0] == (path, os.getpid()):
+        return cached[1]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    connection = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.executescript(SCHEMA)
+    _local.connection = ((path, os.getpid()), connection)
+    return connection
+
+def _window():
+    return current_app.config.get('ADMISSION_WINDOW', 300)
+
+def _abandon_after():
+    return current_app.config.get('ADMISSION_ABANDON_AFTER', 30)
+
+def _active_count(connection, event_id, now):
+    return connection.execute(
+        "SELECT count(*) FROM ticket WHERE event_id = ? AND status = 'admitted' AND admitted_at >= ?",
+        (event_id, now - _window())
+    ).fetchone()[0]
+
+def _admit(connection, event_id, limit, now):
+    """Admit the oldest live waiting tickets into the free slots. Runs inside a write transaction."""
+    connection.execute(
+        "UPDATE ticket SET status = 'admitted', admitted_at = ? WHERE id IN ("
+        " SELECT id FROM ticket WHERE event_id = ? AND status = 'waiting' AND seen_at >= ?"
+        " ORDER BY id LIMIT max(0, ? - ("
+        "  SELECT count(*) FROM ticket WHERE event_id = ? AND status = 'admitted' AND admitted_at >= ?)))",
+        (now, event_id, now - _abandon_after(), limit, event_id, now - _window())
+    )
+
+def _waiting_ahead(connection, event_id, ticket_id, now):
+    return connection.execute(
+        "SELECT count(*) FROM ticket WHERE event_id = ? AND status = 'waiting' AND id < ? AND seen_at >= ?",
+        (event_id, ticket_id, now - _abandon_after())
+    ).fetchone()[0]
+
+def _write(connection, statement, parameters, event_id, limit, now):
+    """Run one statement and refill the free slots in a single write transaction."""
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        cursor = connection.execute(statement, parameters)
+        _admit(connection, event_id, limit, now)
+        connection.execute('COMMIT')
+    except Exception:
+        connection.execute('ROLLBACK')
+        raise
+    return cursor
+
+def join(event_id, limit):
+    """
+    Put a new ticket at the end of the event's queue.
+
+    Args:
+        event_id (int): Event to book
+        limit (int): The event's admission limit
+
+    Returns:
+        str: Ticket token
+    """
+    token = secrets.token_urlsafe(16)
+    now = time.time()
+    connection = _connect()
+    cursor = _write(
+        connection,
+        'INSERT INTO ticket (event_id, token, admission_limit, created_at, seen_at) VALUES (?, ?, ?, ?, ?)',
+        (event_id, token, limit, now, now), event_id, limit, now
+    )
+    if cursor.lastrowid % 1000 == 0:
+        connection.execute('DELETE FROM ticket WHERE created_at < ?', (now - RETENTION,))
+    return token
+
+def ticket_status(token):
+    """
+    Return the state of a ticket, admitting waiting tickets into free slots.
+
+    Returns:
+        dict: ``state`` (waiting, admitted, expired or done), ``position`` in the
+            queue and ``eta_seconds`` while waiting, or None for unknown tokens
+    """
+    if not token:
+        return None
+    connection = _connect()
+    now = time.time()
+    row = connection.execute(
+        'SELECT id, event_id, admission_limit, status, seen_at, admitted_at FROM ticket WHERE token = ?', (token,)
+    ).fetchone()
+    if row is None:
+        return None
+    ticket_id, event_id, limit, status, seen_at, admitted_at = row
+
+    if status == 'waiting':
+        ahead = _waiting_ahead(connection, event_id, ticket_id, now)
+        # Only tickets that fit into a free slot, or that have to show they are
+        # still polled, write; everybody else just reads
+        free = limit - _active_count(connection, event_id, now)
+        if ahead < free or now - seen_at >= TOUCH_INTERVAL:
+            _write(connection, 'UPDATE ticket SET seen_at = ? WHERE id = ?', (now, ticket_id), event_id, limit, now)
+            status, admitted_at = connection.execute(
+                'SELECT status, admitted_at FROM ticket WHERE id = ?', (ticket_id,)
+            ).fetchone()
+            if status == 'waiting':
+                ahead = _waiting_ahead(connection, event_id, ticket_id, now)
+
+    if status == 'admitted':
+        state = 'admitted' if admitted_at >= now - _window() else 'expired'
+        return {'state': state, 'position': 0, 'eta_seconds': 0}
+    if status != 'waiting':
+        return {'state': status, 'position': 0, 'eta_seconds': 0}
+
+    booking_seconds = connection.execute(
+        "SELECT avg(finished_at - admitted_at) FROM (SELECT finished_at, admitted_at FROM ticket"
+        " WHERE event_id = ? AND status = 'done' ORDER BY id DESC LIMIT 20)",
+        (event_id,)
+    ).fetchone()[0] or DEFAULT_BOOKING_SECONDS
+    return {
+        'state': 'waiting',
+        'position': ahead + 1,
+        'eta_seconds': int(math.ceil((ahead + 1) / limit) * booking_seconds),
+    }
+
+def is_admitted(token):
+    """True if the ticket may submit a booking now."""
+    status = ticket_status(token)
+    return status is not None and status['state'] == 'admitted'
+
+def finish(token):
+    """Hand the ticket's slot to the next waiting ticket after its booking attempt."""
+    if not token:
+        return
+    connection = _connect()
+    row = connection.execute('SELECT event_id, admission_limit FROM ticket WHERE token = ?', (token,)).fetchone()
+    if row is None:
+        return
+    now = time.time()
+    _write(
+        connection,
+        "UPDATE ticket SET status = 'done', finished_at = ? WHERE token = ? AND status = 'admitted'",
+        (now, token), row[0], row[1], now
+    )
+
+def active_admissions(event_id):
+    """Number of currently admitted tickets of an event."""
+    return _active_count(_connect(), event_id, time.time())
+
+# Tickets of the current visitor are kept in the signed session cookie
+
+def session_token(event_id):
+    return session.get('admission', {}).get(str(event_id))
+
+def remember(event_id, token):
+    tickets = dict(session.get('admission', {}))
+    if token is None:
+        tickets.pop(str(event_id), None)
+    else:
+        tickets[str(event_id)] = token
+    session['admission'] = tickets
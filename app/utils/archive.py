@@ -0,0 +1,148 @@
+"""Move past events and their bookings into the archive database.
+
+User-facing pages only need upcoming events, so events that started more than
+ARCHIVE_AFTER_DAYS days ago are moved with their bookings to the "archive"
+bind (a separate SQLite file) and deleted from the hot tables. Each batch is
+first copied and committed in the archive, then deleted in the main database
+after the copied rows were counted; copying replaces what an earlier attempt
+left in the archive, so a run interrupted between the two steps is simply
+repeated.
+
+Runs from ``flask archive-events`` or, with ARCHIVE_INTERVAL_HOURS, from a
+background thread; a lock file keeps workers from archiving at the same time.
+"""
+import fcntl
+import os
+import threading
+import time
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import select, delete, insert, func
+from ..extensions import db
+from ..models.models import Event, Booking, ArchivedEvent, ArchivedBooking, get_utc_now
+
+# Bookings are copied in chunks of this many rows
+BOOKING_CHUNK_SIZE = 5000
+
+_schema_ready = set()
+
+def archive_engine():
+    return db.engines['archive']
+
+def ensure_archive_schema():
+    """Create the archive tables once per process."""
+    engine = archive_engine()
+    if engine.url not in _schema_ready:
+        db.metadatas['archive'].create_all(bind=engine)
+        _schema_ready.add(engine.url)
+
+def _lock_path():
+    return os.path.join(current_app.instance_path, 'archive.lock')
+
+def _copy_batch(event_ids, archived_at):
+    """Copy events and their bookings into the archive. Returns the number of bookings."""
+    event_table, booking_table = Event.__table__, Booking.__table__
+    copied = 0
+    with db.engine.connect() as source, archive_engine().begin() as target:
+        events = source.execute(select(event_table).where(event_table.c.id.in_(event_ids))).mappings().all()
+        if events:
+            target.execute(insert(ArchivedEvent.__table__).prefix_with('OR REPLACE'),
+                           [dict(event, archived_at=archived_at) for event in events])
+        # Leftovers of an interrupted run are replaced by the current bookings
+        target.execute(delete(ArchivedBooking.__table__).where(ArchivedBooking.__table__.c.event_id.in_(event_ids)))
+
+        bookings = source.execution_options(yield_per=BOOKING_CHUNK_SIZE).execute(
+            select(booking_table).where(booking_table.c.event_id.in_(event_ids))
+        ).mappings()
+        for chunk in bookings.partitions():
+            target.execute(insert(ArchivedBooking.__table__), [dict(row) for row in chunk])
+            copied += len(chunk)
+    return copied
+
+def _delete_batch(event_ids, copied):
+    """Delete the batch from the main database unless bookings changed since the copy."""
+    booking_table = Booking.__table__
+    with db.engine.begin() as connection:
+        remaining = connection.execute(
+            select(func.count()).select_from(booking_table).where(booking_table.c.event_id.in_(event_ids))
+        ).scalar()
+        if remaining != copied:
+            raise RuntimeError(f'{remaining} bookings found, {copied} copied; batch left in place')
+        connection.execute(delete(booking_table).where(booking_table.c.event_id.in_(event_ids)))
+        connection.execute(delete(Event.__table__).where(Event.__table__.c.id.in_(event_ids)))
+
+def archive_past_events(older_than_days=None, batch_size=None, dry_run=False):
+    """
+    Move events older than the cutoff and their bookings to the archive.
+
+    Args:
+        older_than_days (int): Archive events that started more than this many
+            days ago (default ARCHIVE_AFTER_DAYS)
+        batch_size (int): Events per batch (default ARCHIVE_BATCH_SIZE)
+        dry_run (bool): Only count what would be moved
+
+    Returns:
+        dict: Moved ``events`` and ``bookings`` and the number of ``batches``;
+            ``skipped`` is True if another process was archiving
+    """
+    config = current_app.config
+    older_than_days = config['ARCHIVE_AFTER_DAYS'] if older_than_days is None else older_than_days
+    batch_size = batch_size or config['ARCHIVE_BATCH_SIZE']
+    cutoff = get_utc_now() - timedelta(days=older_than_days)
+    stats = {'events': 0, 'bookings': 0, 'batches': 0, 'skipped': False}
+
+    if dry_run:
+        due = select(Event.id).where(Event.date < cutoff)
+        stats['events'] = db.session.execute(select(func.count()).select_from(due.subquery())).scalar()
+        stats['bookings'] = db.session.execute(
+            select(func.count(Booking.id)).where(Booking.event_id.in_(due))
+        ).scalar()
+        return stats
+
+    os.makedirs(current_app.instance_path, exist_ok=True)
+    with open(_lock_path(), 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            stats['skipped'] = True
+            return stats
+
+        ensure_archive_schema()
+        archived_at = get_utc_now()
+        while True:
+            event_ids = db.session.execute(
+                select(Event.id).where(Event.date < cutoff).order_by(Event.id).limit(batch_size)
+            ).scalars().all()
+            db.session.rollback()
+            if not event_ids:
+                break
+            copied = _copy_batch(event_ids, archived_at)
+            _delete_batch(event_ids, copied)
+            stats['events'] += len(event_ids)
+            stats['bookings'] += copied
+            stats['batches'] += 1
+
+    if stats['events']:
+        current_app.logger.info(f"Archived {stats['events']} events with {stats['bookings']} bookings "
+                                f"older than {older_than_days} days in {stats['batches']} batches")
+    return stats
+
+def start_archive_worker(app, interval_hours=None):
+    """Archive past events from a daemon thread every ARCHIVE_INTERVAL_HOURS hours."""
+    interval = (interval_hours or app.config['ARCHIVE_INTERVAL_HOURS']) * 3600
+
+    def run():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    archive_past_events()
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.error(f"Archiving failed: {str(e)}")
+                finally:
+                    db.session.remove()
+
+    thread = threading.Thread(target=run, name='event-archive', daemon=True)
+    thread.start()
+    return thread
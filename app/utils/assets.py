@@ -0,0 +1,205 @@
+"""Self-hosted, fingerprinted static assets.
+
+Third-party assets (Bootstrap, Bootstrap Icons) are checked in below
+``static/vendor/``; ``flask vendor-assets`` verifies them against their pinned
+SRI hashes and downloads missing ones. ``flask build-assets`` then
+minifies every file under ``static/`` (except the output), names it after a
+hash of its content and writes it to ``static/dist/`` together with ``.gz`` and
+``.br`` variants and a ``manifest.json`` that maps source paths to built
+paths. Templates link assets with ``asset_url('js/event_form.js')``; built
+files are served with immutable caching.
+
+Without a build, for example in the development container, ``asset_url``
+falls back to the plain static file and, for vendor files that have not been
+downloaded, to the CDN they come from.
+"""
+import base64
+import hashlib
+import json
+import os
+import re
+import shutil
+from flask import current_app, url_for
+from .static_files import fingerprinted_name, write_with_variants, send_precompressed
+
+BUILD_DIR = 'dist'
+MANIFEST = 'manifest.json'
+
+# (path below static/, source URL, SRI hash)
+VENDOR_ASSETS = (
+    ('vendor/bootstrap/bootstrap.min.css',
+     'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css',
+     'sha384-1BmE4kWBq78iYhFldvKuhfTAU6auU8tT94WrHftjDbrCEXSU1oBoqyl2QvZ6jIW3'),
+    # Only collapse and tabs are used, so Bootstrap without the Popper bundle suffices
+    ('vendor/bootstrap/bootstrap.min.js',
+     'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.min.js',
+     'sha384-QJHtvGhmr9XOIpI6YVutG+2QOK9T+ZnN4kzFN1RtK3zEFEIsxhlmWl5/YESvpZ13'),
+    ('vendor/bootstrap-icons/bootstrap-icons.min.css',
+     'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.13.1/font/bootstrap-icons.min.css',
+     'sha384-CK2SzKma4jA5H/MXDUU7i1TqZlCFaD4T01vtyDFvPlD97JQyS+IsSh1nI2EFbpyk'),
+    ('vendor/bootstrap-icons/fonts/bootstrap-icons.woff2',
+     'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.13.1/font/fonts/bootstrap-icons.woff2',
+     'sha384-xEoI56EFpIZiDZZKBZxsn3gO3u/FvXtOpHbtkMWmSdfzDw3x9XdVc3i70O9hm4SC'),
+    ('vendor/bootstrap-icons/fonts/bootstrap-icons.woff',
+     'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.13.1/font/fonts/bootstrap-icons.woff',
+     'sha384-IYfD9pNP/nesQsPyYtTdGCb4uhEWUmNF8GxaCvqcJFH+Of3c1b0VbH6hdHUonDSC'),
+)
+
+# Files worth compressing; fonts and images already are
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt')
+
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+_SOURCE_MAP = re.compile(r'\n?/[*/]# sourceMappingURL=[^\n]*?(?:\*/)?\s*$')
+
+def _integrity(data):
+    return 'sha384-' + base64.b64encode(hashlib.sha384(data).digest()).decode('ascii')
+
+def vendor_assets(static_folder, force=False, log=print):
+    """
+    Verify the third-party assets in ``static/vendor/`` and download missing ones.
+
+    Args:
+        static_folder (str): The app's static folder
+        force (bool): Download files that already exist again
+        log: Callable for progress messages
+
+    Returns:
+        int: Number of downloaded files
+
+    Raises:
+        ValueError: If a file on disk or a download does not match its pinned SRI hash
+    """
+    downloaded = 0
+    for path, url, integrity in VENDOR_ASSETS:
+        target = os.path.join(static_folder, path)
+        if os.path.exists(target) and not force:
+            with open(target, 'rb') as f:
+                actual = _integrity(f.read())
+            if actual != integrity:
+                raise ValueError(f'{path} does not match its pinned hash ({actual})')
+            continue
+
+        import requests
+        response = requests.get(url, timeout=30)
+        response.raise_for_status()
+        actual = _integrity(response.content)
+        if actual != integrity:
+            raise ValueError(f'{url} does not match its pinned hash ({actual})')
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(response.content)
+        log(f'{path} ({len(response.content)} bytes, {actual})')
+        downloaded += 1
+    return downloaded
+
+def _minify(path, data):
+    """Minify CSS and JS unless the file already is; without rcssmin/rjsmin only source maps are dropped."""
+    ext = os.path.splitext(path)[1]
+    if ext not in ('.css', '.js'):
+        return data
+    text = _SOURCE_MAP.sub('', data.decode('utf-8'))
+    if '.min.' not in os.path.basename(path):
+        try:
+            if ext == '.css':
+                from rcssmin import cssmin
+                text = cssmin(text)
+            else:
+                from rjsmin import jsmin
+                text = jsmin(text)
+        except ImportError:
+            pass
+    return text.encode('utf-8')
+
+def _rewrite_css_urls(path, data, manifest):
+    """Point relative url() references of a stylesheet at the built files."""
+    directory = os.path.dirname(path)
+
+    def replace(match):
+        reference = match.group(2)
+        if re.match(r'^(?:[a-z]+:|/|#)', reference):
+            return match.group(0)
+        target = os.path.normpath(os.path.join(directory, reference.split('?')[0].split('#')[0]))
+        built = manifest.get(target.replace(os.sep, '/'))
+        if built is None:
+            return match.group(0)
+        fragment = '#' + reference.split('#', 1)[1] if '#' in reference else ''
+        return f'url("{os.path.relpath(built, directory or ".").replace(os.sep, "/")}{fragment}")'
+
+    return _CSS_URL.sub(replace, data.decode('utf-8')).encode('utf-8')
+
+def build_assets(static_folder):
+    """
+    Minify, fingerprint and precompress everything below ``static_folder``.
+
+    Args:
+        static_folder (str): The app's static folder
+
+    Returns:
+        dict: Manifest mapping source paths to built paths
+    """
+    output = os.path.join(static_folder, BUILD_DIR)
+    shutil.rmtree(output, ignore_errors=True)
+
+    sources = []
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != output)
+        for name in sorted(files):
+            if not name.startswith('.') and not name.endswith('.map'):
+                sources.append(os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, '/'))
+
+    # Stylesheets last, so the files they reference already have their names
+    sources.sort(key=lambda path: path.endswith('.css'))
+    manifest = {}
+    for path in sources:
+        with open(os.path.join(static_folder, path), 'rb') as f:
+            data = _minify(path, f.read())
+        if path.endswith('.css'):
+            data = _rewrite_css_urls(path, data, manifest)
+        built = '/'.join(filter(None, (os.path.dirname(path), fingerprinted_name(os.path.basename(path), data))))
+        write_with_variants(os.path.join(output, built), data, compress=path.endswith(COMPRESSIBLE))
+        manifest[path] = built
+
+    with open(os.path.join(output, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+def _manifest(app):
+    """The build manifest, read once per process; empty without a build."""
+    manifest = app.extensions.get('asset_manifest')
+    if manifest is None:
+        try:
+            with open(os.path.join(app.static_folder, BUILD_DIR, MANIFEST), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        app.extensions['asset_manifest'] = manifest
+    return manifest
+
+def asset_url(path):
+    """
+    URL of a static asset, fingerprinted when the assets were built.
+
+    Args:
+        path (str): Path below ``static/``, e.g. ``js/event_form.js``
+
+    Returns:
+        str: ``/assets/<hashed path>``, the plain static URL, or the CDN URL of a
+            vendor file that was not downloaded
+    """
+    app = current_app._get_current_object()
+    built = _manifest(app).get(path)
+    if built:
+        return url_for('main.asset', filename=built)
+    if not os.path.exists(os.path.join(app.static_folder, path)):
+        for vendor_path, url, _ in VENDOR_ASSETS:
+            if vendor_path == path:
+                return url
+    return url_for('static', filename=path)
+
+def send_asset(filename):
+    """Serve a built asset with immutable caching."""
+    return send_precompressed(os.path.join(current_app.static_folder, BUILD_DIR), filename)
+
+def init_assets(app):
+    """Make ``asset_url()`` available in templates."""
+    app.context_processor(lambda: {'asset_url': asset_url})
@@ -1,20 +1,31 @@
 from flask import current_app, render_template
 from datetime import datetime
+import json
 import logging
 import os
-from mailjet_rest import Client
+import time
+
+# Mailjet's v3.1 send API accepts at most this many messages per request
+MAILJET_MAX_BATCH = 50
 
 class EmailService:
     _instance = None
 
     def __init__(self):
         """Initialize the Mailjet client with API credentials"""
+        if current_app.config.get('MAILJET_BACKEND') == 'fake':
+            from .fake_mailjet import FakeMailjetClient
+            self.client = FakeMailjetClient()
+            return
+
         self.api_key = current_app.config.get('MAILJET_API_KEY') or os.environ.get('MAILJET_API_KEY')
         self.api_secret = current_app.config.get('MAILJET_API_SECRET') or os.environ.get('MAILJET_API_SECRET')
         
         if not self.api_key or not self.api_secret:
             raise ValueError('Mailjet configuration incomplete: MAILJET_API_KEY and MAILJET_API_SECRET are required')
             
+        # Imported here so workers that never send mail do not load requests & co.
+        from mailjet_rest import Client
         self.client = Client(auth=(self.api_key, self.api_secret), version='v3.1')
 
     @classmethod
@@ -24,7 +35,111 @@ class EmailService:
             cls._instance = cls()
         return cls._instance
 
-def send_email(subject, recipients, template_prefix, **template_context):
+def build_message(subject, recipients, text_part, html_part):
+    """Build a single Mailjet v3.1 message from already rendered parts."""
+    return {
+        "From": {
+            "Email": current_app.config['MAIL_USERNAME'],
+            "Name": current_app.config.get('MAIL_DEFAULT_SENDER', current_app.config['MAIL_USERNAME'])
+        },
+        "To": [{"Email": email} for email in recipients],
+        "Subject": subject,
+        "TextPart": text_part,
+        "HTMLPart": html_part
+    }
+
+def _send_batch(messages):
+    """Send up to MAILJET_MAX_BATCH messages in one API call. Returns an error or None per message."""
+    from .metrics import record_email
+
+    try:
+        email_service = EmailService.get_instance()
+    except Exception as e:
+        # Missing credentials and the like fail every message, counted per message by the caller
+        return [str(e)] * len(messages)
+    started = time.perf_counter()
+    try:
+        response = email_service.client.send.create(data={"Messages": messages})
+    except Exception as e:
+        record_email(time.perf_counter() - started, success=False, messages=len(messages))
+        return [str(e)] * len(messages)
+    record_email(time.perf_counter() - started, success=response.status_code <= 299, messages=len(messages))
+
+    try:
+        payload = response.json()
+    except Exception:
+        payload = None
+    statuses = payload.get('Messages') if isinstance(payload, dict) else None
+    if isinstance(statuses, list) and len(statuses) == len(messages):
+        return [None if status.get('Status') == 'success' else f"Mailjet API error: {status.get('Errors')}"
+                for status in statuses]
+    if response.status_code > 299:
+        return [f"Mailjet API error: {payload}"] * len(messages)
+    return [None] * len(messages)
+
+def deliver_messages(messages):
+    """
+    Hand prepared messages to Mailjet using as few API calls as possible.
+
+    Args:
+        messages (list): Messages built with ``build_message``
+
+    Returns:
+        list: None for each delivered message, else the error message, in input order
+    """
+    batch_size = max(1, min(current_app.config.get('MAILJET_BATCH_SIZE', MAILJET_MAX_BATCH), MAILJET_MAX_BATCH))
+    results = []
+    for start in range(0, len(messages), batch_size):
+        results.extend(_send_batch(messages[start:start + batch_size]))
+    return results
+
+def deliver_message(message):
+    """Hand one prepared message to Mailjet and raise if the API rejects it."""
+    error = deliver_messages([message])[0]
+    if error:
+        raise Exception(error)
+
+def enqueue_email(subject, recipients, text_part, html_part):
+    """
+    Store an email in the outbox as part of the current database transaction.
+
+    Nothing is committed here: the row becomes visible to the dispatcher only
+    when the caller commits, so a rolled back booking never sends mail.
+    """
+    from ..models import EmailOutbox
+    from ..extensions import db
+
+    entry = EmailOutbox(
+        subject=subject,
+        recipients=json.dumps(list(recipients)),
+        text_part=text_part,
+        html_part=html_part
+    )
+    db.session.add(entry)
+    return entry
+
+def enqueue_digest_entry(digest_key, recipients, payload):
+    """
+    Collect an item for a digest email instead of sending it on its own.
+
+    The outbox dispatcher combines all items with the same key into one email
+    once the oldest of them is ADMIN_DIGEST_INTERVAL seconds old. Like
+    ``enqueue_email`` this only adds to the current transaction.
+    """
+    from ..models import EmailOutbox
+    from ..extensions import db
+
+    entry = EmailOutbox(
+        subject=digest_key,
+        recipients=json.dumps(list(recipients)),
+        status='digest',
+        digest_key=digest_key,
+        payload=json.dumps(payload, default=str)
+    )
+    db.session.add(entry)
+    return entry
+
+def send_email(subject, recipients, template_prefix, deferred=False, **template_context):
     """
     Send an email using Mailjet with templates
     
@@ -32,6 +147,7 @@ def send_email(subject, recipients, template_prefix, **template_context):
         subject (str): Email subject
         recipients (list): List of recipient email addresses
         template_prefix (str): Prefix for the template files (e.g., 'registration_confirmation')
+        deferred (bool): Queue the email in the outbox instead of calling Mailjet
         **template_context: Context variables for the template
     """
     # Check if emails are disabled
@@ -44,27 +160,12 @@ def send_email(subject, recipients, template_prefix, **template_context):
         txt = render_template(f"email/{template_prefix}.txt", **template_context)
         html = render_template(f"email/{template_prefix}.html", **template_context)
         
-        email_service = EmailService.get_instance()
-        
-        # Prepare recipients for Mailjet format
-        recipients_data = [{"Email": email} for email in recipients]
-        
-        data = {
-            "Messages": [{
-                "From": {
-                    "Email": current_app.config['MAIL_USERNAME'],
-                    "Name": current_app.config.get('MAIL_DEFAULT_SENDER', current_app.config['MAIL_USERNAME'])
-                },
-                "To": recipients_data,
-                "Subject": subject,
-                "TextPart": txt,
-                "HTMLPart": html
-            }]
-        }
-        
-        response = email_service.client.send.create(data=data)
-        if response.status_code > 299:
-            raise Exception(f"Mailjet API error: {response.json()}")
+        if deferred:
+            enqueue_email(subject, recipients, txt, html)
+            current_app.logger.info(f"Email queued for {', '.join(recipients)}")
+            return
+
+        deliver_message(build_message(subject, recipients, txt, html))
             
         current_app.logger.info(f"Email successfully sent to {', '.join(recipients)}")
     except Exception as e:
@@ -88,40 +189,58 @@ def send_password_reset_email(user, token):
         reset_url=reset_url
     )
 
-def send_event_registration_confirmation(user_email, event):
+def send_event_registration_confirmation(user_email, event, deferred=False):
     """
     Send a confirmation email to the user who registered for an event
     
     Args:
         user_email (str): Email address of the registered user
         event (Event): Event object containing event details
+        deferred (bool): Queue the email in the outbox instead of sending it now
     """
     subject = f"Anmeldebestätigung - {event.title}"
     send_email(
         subject=subject,
         recipients=[user_email],
         template_prefix='registration_confirmation',
+        deferred=deferred,
         event=event
     )
 
-def send_admin_registration_notification(event, user):
+def send_admin_registration_notification(event, user, deferred=False):
     """
     Send a notification email to admin when a user registers for an event
     
     Args:
         event (Event): Event object containing event details
         user (dict): Dictionary containing user details (name, email, phone)
+        deferred (bool): Queue the email in the outbox instead of sending it now;
+            with ADMIN_NOTIFICATION_MODE=digest it is always collected for the digest
     """
     admin_email = current_app.config.get('ADMIN_EMAIL')
     if not admin_email:
         current_app.logger.warning('Admin-E-Mail nicht konfiguriert. Admin-Benachrichtigung wird übersprungen.')
         return
+
+    if current_app.config.get('ADMIN_NOTIFICATION_MODE') == 'digest' and not current_app.config.get('DISABLE_EMAILS', False):
+        # One summary per event and ADMIN_DIGEST_INTERVAL, sent by the outbox dispatcher
+        enqueue_digest_entry(f"admin-registrations:{event.id}", [admin_email], {
+            'event_id': event.id,
+            'event_title': event.title,
+            'event_date': event.date.isoformat() if event.date else None,
+            'name': user.get('name'),
+            'email': user.get('email'),
+            'phone': user.get('phone'),
+            'registered_at': datetime.now().astimezone().isoformat()
+        })
+        return
         
     subject = f"Neue Anmeldung - {event.title}"
     send_email(
         subject=subject,
         recipients=[admin_email],
         template_prefix='admin_notification',
+        deferred=deferred,
         event=event,
         user=user
     )
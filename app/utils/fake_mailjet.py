@@ -0,0 +1,54 @@
+"""In-process stand-in for the Mailjet REST client.
+
+Enabled with ``MAILJET_BACKEND=fake``. Messages are recorded instead of being
+sent, which lets tests and local load runs exercise the email path without
+network access or credentials.
+"""
+import threading
+
+
+class FakeResponse:
+    """Minimal subset of ``requests.Response`` used by the email layer."""
+
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class _FakeSendEndpoint:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, data=None, **kwargs):
+        """Record the messages of a ``send`` call and return a Mailjet-like response."""
+        messages = (data or {}).get('Messages', [])
+        with self._client.lock:
+            if self._client.fail_next > 0:
+                self._client.fail_next -= 1
+                return FakeResponse(503, {'ErrorMessage': 'Fake Mailjet failure'})
+            self._client.requests.append(data)
+            self._client.messages.extend(messages)
+        return FakeResponse(200, {
+            'Messages': [{'Status': 'success', 'To': message.get('To', [])} for message in messages]
+        })
+
+
+class FakeMailjetClient:
+    """Records every message passed to ``client.send.create``."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = []
+        self.messages = []
+        self.fail_next = 0
+        self.send = _FakeSendEndpoint(self)
+
+    def reset(self):
+        """Forget all recorded requests and pending failures."""
+        with self.lock:
+            self.requests.clear()
+            self.messages.clear()
+            self.fail_next = 0
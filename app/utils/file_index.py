@@ -0,0 +1,98 @@
+"""Metadata index of the uploaded files.
+
+Each ``stored_file`` row links a download name to content in the
+content-addressed store (``file_store``), so the download page is a single
+indexed query. Uploads and deletions keep the table current; ``rescan``
+takes in files copied into UPLOAD_FOLDER by hand and drops entries and
+content that no longer belong together.
+"""
+import mimetypes
+from datetime import datetime, timezone
+from pathlib import Path
+from flask import current_app
+from ..extensions import db
+from ..models import StoredFile
+from ..models.models import get_utc_now
+from . import file_store
+
+def upload_folder():
+    return Path(current_app.config['UPLOAD_FOLDER'])
+
+def link_file(name: str, sha256: str, size: int, modified_at=None):
+    """
+    Point a download name at stored content. The caller commits.
+
+    Returns:
+        str: Hash the name pointed to before, if it changed
+    """
+    entry = StoredFile.query.filter_by(name=name).first()
+    previous = None
+    if entry is None:
+        entry = StoredFile(name=name)
+        db.session.add(entry)
+    elif entry.sha256 != sha256:
+        previous = entry.sha256
+    entry.sha256 = sha256
+    entry.size = size
+    entry.content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    entry.modified_at = modified_at or get_utc_now()
+    return previous
+
+def unlink_file(name: str):
+    """
+    Remove the entry for a download name. The caller commits.
+
+    Returns:
+        tuple: (whether an entry existed, hash it pointed to)
+    """
+    entry = StoredFile.query.filter_by(name=name).first()
+    if entry is None:
+        return False, None
+    db.session.delete(entry)
+    return True, entry.sha256
+
+def release_content(sha256):
+    """Delete stored content once no entry links to it. Call after committing."""
+    if sha256 and not StoredFile.query.filter_by(sha256=sha256).first():
+        file_store.remove_object(sha256)
+
+def rescan():
+    """
+    Reconcile the index with the upload folder.
+
+    Files lying directly in UPLOAD_FOLDER are moved into the content store and
+    linked under their name. Entries whose content is missing are removed, as
+    are stored objects no entry links to and abandoned upload sessions.
+
+    Returns:
+        dict: Counts of added, updated and removed entries and of removed objects
+    """
+    folder = upload_folder()
+    stats = {'added': 0, 'updated': 0, 'removed': 0, 'orphans': 0}
+
+    if folder.exists():
+        for path in folder.glob('*'):
+            if not path.is_file():
+                continue
+            modified_at = datetime.fromtimestamp(path.stat().st_mtime, timezone.utc)
+            sha256, size = file_store.store_file(path)
+            existed = StoredFile.query.filter_by(name=path.name).first() is not None
+            previous = link_file(path.name, sha256, size, modified_at)
+            db.session.commit()
+            release_content(previous)
+            stats['updated' if existed else 'added'] += 1
+
+    for entry in StoredFile.query.all():
+        if entry.sha256 is None or not file_store.object_path(entry.sha256).exists():
+            db.session.delete(entry)
+            stats['removed'] += 1
+    db.session.commit()
+
+    linked = {sha256 for (sha256,) in db.session.query(StoredFile.sha256).distinct()}
+    for sha256 in list(file_store.iter_objects()):
+        if sha256 not in linked:
+            file_store.remove_object(sha256)
+            stats['orphans'] += 1
+
+    file_store.expire_uploads(current_app.config.get('UPLOAD_SESSION_TTL', 86400))
+    return stats
@@ -0,0 +1,242 @@
+"""Content-addressed storage for uploaded files.
+
+Every file body is stored once under its SHA-256 in
+``UPLOAD_FOLDER/.objects/<first two hex digits>/<sha256>``. The
+``stored_file`` table links download names to hashes, so uploading the same
+PDF under a second name only adds a row.
+
+Uploads are streamed to a temporary file in the same folder while they are
+hashed and then moved into place with ``os.replace``. Large files can be sent
+in chunks through an upload session that survives interrupted connections:
+the client asks for the current offset and continues from there.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from flask import current_app
+
+CHUNK_SIZE = 64 * 1024
+OBJECTS_DIR = '.objects'
+UPLOADS_DIR = '.uploads'
+TMP_DIR = '.tmp'
+
+# Hash state of sessions whose chunks arrived at this worker in order:
+# upload_id -> (offset, hasher). Other sessions are hashed when they finish.
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+class UploadOffsetMismatch(Exception):
+    """A chunk did not start where the upload session currently ends."""
+    def __init__(self, offset):
+        super().__init__(f'Upload continues at byte {offset}')
+        self.offset = offset
+
+def _root() -> Path:
+    return Path(current_app.config['UPLOAD_FOLDER'])
+
+def _dir(name) -> Path:
+    path = _root() / name
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def object_key(sha256: str) -> str:
+    """Path of the stored content relative to UPLOAD_FOLDER."""
+    return f'{OBJECTS_DIR}/{sha256[:2]}/{sha256}'
+
+def object_path(sha256: str) -> Path:
+    """Location of the stored content with the given hash."""
+    return _root() / object_key(sha256)
+
+def _copy_hashing(source, target, hasher, limit=None) -> int:
+    """Copy a binary stream into an open file while hashing it. Returns the byte count."""
+    written = 0
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        if not chunk:
+            return written
+        written += len(chunk)
+        if limit is not None and written > limit:
+            raise ValueError(f'Upload exceeds {limit} bytes')
+        hasher.update(chunk)
+        target.write(chunk)
+
+def _add_object(tmp_path: Path, sha256: str) -> bool:
+    """Move a fully written temporary file into the store. Returns False for duplicates."""
+    target = object_path(sha256)
+    if target.exists():
+        tmp_path.unlink()
+        return False
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp_path, target)
+    return True
+
+def store_stream(stream):
+    """
+    Store a binary stream and return its hash and size.
+
+    Args:
+        stream: File-like object, e.g. ``FileStorage.stream``
+
+    Returns:
+        tuple: (sha256 hex digest, size in bytes)
+    """
+    tmp_path = _dir(TMP_DIR) / f'{uuid.uuid4().hex}.part'
+    hasher = hashlib.sha256()
+    try:
+        with open(tmp_path, 'wb') as target:
+            size = _copy_hashing(stream, target, hasher, current_app.config.get('MAX_UPLOAD_SIZE'))
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    sha256 = hasher.hexdigest()
+    _add_object(tmp_path, sha256)
+    return sha256, size
+
+def store_file(path: Path):
+    """Move an existing file (e.g. copied into UPLOAD_FOLDER by hand) into the store."""
+    sha256, size = _hash_file(path)
+    _add_object(path, sha256)
+    return sha256, size
+
+def remove_object(sha256: str):
+    """Delete stored content. Callers make sure no stored_file row references it."""
+    object_path(sha256).unlink(missing_ok=True)
+
+def iter_objects():
+    """Yield the hashes of all stored objects."""
+    root = _root() / OBJECTS_DIR
+    if root.exists():
+        for path in root.glob('*/*'):
+            if path.is_file():
+                yield path.name
+
+# Upload sessions
+
+def _session_paths(upload_id: str):
+    if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+        return None, None
+    base = _dir(UPLOADS_DIR)
+    return base / f'{upload_id}.json', base / f'{upload_id}.part'
+
+def create_upload(filename: str, size: int) -> dict:
+    """Start a chunked upload of ``size`` bytes that will be stored as ``filename``."""
+    limit = current_app.config.get('MAX_UPLOAD_SIZE')
+    if size < 0 or (limit is not None and size > limit):
+        raise ValueError(f'Upload size must be between 0 and {limit} bytes')
+
+    upload_id = uuid.uuid4().hex
+    meta_path, part_path = _session_paths(upload_id)
+    part_path.touch()
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'filename': filename, 'size': size, 'created': time.time()}, f)
+    with _hashers_lock:
+        _hashers[upload_id] = (0, hashlib.sha256())
+    return upload_status(upload_id)
+
+def upload_status(upload_id: str):
+    """Return the session's filename, size and received offset, or None if unknown."""
+    meta_path, part_path = _session_paths(upload_id)
+    if meta_path is None or not meta_path.exists():
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    return {
+        'upload_id': upload_id,
+        'filename': meta['filename'],
+        'size': meta['size'],
+        'offset': part_path.stat().st_size if part_path.exists() else 0,
+    }
+
+def append_chunk(upload_id: str, start: int, stream) -> dict:
+    """
+    Append one chunk to an upload session.
+
+    Raises:
+        UploadOffsetMismatch: If ``start`` is not the current end of the upload
+        ValueError: If the chunk would exceed the announced size
+    """
+    status = upload_status(upload_id)
+    if start != status['offset']:
+        raise UploadOffsetMismatch(status['offset'])
+
+    _, part_path = _session_paths(upload_id)
+    with _hashers_lock:
+        offset, hasher = _hashers.pop(upload_id, (None, None))
+    if offset != start:
+        hasher = None
+
+    with open(part_path, 'ab') as target:
+        written = _copy_hashing(stream, target, hasher or hashlib.sha256(), status['size'] - start)
+
+    if hasher is not None:
+        with _hashers_lock:
+            _hashers[upload_id] = (start + written, hasher)
+    status['offset'] = start + written
+    return status
+
+def finish_upload(upload_id: str):
+    """
+    Move a complete upload into the store and end the session.
+
+    Returns:
+        tuple: (filename, sha256, size)
+    """
+    status = upload_status(upload_id)
+    if status['offset'] != status['size']:
+        raise UploadOffsetMismatch(status['offset'])
+
+    meta_path, part_path = _session_paths(upload_id)
+    with _hashers_lock:
+        offset, hasher = _hashers.pop(upload_id, (None, None))
+    if offset == status['size']:
+        sha256 = hasher.hexdigest()
+    else:
+        # Chunks were spread over several workers; hash the assembled file
+        sha256, _ = _hash_file(part_path)
+
+    _add_object(part_path, sha256)
+    meta_path.unlink(missing_ok=True)
+    return status['filename'], sha256, status['size']
+
+def _hash_file(path: Path):
+    hasher = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+            size += len(chunk)
+    return hasher.hexdigest(), size
+
+def cancel_upload(upload_id: str) -> bool:
+    """Discard an upload session and its partial data."""
+    meta_path, part_path = _session_paths(upload_id)
+    if meta_path is None or not meta_path.exists():
+        return False
+    with _hashers_lock:
+        _hashers.pop(upload_id, None)
+    part_path.unlink(missing_ok=True)
+    meta_path.unlink(missing_ok=True)
+    return True
+
+def expire_uploads(max_age: float) -> int:
+    """Remove upload sessions and temporary files untouched for ``max_age`` seconds."""
+    cutoff = time.time() - max_age
+    removed = 0
+    uploads = _root() / UPLOADS_DIR
+    if uploads.exists():
+        for meta_path in uploads.glob('*.json'):
+            part_path = meta_path.with_suffix('.part')
+            last_activity = part_path.stat().st_mtime if part_path.exists() else meta_path.stat().st_mtime
+            if last_activity < cutoff and cancel_upload(meta_path.stem):
+                removed += 1
+
+    tmp = _root() / TMP_DIR
+    if tmp.exists():
+        for path in tmp.iterdir():
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+    return removed
@@ -0,0 +1,114 @@
+"""Per-worker cache of the rendered public event listing.
+
+Every worker keeps the rendered listing in memory together with the version
+it was built from. The version is the stat signature of a small file in the
+instance folder, which is replaced whenever a transaction touching events or
+bookings commits, so all gunicorn workers notice a change with one ``stat()``
+and without any SQL.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from flask import current_app, has_app_context
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session
+
+VERSION_FILENAME = 'listing_cache.version'
+
+_lock = threading.Lock()
+_entry = None  # (version, expires_at, html)
+_listeners_installed = False
+
+def _version_path():
+    return os.path.join(current_app.instance_path, VERSION_FILENAME)
+
+def current_version():
+    """Return the current listing version, or None if it was never invalidated."""
+    try:
+        stat = os.stat(_version_path())
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def changed_at():
+    """Time of the last invalidation as a UTC datetime, or None."""
+    try:
+        mtime = os.stat(_version_path()).st_mtime
+    except FileNotFoundError:
+        return None
+    return datetime.fromtimestamp(mtime, timezone.utc)
+
+def invalidate():
+    """Mark the cached listing as stale in every worker."""
+    global _entry
+    path = _version_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(str(time.time_ns()))
+    os.replace(tmp_path, path)
+    with _lock:
+        _entry = None
+
+def get_listing():
+    """Return the cached listing HTML if it is still current, else None."""
+    entry = _entry
+    if entry is None:
+        return None
+    version, expires_at, html = entry
+    if time.time() >= expires_at or version != current_version():
+        return None
+    return html
+
+def store_listing(version, html, events):
+    """
+    Cache a rendered listing.
+
+    Args:
+        version: Value of ``current_version()`` read before the events were queried
+        html (str): Rendered listing
+        events (list): Events contained in the listing; the entry expires when the
+            earliest of them starts, because it then drops off the listing
+    """
+    global _entry
+    expires_at = time.time() + current_app.config.get('INDEX_CACHE_TTL', 300)
+    if events:
+        expires_at = min(expires_at, min(event.date.timestamp() for event in events))
+    with _lock:
+        _entry = (version, expires_at, html)
+
+def _touches_listing(mapper):
+    return mapper is not None and mapper.class_.__name__ in ('Event', 'Booking')
+
+def _flag(session):
+    session.info['listing_changed'] = True
+
+def init_listing_cache(app):
+    """Invalidate the listing whenever a commit changes events or bookings."""
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    _listeners_installed = True
+
+    @sa_event.listens_for(Session, 'after_flush')
+    def _after_flush(session, flush_context):
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if type(obj).__name__ in ('Event', 'Booking'):
+                _flag(session)
+                return
+
+    @sa_event.listens_for(Session, 'do_orm_execute')
+    def _on_bulk_statement(orm_execute_state):
+        if (orm_execute_state.is_update or orm_execute_state.is_delete) \
+                and _touches_listing(orm_execute_state.bind_mapper):
+            _flag(orm_execute_state.session)
+
+    @sa_event.listens_for(Session, 'after_commit')
+    def _after_commit(session):
+        if session.info.pop('listing_changed', False) and has_app_context():
+            invalidate()
+
+    @sa_event.listens_for(Session, 'after_rollback')
+    def _after_rollback(session):
+        session.info.pop('listing_changed', None)
@@ -0,0 +1,131 @@
+"""Structured, non-blocking logging.
+
+Request threads only put records on an in-memory queue (``QueueHandler``);
+a ``QueueListener`` thread formats them as JSON lines and writes them out,
+so slow log I/O and traceback formatting never delay a response. Records
+below WARNING can be sampled per logger with LOG_SAMPLE_RATES.
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import has_request_context, request
+from flask.logging import default_handler
+
+TEXT_FORMAT = '[%(asctime)s] %(levelname)s in %(module)s: %(message)s'
+
+_listener = None
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'thread': record.threadName,
+        }
+        for key in ('method', 'path', 'remote_addr', 'endpoint'):
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class RequestContextFilter(logging.Filter):
+    """Copy request details onto the record while still in the request thread."""
+
+    def filter(self, record):
+        if has_request_context():
+            record.method = request.method
+            record.path = request.path
+            record.remote_addr = request.remote_addr
+            record.endpoint = request.endpoint
+        return True
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of the records below WARNING for selected loggers.
+
+    Args:
+        rates (dict): Logger name prefix -> fraction of records to keep (0..1);
+            the longest matching prefix wins
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + '.'):
+                return rate >= 1 or random.random() < rate
+        return True
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock ``prepare`` formats the record, including its traceback, in the
+    calling thread. Here only the message is merged with its arguments (so
+    later changes to them cannot leak into the log); the exception is
+    formatted by the listener.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+def parse_sample_rates(value):
+    """Parse ``"werkzeug=0.1,app.app=0.5"`` into a dict of logger -> rate."""
+    rates = {}
+    for item in (value or '').split(','):
+        name, _, rate = item.partition('=')
+        if name.strip() and rate.strip():
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+def configure_logging(app):
+    """Route the app's and all other loggers through one queue and listener thread."""
+    global _listener
+
+    level = logging.getLevelName(str(app.config.get('LOG_LEVEL', 'INFO')).upper())
+    if not isinstance(level, int):
+        level = logging.INFO
+
+    # The root level covers loggers without a level of their own (werkzeug's
+    # request lines, scripts such as init_migrations.py)
+    app.logger.removeHandler(default_handler)
+    app.logger.setLevel(level)
+    logging.getLogger().setLevel(level)
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler()
+    if app.config.get('LOG_FORMAT', 'json') == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    handler = AsyncQueueHandler(queue.SimpleQueue())
+    rates = parse_sample_rates(app.config.get('LOG_SAMPLE_RATES'))
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
+    handler.addFilter(RequestContextFilter())
+    logging.getLogger().addHandler(handler)
+
+    _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,224 @@
+"""Request instrumentation shared by all gunicorn workers.
+
+Each request collects its latency, SQL statement count and time (engine
+events), template render time (Flask signals) and outbound email time. The
+numbers are added to an in-memory buffer that every worker flushes into a
+small SQLite file in the instance folder every METRICS_FLUSH_INTERVAL
+seconds, so ``/metrics`` reports the sum over all workers without touching
+the application database.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from flask import current_app, g, has_request_context, request
+from flask import before_render_template, template_rendered
+from sqlalchemy import event as sa_event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help)
+METRICS = {
+    'eventbocker_requests_total': ('counter', 'Requests by endpoint, method and status'),
+    'eventbocker_request_duration_seconds': ('histogram', 'Request latency by endpoint'),
+    'eventbocker_request_sql_statements_total': ('counter', 'SQL statements executed while handling requests'),
+    'eventbocker_request_sql_seconds_total': ('counter', 'Time spent in SQL while handling requests'),
+    'eventbocker_request_template_seconds_total': ('counter', 'Time spent rendering templates while handling requests'),
+    'eventbocker_request_email_seconds_total': ('counter', 'Time spent calling Mailjet while handling requests'),
+    'eventbocker_email_sends_total': ('counter', 'Mailjet send calls, including the outbox dispatcher'),
+    'eventbocker_email_messages_total': ('counter', 'Messages handed to Mailjet; several can share one send call'),
+    'eventbocker_email_send_seconds_total': ('counter', 'Time spent in Mailjet send calls'),
+    'eventbocker_user_cache_lookups_total': ('counter', 'Flask-Login user cache lookups by result'),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metric (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels)
+)
+"""
+
+_LE_LABEL = re.compile(r'le="([^"]*)"')
+
+_lock = threading.Lock()
+_buffer = defaultdict(float)  # (name, labels) -> delta since the last flush
+_last_flush = time.monotonic()
+_flushed_cache_stats = {'hits': 0, 'misses': 0}
+_listeners_installed = False
+
+def _labels(**labels):
+    """Render labels in Prometheus syntax with a stable order."""
+    parts = []
+    for key in sorted(labels):
+        value = str(labels[key]).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+def _bucket_order(sample):
+    """Sort key placing histogram buckets in ascending numeric order per series."""
+    labels = sample[0]
+    match = _LE_LABEL.search(labels)
+    if match is None:
+        return (labels, 0.0)
+    return (_LE_LABEL.sub('', labels), float(match.group(1)))
+
+def _add(name, labels, value):
+    with _lock:
+        _buffer[(name, labels)] += value
+
+def _db_path(app):
+    return app.config.get('METRICS_DB') or os.path.join(app.instance_path, 'metrics.db')
+
+def _connect(app):
+    path = _db_path(app)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    connection = sqlite3.connect(path, timeout=5)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute(SCHEMA)
+    return connection
+
+def record_email(seconds, success, messages=1):
+    """Record one Mailjet call, attributing its time to the current request if any."""
+    _add('eventbocker_email_sends_total', _labels(outcome='success' if success else 'error'), 1)
+    _add('eventbocker_email_messages_total', '{}', messages)
+    _add('eventbocker_email_send_seconds_total', '{}', seconds)
+    if has_request_context() and '_metrics' in g:
+        g._metrics['email'] += seconds
+
+def _collect_user_cache_stats():
+    """Turn the cumulative user cache counters of this worker into deltas."""
+    from .user_cache import cache_stats
+    stats = cache_stats()
+    for key, result in (('hits', 'hit'), ('misses', 'miss')):
+        delta = stats[key] - _flushed_cache_stats[key]
+        if delta:
+            _buffer[('eventbocker_user_cache_lookups_total', _labels(result=result))] += delta
+            _flushed_cache_stats[key] = stats[key]
+
+def flush(app):
+    """Write this worker's buffered deltas to the shared metrics file."""
+    global _last_flush
+    with _lock:
+        _collect_user_cache_stats()
+        pending = list(_buffer.items())
+        _buffer.clear()
+        _last_flush = time.monotonic()
+    if not pending:
+        return
+
+    try:
+        connection = _connect(app)
+        with connection:
+            connection.executemany(
+                'INSERT INTO metric (name, labels, value) VALUES (?, ?, ?) '
+                'ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value',
+                [(name, labels, value) for (name, labels), value in pending]
+            )
+        connection.close()
+    except sqlite3.Error as e:
+        # Put the deltas back so they are not lost on a busy database
+        with _lock:
+            for key, value in pending:
+                _buffer[key] += value
+        app.logger.warning(f"Could not flush metrics: {str(e)}")
+
+def render_metrics(app):
+    """Return all aggregated metrics in the Prometheus text exposition format."""
+    flush(app)
+    connection = _connect(app)
+    try:
+        rows = connection.execute('SELECT name, labels, value FROM metric ORDER BY name, labels').fetchall()
+    finally:
+        connection.close()
+
+    samples = defaultdict(list)
+    for name, labels, value in rows:
+        samples[name].append((labels, value))
+
+    lines = []
+    for name, (metric_type, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        prefixes = ('_bucket', '_sum', '_count') if metric_type == 'histogram' else ('',)
+        for suffix in prefixes:
+            for labels, value in sorted(samples.get(name + suffix, []), key=_bucket_order):
+                lines.append(f'{name}{suffix}{labels if labels != "{}" else ""} {value:g}')
+    return '\n'.join(lines) + '\n'
+
+def _start_request():
+    g._metrics = {'start': time.perf_counter(), 'sql_count': 0, 'sql': 0.0, 'template': 0.0, 'email': 0.0}
+
+def _remember_status(response):
+    if '_metrics' in g:
+        g._metrics['status'] = response.status_code
+    return response
+
+def _finish_request(exc):
+    """Runs on teardown, i.e. after streamed responses have been fully sent."""
+    data = g.pop('_metrics', None)
+    if data is None:
+        return
+    elapsed = time.perf_counter() - data['start']
+    endpoint = request.endpoint or '<unmatched>'
+    status = data.get('status', 500 if exc is not None else 200)
+    route = _labels(endpoint=endpoint, method=request.method)
+
+    with _lock:
+        _buffer[('eventbocker_requests_total', _labels(endpoint=endpoint, method=request.method, status=status))] += 1
+        for bound in LATENCY_BUCKETS:
+            if elapsed <= bound:
+                _buffer[('eventbocker_request_duration_seconds_bucket',
+                         _labels(endpoint=endpoint, method=request.method, le=bound))] += 1
+        _buffer[('eventbocker_request_duration_seconds_bucket',
+                 _labels(endpoint=endpoint, method=request.method, le='+Inf'))] += 1
+        _buffer[('eventbocker_request_duration_seconds_sum', route)] += elapsed
+        _buffer[('eventbocker_request_duration_seconds_count', route)] += 1
+        _buffer[('eventbocker_request_sql_statements_total', route)] += data['sql_count']
+        _buffer[('eventbocker_request_sql_seconds_total', route)] += data['sql']
+        _buffer[('eventbocker_request_template_seconds_total', route)] += data['template']
+        _buffer[('eventbocker_request_email_seconds_total', route)] += data['email']
+        due = time.monotonic() - _last_flush >= current_app.config.get('METRICS_FLUSH_INTERVAL', 5)
+
+    if due:
+        flush(current_app._get_current_object())
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and '_metrics' in g:
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('metrics_query_start')
+    if starts and has_request_context() and '_metrics' in g:
+        g._metrics['sql'] += time.perf_counter() - starts.pop()
+        g._metrics['sql_count'] += 1
+
+def _before_render(sender, template, context, **extra):
+    if '_metrics' in g:
+        g.setdefault('_metrics_render_start', []).append(time.perf_counter())
+
+def _after_render(sender, template, context, **extra):
+    starts = g.get('_metrics_render_start')
+    if starts and '_metrics' in g:
+        g._metrics['template'] += time.perf_counter() - starts.pop()
+
+def init_metrics(app):
+    """Instrument every request of the application."""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    app.before_request(_start_request)
+    app.after_request(_remember_status)
+    app.teardown_request(_finish_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    global _listeners_installed
+    if not _listeners_installed:
+        _listeners_installed = True
+        sa_event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        sa_event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
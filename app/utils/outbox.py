@@ -0,0 +1,179 @@
+"""Dispatcher for the persistent email outbox."""
+import atexit
+import json
+import threading
+import time
+from datetime import timedelta
+from flask import current_app, render_template
+from sqlalchemy import update, func
+from ..extensions import db
+from ..models import EmailOutbox, Event
+from ..models.models import get_utc_now
+from .email import build_message, deliver_messages, enqueue_email
+from . import metrics
+
+# A claimed row is invisible to other dispatchers for this long. If the
+# process dies mid-send the row becomes due again once the lease expires.
+CLAIM_LEASE = timedelta(minutes=5)
+
+def _claim(entry_ids, now):
+    """Atomically mark entries as being sent. Returns the IDs this dispatcher won."""
+    if not entry_ids:
+        return []
+    result = db.session.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(entry_ids))
+        .where(EmailOutbox.status.in_(('pending', 'sending')))
+        .where(EmailOutbox.next_attempt_at <= now)
+        .values(status='sending', next_attempt_at=now + CLAIM_LEASE)
+        .returning(EmailOutbox.id)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = result.scalars().all()
+    db.session.commit()
+    return claimed
+
+def _backoff(attempts):
+    """Exponential backoff for the given number of failed attempts."""
+    base = current_app.config.get('EMAIL_OUTBOX_BACKOFF_SECONDS', 30)
+    cap = current_app.config.get('EMAIL_OUTBOX_BACKOFF_MAX_SECONDS', 3600)
+    return timedelta(seconds=min(cap, base * (2 ** (attempts - 1))))
+
+def build_digests(now):
+    """
+    Turn collected digest items into one outbox email per digest key.
+
+    A digest is built once its oldest item is ADMIN_DIGEST_INTERVAL seconds
+    old, so every event gets at most one admin summary per interval.
+
+    Returns:
+        int: Number of digest emails queued
+    """
+    interval = timedelta(seconds=current_app.config.get('ADMIN_DIGEST_INTERVAL', 900))
+    due_keys = [key for (key,) in db.session.query(EmailOutbox.digest_key)
+                .filter(EmailOutbox.status == 'digest')
+                .group_by(EmailOutbox.digest_key)
+                .having(func.min(EmailOutbox.created_at) <= now - interval)]
+
+    built = 0
+    for key in due_keys:
+        # Claiming and queueing share one transaction, so a concurrent
+        # dispatcher finds nothing left to claim and nothing is sent twice
+        claimed = db.session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.status == 'digest')
+            .where(EmailOutbox.digest_key == key)
+            .values(status='digested', sent_at=now)
+            .returning(EmailOutbox.id, EmailOutbox.recipients, EmailOutbox.payload)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if not claimed:
+            db.session.rollback()
+            continue
+
+        claimed.sort(key=lambda row: row.id)
+        items = [json.loads(row.payload) for row in claimed]
+        event = db.session.get(Event, items[0].get('event_id')) if items[0].get('event_id') else None
+        title = event.title if event else items[0].get('event_title', key)
+        context = {'event': event, 'event_title': title, 'registrations': items}
+        enqueue_email(
+            f"{len(items)} neue Anmeldung{'en' if len(items) != 1 else ''} - {title}",
+            json.loads(claimed[0].recipients),
+            render_template('email/admin_digest.txt', **context),
+            render_template('email/admin_digest.html', **context)
+        )
+        db.session.commit()
+        built += 1
+    return built
+
+def dispatch_pending(batch_size=None):
+    """
+    Send due outbox entries, several per Mailjet API call.
+
+    Args:
+        batch_size (int): Maximum number of entries to process in this run
+
+    Returns:
+        dict: Counts of sent, retried and permanently failed entries and of built digests
+    """
+    batch_size = batch_size or current_app.config.get('EMAIL_OUTBOX_BATCH_SIZE', 50)
+    max_attempts = current_app.config.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 8)
+    stats = {'sent': 0, 'retried': 0, 'failed': 0, 'digests': 0}
+
+    now = get_utc_now()
+    stats['digests'] = build_digests(now)
+
+    due_ids = [row.id for row in EmailOutbox.due_query(now).with_entities(EmailOutbox.id).limit(batch_size)]
+    claimed = _claim(due_ids, now)
+    if not claimed:
+        return stats
+
+    entries = EmailOutbox.query.filter(EmailOutbox.id.in_(claimed)).order_by(EmailOutbox.id).all()
+    # A row that cannot be turned into a message fails on its own, not the whole batch
+    errors, sendable, messages = {}, [], []
+    for entry in entries:
+        try:
+            messages.append(build_message(entry.subject, json.loads(entry.recipients),
+                                          entry.text_part, entry.html_part))
+            sendable.append(entry)
+        except Exception as e:
+            errors[entry.id] = str(e)
+    for entry, error in zip(sendable, deliver_messages(messages)):
+        errors[entry.id] = error
+
+    for entry in entries:
+        error = errors[entry.id]
+        if error is None:
+            entry.status = 'sent'
+            entry.sent_at = get_utc_now()
+            entry.last_error = None
+            stats['sent'] += 1
+            continue
+
+        entry.attempts += 1
+        entry.last_error = error
+        if entry.attempts >= max_attempts:
+            entry.status = 'failed'
+            stats['failed'] += 1
+            current_app.logger.error(f"Outbox email {entry.id} failed permanently: {error}")
+        else:
+            entry.status = 'pending'
+            entry.next_attempt_at = get_utc_now() + _backoff(entry.attempts)
+            stats['retried'] += 1
+            current_app.logger.warning(f"Outbox email {entry.id} failed, retrying later: {error}")
+    db.session.commit()
+
+    return stats
+
+def flush_metrics(app):
+    """
+    Write the buffered email metrics to the shared metrics file.
+
+    Request handlers flush their worker's buffer, but a dispatcher sends
+    outside of requests, so it flushes after each run and once at exit.
+    """
+    if app.config.get('METRICS_ENABLED', True):
+        metrics.flush(app)
+
+def start_outbox_worker(app, interval=None):
+    """Drain the outbox from a daemon thread of the given application."""
+    interval = interval or app.config.get('EMAIL_OUTBOX_INTERVAL', 5)
+
+    def run():
+        while True:
+            with app.app_context():
+                try:
+                    dispatch_pending()
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.error(f"Outbox dispatcher error: {str(e)}")
+                finally:
+                    db.session.remove()
+                    flush_metrics(app)
+            time.sleep(interval)
+
+    atexit.register(flush_metrics, app)
+
+    thread = threading.Thread(target=run, name='email-outbox', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,89 @@
+"""EXPLAIN QUERY PLAN checks for the hot lookups on SQLite.
+
+Each entry builds the same statement the application runs, without executing
+anything. ``check_query_plans`` fails for any statement that SQLite would answer
+by scanning a whole table or walking a whole index.
+"""
+import re
+from sqlalchemy import delete, or_, and_, func
+from ..extensions import db
+from ..models import Event, Booking, EmailOutbox, StoredFile
+from ..models.models import get_utc_now, fts_match_expression
+
+# Index constraint in a plan line, e.g. "(event_id=?" or "(date>?"
+_CONSTRAINT = re.compile(r'\(\w+[=<>]')
+
+def _hot_queries():
+    """Return (name, statement) pairs for the queries that must stay indexed."""
+    now = get_utc_now()
+    return [
+        ('future visible events (index, get_future_events)',
+         Event.future_events_query(include_invisible=False).statement),
+        ('future events incl. invisible (admin index)',
+         Event.future_events_query(include_invisible=True).statement),
+        ('event API page after cursor',
+         Event.query.filter(Event.date >= now, Event.is_visible.is_(True))
+         .filter(or_(Event.date > now, and_(Event.date == now, Event.id > 1)))
+         .order_by(Event.date.asc(), Event.id.asc()).limit(21).statement),
+        ('event search, few text matches (events.search)',
+         Event.build_search_query(fts_match_expression('konzert'), [1, 2, 3], price_max=20).limit(31).statement),
+        ('event search, many text matches (events.search)',
+         Event.build_search_query(fts_match_expression('konzert'), None, price_max=20).limit(31).statement),
+        ('registrations of an event (view_registrations, export_registrations)',
+         Booking.for_event_query(1).statement),
+        ('delete bookings of an event (delete_event)',
+         delete(Booking).where(Booking.event_id == 1)),
+        ('bookings by email (bookings blueprint)',
+         Booking.query.filter_by(email='someone@example.com').statement),
+        ('due outbox emails (dispatch-outbox)',
+         EmailOutbox.due_query(now).with_entities(EmailOutbox.id).limit(50).statement),
+        ('due admin digests (dispatch-outbox)',
+         db.session.query(EmailOutbox.digest_key).filter(EmailOutbox.status == 'digest')
+         .group_by(EmailOutbox.digest_key).having(func.min(EmailOutbox.created_at) <= now).statement),
+        # The first page has no cursor; it reads the first 51 entries of
+        # ix_stored_file_modified and stops, so only the cursor pages are checked
+        ('file list page after cursor (files.file_list_page)',
+         StoredFile.page_query(after=(now, 1)).limit(51).statement),
+        ('file list page before cursor (files.file_list_page)',
+         StoredFile.page_query(before=(now, 1)).limit(51).statement),
+        ('references to stored content (files.delete_file_route)',
+         StoredFile.query.filter_by(sha256='0' * 64).limit(1).statement),
+    ]
+
+def explain(statement):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement."""
+    compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+    # Parameter values do not influence the plan, so placeholders are bound to NULL
+    params = tuple(None for _ in (compiled.positiontup or []))
+    connection = db.session.connection()
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params).fetchall()
+    return [row[-1] for row in rows]
+
+def is_full_scan(detail):
+    """
+    True for plan steps that read a whole table or walk a whole index.
+
+    ``SCAN event USING INDEX ix_event_date`` visits every row just like a table
+    scan, only in index order; only steps with an index constraint ("SEARCH ...
+    (date>?)") pass. The FTS5 table answers MATCH from its own index
+    ("VIRTUAL TABLE INDEX").
+    """
+    if not detail.startswith('SCAN ') or 'VIRTUAL TABLE' in detail:
+        return False
+    return not _CONSTRAINT.search(detail)
+
+def check_query_plans():
+    """
+    Explain every hot query.
+
+    Returns:
+        list: (name, plan lines, has full scan) per query
+    """
+    if db.engine.dialect.name != 'sqlite':
+        raise RuntimeError('Query plan checks require SQLite')
+
+    results = []
+    for name, statement in _hot_queries():
+        plan = explain(statement)
+        results.append((name, plan, any(is_full_scan(detail) for detail in plan)))
+    return results
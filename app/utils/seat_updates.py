@@ -0,0 +1,170 @@
+"""Live remaining-seat counts for open browser tabs.
+
+One broadcaster thread per worker keeps the remaining seats of all visible
+upcoming events in memory. It reloads them with a single query when the
+listing version file changes (every commit touching events or bookings
+replaces it, see ``listing_cache``) or when a booking in this worker calls
+``notify()``. Browsers either keep a Server-Sent Events stream open or poll
+the snapshot with ``If-None-Match``; both are served from memory, so the
+number of open tabs adds no database work. The ETag is a digest of the
+counts, so every worker hands out the same tag for the same snapshot and a
+poll that lands on another worker still gets its 304.
+"""
+import hashlib
+import json
+import threading
+import time
+from ..extensions import db
+from ..models import Event
+from ..models.models import get_local_now
+from . import listing_cache
+
+# Stop querying after this many seconds without readers, and reload at least
+# this often so events that have started drop out of the snapshot
+IDLE_AFTER = 60
+MAX_SNAPSHOT_AGE = 60
+
+_condition = threading.Condition()
+_sequence = 0
+_seats = None  # event id -> remaining seats, None while idle
+_seats_tag = None  # digest of _seats
+_last_read = 0.0
+_streams = 0
+_wakeup = threading.Event()
+_thread = None
+_thread_lock = threading.Lock()
+
+def snapshot_tag(seats):
+    """Digest of a seat snapshot; equal in all workers for equal counts."""
+    payload = json.dumps(sorted(seats.items()), separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+def notify():
+    """Reload the seat counts of this worker now instead of at the next version check."""
+    _wakeup.set()
+
+def _load_seats():
+    rows = db.session.query(Event.id, Event.capacity, Event.bookings).filter(
+        Event.is_visible.is_(True),
+        Event.date >= get_local_now()
+    ).all()
+    return {event_id: max(capacity - (bookings or 0), 0) for event_id, capacity, bookings in rows}
+
+def _publish(seats):
+    global _sequence, _seats, _seats_tag
+    with _condition:
+        if seats != _seats:
+            _sequence += 1
+            _seats = seats
+            _seats_tag = snapshot_tag(seats)
+            _condition.notify_all()
+
+def _run(app):
+    """Broadcaster loop: one query per change, no matter how many clients listen."""
+    global _seats
+    loaded_version = None
+    loaded_at = 0.0
+    interval = app.config.get('SEATS_POLL_INTERVAL', 0.5)
+    while True:
+        woken = _wakeup.wait(interval)
+        _wakeup.clear()
+        with app.app_context():
+            version = listing_cache.current_version()
+        now = time.monotonic()
+
+        with _condition:
+            idle = _streams == 0 and now - _last_read > IDLE_AFTER
+            if idle:
+                _seats = None
+            stale = _seats is None or woken or version != loaded_version or now - loaded_at > MAX_SNAPSHOT_AGE
+        if idle or not stale:
+            continue
+
+        try:
+            with app.app_context():
+                seats = _load_seats()
+        except Exception as e:
+            app.logger.warning(f"Could not load seat counts: {str(e)}")
+            continue
+        loaded_version, loaded_at = version, now
+        _publish(seats)
+
+def _ensure_started(app):
+    """Start the broadcaster lazily so it runs in each gunicorn worker, not the master."""
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, args=(app,), name='seat-broadcaster', daemon=True)
+            _thread.start()
+
+def _wait_for_change(since, timeout):
+    """Block until the snapshot differs from sequence ``since``; returns (sequence, tag, seats)."""
+    global _last_read
+    with _condition:
+        _last_read = time.monotonic()
+        if _seats is None:
+            _wakeup.set()
+        _condition.wait_for(lambda: _seats is not None and _sequence != since, timeout)
+        return _sequence, _seats_tag, _seats
+
+def snapshot(app, timeout=5):
+    """
+    Return the current seat counts.
+
+    Returns:
+        tuple: (ETag shared by all workers, dict of event id -> remaining seats),
+            or (None, None) if the broadcaster could not load them in time
+    """
+    _ensure_started(app)
+    _, tag, seats = _wait_for_change(None, timeout)
+    if seats is None:
+        return None, None
+    return tag, seats
+
+def open_stream(app):
+    """
+    Reserve a stream slot in this worker.
+
+    Returns:
+        bool: False if SEATS_STREAM_LIMIT streams are already open
+    """
+    global _streams
+    with _condition:
+        if _streams >= app.config.get('SEATS_STREAM_LIMIT', 0):
+            return False
+        _streams += 1
+    _ensure_started(app)
+    return True
+
+def close_stream():
+    """Release a slot reserved by ``open_stream``."""
+    global _streams
+    with _condition:
+        _streams -= 1
+
+def stream(app):
+    """
+    Yield Server-Sent Events with the seats of events whose count changed.
+
+    The first event carries the full snapshot. Comments are sent as
+    heartbeats so closed connections are noticed, and the stream ends after
+    SEATS_STREAM_MAX_AGE seconds; browsers reconnect by themselves. Call
+    ``open_stream`` first and ``close_stream`` when the response is closed.
+    """
+    heartbeat = app.config.get('SEATS_STREAM_HEARTBEAT', 15)
+    deadline = time.monotonic() + app.config.get('SEATS_STREAM_MAX_AGE', 300)
+    sent = {}
+    sequence = None
+    yield 'retry: 5000\n\n'
+    while time.monotonic() < deadline:
+        current, tag, seats = _wait_for_change(sequence, heartbeat)
+        if seats is None or current == sequence:
+            yield ': heartbeat\n\n'
+            continue
+        changed = {str(event_id): remaining for event_id, remaining in seats.items()
+                   if sent.get(event_id) != remaining}
+        sequence, sent = current, seats
+        if changed:
+            yield f'id: {tag}\nevent: seats\ndata: {json.dumps(changed)}\n\n'
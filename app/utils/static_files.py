@@ -0,0 +1,118 @@
+"""Fingerprinted files with precompressed variants.
+
+Generated files are named after a hash of their content, so they can be
+cached forever: a changed file gets a new name. Next to each file a ``.gz``
+and, when the optional ``brotli`` package is installed, a ``.br`` variant is
+written once, and ``send_precompressed`` picks the best one the client
+accepts instead of compressing on every request.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+from flask import abort, request, send_file
+
+# A year; the name changes whenever the content does
+IMMUTABLE_MAX_AGE = 31536000
+
+# Variants in order of preference: (Content-Encoding, file suffix)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_SAFE_NAME = re.compile(r'^[A-Za-z0-9_.-]+(/[A-Za-z0-9_.-]+)*$')
+
+def content_hash(data, length=12):
+    """Short hex digest used in fingerprinted file names."""
+    return hashlib.sha256(data).hexdigest()[:length]
+
+def fingerprinted_name(name, data):
+    """``theme.css`` -> ``theme.<hash>.css``."""
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{content_hash(data)}{ext}'
+
+def _compress_brotli(data):
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+def write_with_variants(path, data, compress=True):
+    """
+    Write a file and its compressed variants, unless they already exist.
+
+    Every file is replaced atomically, so concurrent writers of the same
+    content (several workers) never expose a partial file.
+
+    Args:
+        path (str): Target path
+        data (bytes): File content
+        compress (bool): Also write the ``.gz``/``.br`` variants
+
+    Returns:
+        bool: True if anything was written
+    """
+    written = False
+    if not os.path.exists(path):
+        _write_atomic(path, data)
+        written = True
+    if not compress:
+        return written
+    if not os.path.exists(path + '.gz'):
+        # mtime=0 keeps the output identical across builds
+        _write_atomic(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+        written = True
+    if not os.path.exists(path + '.br'):
+        compressed = _compress_brotli(data)
+        if compressed is not None:
+            _write_atomic(path + '.br', compressed)
+            written = True
+    return written
+
+def send_precompressed(directory, filename, max_age=IMMUTABLE_MAX_AGE):
+    """
+    Send a file from ``directory``, preferring a precompressed variant.
+
+    Args:
+        directory (str): Directory the file name is relative to
+        filename (str): Requested name; anything outside the directory is a 404
+        max_age (int): Cache lifetime; immutable names use IMMUTABLE_MAX_AGE
+
+    Returns:
+        Response
+    """
+    if not _SAFE_NAME.match(filename) or '..' in filename.split('/'):
+        abort(404)
+    path = os.path.join(directory, filename)
+    if not os.path.isfile(path):
+        abort(404)
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    for candidate, suffix in ENCODINGS:
+        if request.accept_encodings[candidate] and os.path.isfile(path + suffix):
+            encoding, path = candidate, path + suffix
+            break
+
+    response = send_file(path, mimetype=mimetype, conditional=True, max_age=max_age)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    if max_age == IMMUTABLE_MAX_AGE:
+        response.cache_control.immutable = True
+    return response
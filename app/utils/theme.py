@@ -0,0 +1,96 @@
+"""Stylesheet compiled from the appearance settings in config.json.
+
+The colors are rendered into ``templates/theme.css`` and written to
+``instance/theme/theme.<hash>.css`` with gzip/brotli variants. Pages only link
+to that file, which is served with immutable caching; saving other colors
+produces a new name, so browsers never see a stale stylesheet. Each worker
+builds the file on demand when its colors changed, e.g. after another worker
+saved the configuration.
+"""
+import glob
+import os
+import re
+import threading
+from flask import abort, current_app, url_for
+from .static_files import fingerprinted_name, write_with_variants, send_precompressed
+
+DEFAULT_COLORS = {
+    'primary_color': '#212529',
+    'secondary_color': '#6c757d',
+    'button_color': '#0080ff',
+}
+
+# Older stylesheets stay available for pages that are still open
+KEEP_STYLESHEETS = 5
+
+_HEX_COLOR = re.compile(r'^#(?:[0-9a-fA-F]{3}){1,2}$')
+
+_build_lock = threading.Lock()
+
+def theme_dir(app):
+    return os.path.join(app.instance_path, 'theme')
+
+def _colors(config):
+    """Configured colors; anything but a hex color falls back to the default."""
+    colors = {}
+    for key, default in DEFAULT_COLORS.items():
+        value = (config.get(key.upper()) or '').strip()
+        colors[key] = value if _HEX_COLOR.match(value) else default
+    return colors
+
+def _prune(directory, current):
+    """Remove all but the newest KEEP_STYLESHEETS stylesheets."""
+    paths = sorted(glob.glob(os.path.join(directory, 'theme.*.css')), key=os.path.getmtime, reverse=True)
+    for path in paths[KEEP_STYLESHEETS:]:
+        if os.path.basename(path) == current:
+            continue
+        for variant in (path, path + '.gz', path + '.br'):
+            try:
+                os.remove(variant)
+            except FileNotFoundError:
+                pass
+
+def build_stylesheet(app):
+    """
+    Render the stylesheet for the app's current colors and write it if needed.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        str: File name of the stylesheet inside ``theme_dir(app)``
+    """
+    colors = _colors(app.config)
+    with _build_lock:
+        css = app.jinja_env.get_template('theme.css').render(**colors).encode('utf-8')
+        filename = fingerprinted_name('theme.css', css)
+        directory = theme_dir(app)
+        if write_with_variants(os.path.join(directory, filename), css):
+            app.logger.info(f"Stylesheet {filename} written")
+            _prune(directory, filename)
+        app.extensions['theme_stylesheet'] = (colors, filename)
+    return filename
+
+def stylesheet_url():
+    """URL of the current stylesheet; builds it first when the colors changed."""
+    app = current_app._get_current_object()
+    state = app.extensions.get('theme_stylesheet')
+    if state is None or state[0] != _colors(app.config):
+        filename = build_stylesheet(app)
+    else:
+        filename = state[1]
+    return url_for('main.theme_stylesheet', filename=filename)
+
+def send_stylesheet(filename):
+    """Serve a stylesheet built by ``build_stylesheet``."""
+    app = current_app._get_current_object()
+    if not filename.startswith('theme.') or not filename.endswith('.css'):
+        abort(404)
+    # Workers that have not rendered a page since the restart build it on demand
+    if not os.path.exists(os.path.join(theme_dir(app), filename)) and 'theme_stylesheet' not in app.extensions:
+        build_stylesheet(app)
+    return send_precompressed(theme_dir(app), filename)
+
+def init_theme(app):
+    """Make ``theme_stylesheet_url()`` available in templates."""
+    app.context_processor(lambda: {'theme_stylesheet_url': stylesheet_url})
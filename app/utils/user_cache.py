@@ -0,0 +1,151 @@
+"""Per-worker LRU/TTL cache for Flask-Login's user loader.
+
+Every authenticated request resolves the session's user ID to a ``User``.
+Users almost never change, so each worker keeps a bounded number of detached
+copies and merges them into the request's session without a SELECT.
+
+Like the listing cache, the version is the stat signature of a small file in
+the instance folder. It is replaced whenever a commit inserts, changes or
+deletes a user (password, admin flag, deletion), which drops the cache in
+every worker.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context
+from sqlalchemy import event as sa_event
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from ..extensions import db
+
+VERSION_FILENAME = 'user_cache.version'
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # user_id -> (expires_at, detached user)
+_version = None
+_stats = {'hits': 0, 'misses': 0}
+_listeners_installed = False
+
+def _version_path():
+    return os.path.join(current_app.instance_path, VERSION_FILENAME)
+
+def current_version():
+    """Return the current user cache version, or None if it was never invalidated."""
+    try:
+        stat = os.stat(_version_path())
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def invalidate():
+    """Drop the cached users in every worker."""
+    path = _version_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(str(time.time_ns()))
+    os.replace(tmp_path, path)
+    with _lock:
+        _entries.clear()
+
+def _detached_copy(user):
+    """Snapshot the loaded column values of a user into a detached instance."""
+    from ..models import User
+    state = inspect(user)
+    copy = User(**{attr.key: getattr(user, attr.key) for attr in state.mapper.column_attrs})
+    make_transient_to_detached(copy)
+    return copy
+
+def load_cached_user(user_id):
+    """
+    Load a user for Flask-Login, using the per-worker cache when possible.
+
+    Args:
+        user_id (str): User ID stored in the session
+
+    Returns:
+        User: Instance attached to the current session, or None
+    """
+    global _version
+    from ..models import User
+    user_id = int(user_id)
+    version = current_version()
+    now = time.monotonic()
+
+    with _lock:
+        if version != _version:
+            _entries.clear()
+            _version = version
+        entry = _entries.get(user_id)
+        if entry is not None and entry[0] > now:
+            _entries.move_to_end(user_id)
+            _stats['hits'] += 1
+            cached = entry[1]
+        else:
+            _entries.pop(user_id, None)
+            _stats['misses'] += 1
+            cached = None
+
+    if cached is not None:
+        # load=False attaches a copy to this session without querying
+        return db.session.merge(cached, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+
+    ttl = current_app.config.get('USER_CACHE_TTL', 300)
+    max_size = current_app.config.get('USER_CACHE_SIZE', 256)
+    copy = _detached_copy(user)
+    with _lock:
+        # Skip storing if a user changed while we were loading
+        if version == _version and max_size > 0:
+            _entries[user_id] = (now + ttl, copy)
+            _entries.move_to_end(user_id)
+            while len(_entries) > max_size:
+                _entries.popitem(last=False)
+    return user
+
+def cache_stats():
+    """Return the hit and miss counters and the hit ratio of this worker."""
+    with _lock:
+        hits, misses, size = _stats['hits'], _stats['misses'], len(_entries)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'size': size,
+        'hit_ratio': hits / total if total else None,
+    }
+
+def _is_user(obj):
+    return type(obj).__name__ == 'User'
+
+def init_user_cache(app):
+    """Invalidate cached users whenever a commit changes the user table."""
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    _listeners_installed = True
+
+    @sa_event.listens_for(Session, 'after_flush')
+    def _after_flush(session, flush_context):
+        if any(_is_user(obj) for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+            session.info['users_changed'] = True
+
+    @sa_event.listens_for(Session, 'do_orm_execute')
+    def _on_bulk_statement(orm_execute_state):
+        mapper = orm_execute_state.bind_mapper
+        if (orm_execute_state.is_update or orm_execute_state.is_delete) \
+                and mapper is not None and mapper.class_.__name__ == 'User':
+            orm_execute_state.session.info['users_changed'] = True
+
+    @sa_event.listens_for(Session, 'after_commit')
+    def _after_commit(session):
+        if session.info.pop('users_changed', False) and has_app_context():
+            invalidate()
+
+    @sa_event.listens_for(Session, 'after_rollback')
+    def _after_rollback(session):
+        session.info.pop('users_changed', None)
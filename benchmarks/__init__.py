@@ -0,0 +1 @@
+"""Standalone benchmark scripts. Run them as modules, e.g. ``python -m benchmarks.booking_contention``."""
@@ -0,0 +1,146 @@
+"""Simulate a burst of visitors on an event with a waiting room.
+
+Every visitor opens the booking page at once, waits in the queue until it is
+admitted and then submits the form. The run fails if more than
+``--limit`` tickets were admitted or seat reservations (the write
+transactions on the event row) were open at the same time, or if the event
+did not sell exactly its seats. With ``--compare`` the same
+burst is repeated without the waiting room to show the contention it avoids.
+
+Usage:
+    python -m benchmarks.admission_burst --visitors 200 --capacity 100 --limit 8
+"""
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import event as sa_event
+from .common import prepare_environment, create_benchmark_app, latency_summary, emit, fail
+from .booking_contention import create_event, book_once
+
+def run(app, visitors, capacity, limit, poll):
+    from app.extensions import db
+    from app.models import Event, Booking
+    from app.utils import admission
+
+    event_id = create_event(app, capacity)
+    if limit:
+        with app.app_context():
+            db.session.get(Event, event_id).admission_limit = limit
+            db.session.commit()
+
+    # Seat reservations run from the conditional UPDATE until commit or
+    # rollback; count how many of these write transactions overlap
+    lock = threading.Lock()
+    in_flight = {'now': 0, 'max': 0}
+
+    def reservation_started(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE event SET bookings'):
+            conn.info['reserving'] = True
+            with lock:
+                in_flight['now'] += 1
+                in_flight['max'] = max(in_flight['max'], in_flight['now'])
+
+    def reservation_ended(conn):
+        if conn.info.pop('reserving', False):
+            with lock:
+                in_flight['now'] -= 1
+
+    with app.app_context():
+        engine = db.engine
+    sa_event.listen(engine, 'before_cursor_execute', reservation_started)
+    sa_event.listen(engine, 'commit', reservation_ended)
+    sa_event.listen(engine, 'rollback', reservation_ended)
+    admitted = {'max': 0}
+    done = threading.Event()
+
+    def sample_admissions():
+        with app.app_context():
+            while not done.is_set():
+                admitted['max'] = max(admitted['max'], admission.active_admissions(event_id))
+                time.sleep(0.005)
+
+    def visit(i):
+        client = app.test_client()
+        started = time.perf_counter()
+        location = client.get(f'/event/{event_id}/book').headers.get('Location', '')
+        if '/queue' in location:
+            client.get(location)
+            while True:
+                state = client.get(f'/event/{event_id}/queue/status').get_json()['state']
+                if state == 'admitted':
+                    break
+                if state == 'sold_out':
+                    return 'sold_out', 0.0, time.perf_counter() - started
+                time.sleep(poll)
+        waited = time.perf_counter() - started
+        outcome, latency = book_once(client, event_id, i)
+        return outcome, latency, waited
+
+    sampler = threading.Thread(target=sample_admissions, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=visitors) as pool:
+        outcomes = list(pool.map(visit, range(visitors)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    sampler.join()
+    sa_event.remove(engine, 'before_cursor_execute', reservation_started)
+    sa_event.remove(engine, 'commit', reservation_ended)
+    sa_event.remove(engine, 'rollback', reservation_ended)
+
+    with app.app_context():
+        counter = db.session.get(Event, event_id).bookings
+        stored = Booking.query.filter_by(event_id=event_id).count()
+
+    counts = {kind: sum(1 for outcome, _, _ in outcomes if outcome == kind) for kind in ('booked', 'sold_out', 'error')}
+    booking_latencies = [latency for outcome, latency, _ in outcomes if latency]
+    return {
+        'visitors': visitors,
+        'capacity': capacity,
+        'admission_limit': limit,
+        'booked': counts['booked'],
+        'sold_out': counts['sold_out'],
+        'errors': counts['error'],
+        'event_counter': counter,
+        'stored_bookings': stored,
+        'max_concurrent_reservations': in_flight['max'],
+        'max_admitted_tickets': admitted['max'],
+        'elapsed_s': round(elapsed, 3),
+        'booking': latency_summary(booking_latencies),
+        'wait': latency_summary([waited for _, _, waited in outcomes]),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--visitors', type=int, default=200)
+    parser.add_argument('--capacity', type=int, default=100)
+    parser.add_argument('--limit', type=int, default=8, help='Admission limit of the event')
+    parser.add_argument('--poll', type=float, default=0.05, help='Seconds between waiting room polls')
+    parser.add_argument('--compare', action='store_true', help='Repeat the burst without a waiting room')
+    parser.add_argument('--output', help='Also write the JSON results to this file')
+    args = parser.parse_args()
+
+    db_path = prepare_environment()
+    os.environ.setdefault('ADMISSION_DB', os.path.join(os.path.dirname(db_path), 'admission.db'))
+    app = create_benchmark_app()
+
+    results = {'queued': run(app, args.visitors, args.capacity, args.limit, args.poll)}
+    if args.compare:
+        results['unqueued'] = run(app, args.visitors, args.capacity, None, args.poll)
+    emit(results, args.output)
+
+    queued = results['queued']
+    expected = min(args.capacity, args.visitors)
+    if queued['max_concurrent_reservations'] > args.limit:
+        fail(f"{queued['max_concurrent_reservations']} seat reservations overlapped, admission limit is {args.limit}")
+    if queued['max_admitted_tickets'] > args.limit:
+        fail(f"{queued['max_admitted_tickets']} tickets were admitted at once, admission limit is {args.limit}")
+    if queued['booked'] != expected or queued['errors']:
+        fail(f"expected {expected} bookings without errors, got {queued['booked']} and {queued['errors']} errors")
+    if queued['event_counter'] != queued['stored_bookings'] or queued['stored_bookings'] > args.capacity:
+        fail(f"counter {queued['event_counter']} / stored {queued['stored_bookings']} / capacity {args.capacity}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Time archiving of past events and its effect on the hot tables.
+
+Seeds ``--past-events`` events that lie in the past and ``--future-events``
+upcoming ones, each with ``--bookings-per-event`` bookings. Then it times hot
+queries (the admin listing, a registration list and a full-text search), moves
+the past events to the archive database with ``archive_past_events`` and
+times the same queries again. The run fails unless every past event and
+booking ends up in the archive exactly once, a second run moves nothing and
+the archived registrations of a sample event match what was seeded.
+
+Usage:
+    python -m benchmarks.archive --past-events 20000 --future-events 2000 --bookings-per-event 20
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from .common import prepare_environment, create_benchmark_app, latency_summary, emit, fail
+
+WORDS = ('konzert', 'lesung', 'workshop', 'vortrag', 'theater', 'jazz', 'kinder', 'garten', 'hafen', 'musik')
+
+def seed(app, past, future, per_event, seed_value):
+    """Insert events around now and their bookings; returns the ids of the past events."""
+    from app.extensions import db
+
+    rng = random.Random(seed_value)
+    now = datetime.now(timezone.utc)
+    fmt = '%Y-%m-%d %H:%M:%S.%f'
+    # Past events end well before ARCHIVE_AFTER_DAYS, upcoming ones start tomorrow
+    dates = [now - timedelta(days=400, minutes=30 * i) for i in range(past)]
+    dates += [now + timedelta(days=1, minutes=30 * i) for i in range(future)]
+    with app.app_context(), db.engine.begin() as connection:
+        for offset in range(0, len(dates), 5000):
+            connection.exec_driver_sql(
+                'INSERT INTO event (title, description, date, capacity, bookings, is_visible, price, updated_at)'
+                ' VALUES (?, ?, ?, ?, ?, 1, 0, ?)',
+                [(f'{rng.choice(WORDS).capitalize()} {i}', ' '.join(rng.sample(WORDS, 4)), date.strftime(fmt),
+                  per_event, per_event, now.strftime(fmt)) for i, date in enumerate(dates[offset:offset + 5000], offset)]
+            )
+        ids = [row[0] for row in connection.exec_driver_sql('SELECT id FROM event ORDER BY date')]
+        for offset in range(0, len(ids), 1000):
+            connection.exec_driver_sql(
+                'INSERT INTO booking (event_id, name, email, phone, created_at) VALUES (?, ?, ?, ?, ?)',
+                [(event_id, f'Gast {n}', f'gast{event_id}-{n}@example.com', '0401234', now.strftime(fmt))
+                 for event_id in ids[offset:offset + 1000] for n in range(per_event)]
+            )
+    return ids[:past], ids[past:]
+
+def time_hot_queries(app, future_event_id, repeat):
+    from app.extensions import db
+    from app.models import Event, Booking
+    from app.routes.events import search_events
+
+    queries = {
+        'admin listing': lambda: Event.get_future_events(include_invisible=True),
+        'registrations': lambda: Booking.for_event_query(future_event_id).all(),
+        'search': lambda: search_events({'text': 'jazz'}, True, 20),
+        'booking count': lambda: db.session.query(db.func.count(Booking.id)).scalar(),
+    }
+    results = {}
+    with app.app_context():
+        for name, query in queries.items():
+            latencies = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                query()
+                latencies.append(time.perf_counter() - started)
+                db.session.expunge_all()
+            results[name] = latency_summary(latencies)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--past-events', type=int, default=20000)
+    parser.add_argument('--future-events', type=int, default=2000)
+    parser.add_argument('--bookings-per-event', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Also write the JSON results to this file')
+    args = parser.parse_args()
+
+    db_path = prepare_environment()
+    archive_path = os.path.join(os.path.dirname(db_path), 'archive.db')
+    os.environ['ARCHIVE_DATABASE_URL'] = f'sqlite:///{archive_path}'
+    app = create_benchmark_app()
+    past_ids, future_ids = seed(app, args.past_events, args.future_events, args.bookings_per_event, args.seed)
+
+    from app.extensions import db
+    from app.models import Event, Booking, ArchivedEvent, ArchivedBooking
+    from app.utils.archive import archive_past_events
+
+    results = {
+        'past_events': args.past_events,
+        'future_events': args.future_events,
+        'bookings_per_event': args.bookings_per_event,
+        'before': time_hot_queries(app, future_ids[0], args.repeat),
+    }
+    problems = []
+    with app.app_context():
+        started = time.perf_counter()
+        stats = archive_past_events(batch_size=args.batch_size)
+        results['archive_s'] = round(time.perf_counter() - started, 2)
+        results['archived'] = stats
+        results['rerun'] = archive_past_events(batch_size=args.batch_size)
+
+        expected_bookings = args.past_events * args.bookings_per_event
+        counts = {
+            'hot_events': Event.query.count(),
+            'hot_bookings': Booking.query.count(),
+            'archived_events': ArchivedEvent.query.count(),
+            'archived_bookings': ArchivedBooking.query.count(),
+        }
+        results['counts'] = counts
+        if stats['events'] != args.past_events or stats['bookings'] != expected_bookings:
+            problems.append(f"archived {stats['events']} events/{stats['bookings']} bookings, "
+                            f"expected {args.past_events}/{expected_bookings}")
+        if counts['archived_events'] != args.past_events or counts['archived_bookings'] != expected_bookings:
+            problems.append(f'archive holds {counts["archived_events"]} events/{counts["archived_bookings"]} bookings')
+        if counts['hot_events'] != args.future_events:
+            problems.append(f"{counts['hot_events']} events left, expected {args.future_events}")
+        if results['rerun']['events'] or results['rerun']['bookings']:
+            problems.append(f"second run moved {results['rerun']}")
+
+        sample = past_ids[len(past_ids) // 2] if past_ids else None
+        if sample is not None:
+            emails = {booking.email for booking in ArchivedBooking.for_event_query(sample)}
+            expected = {f'gast{sample}-{n}@example.com' for n in range(args.bookings_per_event)}
+            if emails != expected:
+                problems.append(f'archived registrations of event {sample} differ from the seeded ones')
+        db.session.remove()
+
+    results['after'] = time_hot_queries(app, future_ids[0], args.repeat)
+    results['archive_mb'] = round(os.path.getsize(archive_path) / 1e6, 1)
+    emit(results, args.output)
+    for problem in problems:
+        fail(problem)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Time the streaming backup and bulk restore used by init_migrations.py.
+
+Seeds a scratch database with many bookings, backs it up to gzip NDJSON,
+restores it into the emptied tables (keeping IDs) and, with --merge, a second
+time into the populated tables (exercising ID remapping).
+
+Usage:
+    python -m benchmarks.backup_restore --bookings 1000000 --events 1000
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from .common import prepare_environment, create_benchmark_app, emit, fail
+
+def _max_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def seed(app, events, bookings, batch_size=10000):
+    """Insert events and bookings with raw executemany, bypassing the ORM."""
+    from app.extensions import db
+
+    start = datetime.now(timezone.utc) + timedelta(days=30)
+    created_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+    with app.app_context(), db.engine.begin() as connection:
+        connection.exec_driver_sql(
+            'INSERT INTO event (id, title, description, date, capacity, bookings, is_visible, price, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, 1, 0.0, ?)',
+            [(i, f'Event {i}', 'Seeded', (start + timedelta(hours=i)).strftime('%Y-%m-%d %H:%M:%S.%f'),
+              bookings, bookings // events, created_at) for i in range(1, events + 1)]
+        )
+        for offset in range(0, bookings, batch_size):
+            connection.exec_driver_sql(
+                'INSERT INTO booking (event_id, name, email, phone, created_at) VALUES (?, ?, ?, ?, ?)',
+                [(i % events + 1, f'Guest {i}', f'guest{i}@example.com', '0123456789', created_at)
+                 for i in range(offset, min(bookings, offset + batch_size))]
+            )
+
+def _directory_size_mb(path):
+    return round(sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 1024 / 1024, 2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--events', type=int, default=1000)
+    parser.add_argument('--merge', action='store_true', help='Also restore into the populated tables')
+    parser.add_argument('--output', help='Also write the JSON results to this file')
+    args = parser.parse_args()
+
+    prepare_environment()
+    app = create_benchmark_app()
+    from app.extensions import db
+    from app.models import Booking, Event
+    from init_migrations import DatabaseBackup, DatabaseRestore
+
+    started = time.perf_counter()
+    seed(app, args.events, args.bookings)
+    results = {'bookings': args.bookings, 'events': args.events,
+               'seed_s': round(time.perf_counter() - started, 2)}
+
+    backup_dir = os.path.join(tempfile.mkdtemp(prefix='eventbocker-backup-'), 'backup')
+    with app.app_context():
+        started = time.perf_counter()
+        DatabaseBackup(db).stream_to_dir(backup_dir)
+        elapsed = time.perf_counter() - started
+        results.update({
+            'backup_s': round(elapsed, 2),
+            'backup_rows_per_s': round(args.bookings / elapsed),
+            'backup_size_mb': _directory_size_mb(backup_dir),
+            'max_rss_after_backup_mb': _max_rss_mb(),
+        })
+
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('DELETE FROM booking')
+            connection.exec_driver_sql('DELETE FROM event')
+            connection.exec_driver_sql('DELETE FROM email_outbox')
+            connection.exec_driver_sql('DELETE FROM user')
+
+        started = time.perf_counter()
+        DatabaseRestore(db).restore_from_dir(backup_dir)
+        elapsed = time.perf_counter() - started
+        results.update({
+            'restore_s': round(elapsed, 2),
+            'restore_rows_per_s': round(args.bookings / elapsed),
+            'max_rss_after_restore_mb': _max_rss_mb(),
+        })
+        restored = Booking.query.count()
+        if restored != args.bookings:
+            emit(results, args.output)
+            fail(f'restored {restored} bookings, expected {args.bookings}')
+
+        if args.merge:
+            started = time.perf_counter()
+            DatabaseRestore(db).restore_from_dir(backup_dir)
+            elapsed = time.perf_counter() - started
+            results.update({
+                'merge_restore_s': round(elapsed, 2),
+                'merge_restore_rows_per_s': round(args.bookings / elapsed),
+                'max_rss_after_merge_mb': _max_rss_mb(),
+            })
+            if Booking.query.count() != 2 * args.bookings or Event.query.count() != 2 * args.events:
+                emit(results, args.output)
+                fail('merge restore did not duplicate all events and bookings')
+
+    emit(results, args.output)
+
+if __name__ == '__main__':
+    main()
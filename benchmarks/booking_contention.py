@@ -0,0 +1,98 @@
+"""Fire concurrent bookings at a single event and check that it never oversells.
+
+Usage:
+    python -m benchmarks.booking_contention --requests 200 --capacity 50 --threads 16
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+from .common import prepare_environment, create_benchmark_app, latency_summary, emit, fail
+
+def create_event(app, capacity):
+    """Create a future event and return its id."""
+    from app.extensions import db
+    from app.models import Event
+
+    with app.app_context():
+        event = Event(
+            title='Benchmark Event',
+            date=datetime.now(timezone.utc) + timedelta(days=30),
+            capacity=capacity
+        )
+        db.session.add(event)
+        db.session.commit()
+        return event.id
+
+def book_once(client, event_id, i):
+    """Submit one booking; returns ('booked' | 'sold_out' | 'error', latency in seconds)."""
+    started = time.perf_counter()
+    response = client.post(f'/event/{event_id}/book', data={
+        'name': f'Guest {i}',
+        'email': f'guest{i}@example.com',
+        'phone': '0123456789'
+    })
+    elapsed = time.perf_counter() - started
+    location = response.headers.get('Location', '')
+    if response.status_code == 302 and 'success=true' in location:
+        return 'booked', elapsed
+    if response.status_code == 302 and urlparse(location).path == '/':
+        return 'sold_out', elapsed
+    return 'error', elapsed
+
+def run(app, requests, capacity, threads):
+    from app.extensions import db
+    from app.models import Event, Booking
+
+    event_id = create_event(app, capacity)
+
+    def book(i):
+        return book_once(app.test_client(), event_id, i)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        outcomes = list(pool.map(book, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        counter = db.session.get(Event, event_id).bookings
+        stored = Booking.query.filter_by(event_id=event_id).count()
+
+    counts = {kind: sum(1 for outcome, _ in outcomes if outcome == kind) for kind in ('booked', 'sold_out', 'error')}
+    return {
+        'requests': requests,
+        'capacity': capacity,
+        'threads': threads,
+        'booked': counts['booked'],
+        'sold_out': counts['sold_out'],
+        'errors': counts['error'],
+        'event_counter': counter,
+        'stored_bookings': stored,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(requests / elapsed, 1) if elapsed else None,
+        **latency_summary([latency for _, latency in outcomes]),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--capacity', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--db', help='SQLite file to use (default: temporary file)')
+    parser.add_argument('--output', help='Also write the JSON results to this file')
+    args = parser.parse_args()
+
+    prepare_environment(args.db)
+    app = create_benchmark_app()
+    results = run(app, args.requests, args.capacity, args.threads)
+    emit(results, args.output)
+
+    expected = min(args.capacity, args.requests)
+    if results['booked'] != expected:
+        fail(f"{results['booked']} bookings succeeded, expected exactly {expected}")
+    if results['event_counter'] != results['stored_bookings']:
+        fail(f"event counter {results['event_counter']} != stored bookings {results['stored_bookings']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Shared setup for the benchmark scripts.
+
+Benchmarks run against a throw-away SQLite database and the fake Mailjet
+backend, so they can be started from a plain checkout without any .env file.
+"""
+import json
+import os
+import sys
+import tempfile
+
+def prepare_environment(db_path=None, **overrides):
+    """Point the application at a scratch database. Must run before importing ``app``."""
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='eventbocker-bench-'), 'data.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.abspath(db_path)}'
+    os.environ.setdefault('MAILJET_BACKEND', 'fake')
+    os.environ.setdefault('MAIL_USERNAME', 'bench@example.com')
+    os.environ.setdefault('ADMIN_EMAIL', 'admin@example.com')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    for key, value in overrides.items():
+        os.environ[key] = str(value)
+    return db_path
+
+def create_benchmark_app():
+    """Create the application configured by ``prepare_environment`` and its database."""
+    from app import create_app
+    from app.database import init_database
+    app = create_app()
+    app.logger.setLevel(os.environ.get('LOG_LEVEL', 'WARNING'))
+    with app.app_context():
+        init_database()
+    return app
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def latency_summary(latencies):
+    """p50/p95/p99 and max of a list of latencies in seconds, reported in milliseconds."""
+    return {
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        'max_ms': round(max(latencies) * 1000, 2) if latencies else None,
+    }
+
+def emit(results, output=None):
+    """Print results as JSON and optionally write them to a file."""
+    text = json.dumps(results, indent=2, sort_keys=True, default=str)
+    print(text)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+
+def fail(message):
+    """Report a failed benchmark assertion and exit non-zero."""
+    print(f'FAILED: {message}', file=sys.stderr)
+    sys.exit(1)
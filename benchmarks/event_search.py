@@ -0,0 +1,158 @@
+"""Time the full-text event search on a large catalogue.
+
+Seeds ``--events`` upcoming events (100k by default) through the FTS5
+triggers, then runs typical searches: a common and a rare word, prefixes,
+text combined with date and price filters, filters without text and a search
+without hits. Each query fetches the first page like the index and the
+``/events/search`` endpoint do; every result set is also checked against a
+plain Python scan of the same rows. The run fails if any result differs or a
+query's p95 exceeds ``--max-p95-ms``.
+
+Usage:
+    python -m benchmarks.event_search --events 100000 --repeat 20
+"""
+import argparse
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from .common import prepare_environment, create_benchmark_app, latency_summary, emit, fail
+
+GENRES = ('Konzert', 'Lesung', 'Workshop', 'Vortrag', 'Theater', 'Kino', 'Tanzabend', 'Stadtführung',
+          'Weinprobe', 'Kochkurs', 'Yoga', 'Flohmarkt', 'Ausstellung', 'Seminar', 'Quiz')
+WORDS = ('sommer', 'winter', 'jazz', 'klassik', 'kinder', 'familie', 'abend', 'morgen', 'garten', 'hafen',
+         'musik', 'kunst', 'literatur', 'natur', 'wissenschaft', 'geschichte', 'fotografie', 'malerei',
+         'keramik', 'fahrrad', 'kaffee', 'brot', 'kuchen', 'wein', 'bier', 'tee', 'schach', 'spiele',
+         'programmieren', 'elektronik', 'robotik', 'astronomie', 'botanik', 'vogel', 'meer', 'insel',
+         'stadt', 'dorf', 'markt', 'chor', 'orgel', 'gitarre', 'klavier', 'trommel', 'improvisation')
+CITIES = ('Hamburg', 'Lübeck', 'Kiel', 'Bremen', 'Rostock', 'Stralsund', 'Wismar', 'Flensburg')
+# Appears in a handful of events only
+RARE_WORD = 'zauberflöte'
+
+def seed(app, count, seed_value):
+    """Insert upcoming events in batches; the insert trigger fills the search index."""
+    from app.extensions import db
+
+    rng = random.Random(seed_value)
+    start = datetime.now(timezone.utc) + timedelta(days=1)
+    updated_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+    started = time.perf_counter()
+    with app.app_context(), db.engine.begin() as connection:
+        for offset in range(0, count, 10000):
+            rows = []
+            for i in range(offset, min(count, offset + 10000)):
+                words = rng.sample(WORDS, 12)
+                if i % 20000 == 7:
+                    words.append(RARE_WORD)
+                date = start + timedelta(minutes=15 * i)
+                rows.append((
+                    f'{rng.choice(GENRES)} {words[0].capitalize()}', ' '.join(words[1:]),
+                    date.strftime('%Y-%m-%d %H:%M:%S.%f'), 50, 0, f'Saal {i % 40}',
+                    f'Hauptstraße {i % 300}, {rng.choice(CITIES)}', rng.random() > 0.05,
+                    round(rng.choice((0, 5, 10, 15, 25, 40)) + rng.random() * 5, 2), updated_at,
+                ))
+            connection.exec_driver_sql(
+                'INSERT INTO event (title, description, date, capacity, bookings, room, address, is_visible, price, updated_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows
+            )
+    return time.perf_counter() - started, start
+
+def scenarios(start):
+    """(name, search filters) pairs; dates relative to the first seeded event."""
+    return [
+        ('common word', {'text': 'konzert'}),
+        ('rare word', {'text': RARE_WORD}),
+        ('prefix', {'text': 'klav'}),
+        ('two words', {'text': 'jazz garten'}),
+        ('room or address', {'text': 'flensburg'}),
+        ('word and date range', {'text': 'kinder', 'date_from': start + timedelta(days=200),
+                                 'date_to': start + timedelta(days=230)}),
+        ('word and price range', {'text': 'lesung', 'price_min': 5, 'price_max': 12}),
+        ('date range only', {'date_from': start + timedelta(days=400), 'date_to': start + timedelta(days=401)}),
+        ('price only', {'price_max': 3}),
+        ('no match', {'text': 'quantenchromodynamik'}),
+    ]
+
+def expected_ids(rows, filters, now):
+    """Reference result: scan all rows in Python with the semantics of ``Event.search_query``."""
+    words = [word.lower() for word in re.findall(r'\w+', filters.get('text') or '')]
+    date_from = max(filters.get('date_from') or now, now)
+    matches = []
+    for event_id, date, visible, price, text in rows:
+        if not visible or date < date_from:
+            continue
+        if filters.get('date_to') and date > filters['date_to']:
+            continue
+        if filters.get('price_min') is not None and price < filters['price_min']:
+            continue
+        if filters.get('price_max') is not None and price > filters['price_max']:
+            continue
+        if words and not all(any(token.startswith(word) for token in text) for word in words):
+            continue
+        matches.append((date, event_id))
+    return [event_id for _, event_id in sorted(matches)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--max-p95-ms', type=float, default=50.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Also write the JSON results to this file')
+    args = parser.parse_args()
+
+    prepare_environment()
+    app = create_benchmark_app()
+    seed_seconds, start = seed(app, args.events, args.seed)
+
+    from app.extensions import db
+    from app.models import Event
+    from app.models.models import get_local_now
+    from app.routes.events import search_events
+    from app.utils.query_plans import explain
+
+    results = {'events': args.events, 'seed_s': round(seed_seconds, 2), 'queries': {}}
+    problems = []
+    with app.app_context():
+        rows = [(event.id, event.date.replace(tzinfo=timezone.utc), event.is_visible, event.price,
+                 [token.lower() for token in re.findall(r'\w+', ' '.join(
+                     filter(None, (event.title, event.description, event.room, event.address))))])
+                for event in Event.query.all()]
+        now = get_local_now()
+
+        for name, filters in scenarios(start):
+            latencies = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                events, next_cursor = search_events(filters, False, args.page_size)
+                latencies.append(time.perf_counter() - started)
+                db.session.expunge_all()
+
+            found = [event.id for event in Event.search_query(**filters).all()]
+            expected = expected_ids(rows, filters, now)
+            summary = latency_summary(latencies)
+            results['queries'][name] = dict(summary, matches=len(found), page=len(events),
+                                            plan=explain(Event.search_query(**filters).limit(args.page_size + 1).statement))
+            if found != expected:
+                problems.append(f'{name}: {len(found)} results, expected {len(expected)}')
+            if summary['p95_ms'] > args.max_p95_ms:
+                problems.append(f"{name}: p95 {summary['p95_ms']} ms exceeds {args.max_p95_ms} ms")
+
+        # The endpoint including JSON serialisation
+        client = app.test_client()
+        latencies = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            response = client.get('/events/search?q=konz&min_price=5&max_price=20')
+            latencies.append(time.perf_counter() - started)
+        results['endpoint'] = dict(latency_summary(latencies), status=response.status_code)
+        if response.status_code != 200:
+            problems.append(f'/events/search returned {response.status_code}')
+
+    emit(results, args.output)
+    for problem in problems:
+        fail(problem)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,348 @@
+"""Load-test the application with realistic traffic scenarios.
+
+The app runs against a seeded scratch SQLite database with the fake Mailjet
+backend, either in-process through the Flask test client or as a real
+gunicorn server driven over HTTP. Scenarios:
+
+    browse  anonymous visitors loading the index page
+    storm   everybody booking the same event at once (checks for overselling)
+    export  admins exporting the registrations of a large event
+    mixed   browsing, API polling, bookings and admin pages interleaved
+
+Results are printed as JSON; pass --compare with an earlier result file to
+see throughput and latency relative to that run.
+
+Usage:
+    python -m benchmarks.load_test --scenarios browse,storm --threads 16
+    python -m benchmarks.load_test --target gunicorn --workers 4 --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+from .common import prepare_environment, create_benchmark_app, latency_summary, emit, fail
+
+SCENARIOS = ('browse', 'storm', 'export', 'mixed')
+ADMIN_USERNAME = 'loadtest-admin'
+ADMIN_PASSWORD = 'loadtest-password'
+
+# Drivers: each returns per-thread clients with request(method, path, data) -> (status, location, size)
+
+class TestClientDriver:
+    """Run requests in-process through the Flask test client."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def client(self):
+        client = self.app.test_client()
+
+        def request(method, path, data=None):
+            response = client.open(path, method=method, data=data)
+            size = sum(len(chunk) for chunk in response.response) if response.is_streamed else len(response.data)
+            return response.status_code, response.headers.get('Location', ''), size
+        return request
+
+    def close(self):
+        pass
+
+class GunicornDriver:
+    """Start gunicorn on a free port and send real HTTP requests."""
+
+    def __init__(self, workers, threads):
+        import requests
+        self.requests = requests
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        self.base_url = f'http://127.0.0.1:{port}'
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}',
+             '--workers', str(workers), '--threads', str(threads), '--log-level', 'warning', 'wsgi:app'],
+            cwd=root, env=dict(os.environ)
+        )
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            try:
+                if requests.get(f'{self.base_url}/health', timeout=1).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        self.close()
+        fail('gunicorn did not become healthy within 60 seconds')
+
+    def client(self):
+        session = self.requests.Session()
+
+        def request(method, path, data=None):
+            response = session.request(method, self.base_url + path, data=data, allow_redirects=False, timeout=120)
+            return response.status_code, response.headers.get('Location', ''), len(response.content)
+        return request
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+# Seeding
+
+def seed(app, events, storm_capacity, export_bookings):
+    """Create browsable events, the storm event and a large event for exports."""
+    from app.extensions import db
+    from app.models import Event, User
+
+    start = datetime.now(timezone.utc) + timedelta(days=1)
+    with app.app_context():
+        admin = User.query.filter_by(username=ADMIN_USERNAME).first()
+        if admin is None:
+            admin = User(username=ADMIN_USERNAME, is_admin=True)
+            admin.set_password(ADMIN_PASSWORD)
+            db.session.add(admin)
+
+        browse_events = [Event(title=f'Veranstaltung {i}', description='Lasttest', capacity=1000000,
+                               date=start + timedelta(hours=i), room=f'Raum {i % 10}')
+                         for i in range(events)]
+        storm_event = Event(title='Ansturm', capacity=storm_capacity, date=start + timedelta(days=30))
+        export_event = Event(title='Export', capacity=export_bookings, bookings=export_bookings,
+                             date=start + timedelta(days=31), is_visible=False)
+        db.session.add_all(browse_events + [storm_event, export_event])
+        db.session.commit()
+
+        created_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+        with db.engine.begin() as connection:
+            for offset in range(0, export_bookings, 10000):
+                connection.exec_driver_sql(
+                    'INSERT INTO booking (event_id, name, email, phone, created_at) VALUES (?, ?, ?, ?, ?)',
+                    [(export_event.id, f'Gast {i}', f'gast{i}@example.com', '0123456789', created_at)
+                     for i in range(offset, min(export_bookings, offset + 10000))]
+                )
+        return {
+            'browse_event_ids': [event.id for event in browse_events],
+            'storm_event_id': storm_event.id,
+            'export_event_id': export_event.id,
+        }
+
+def oversell_check(app, event_ids):
+    """Compare every event's booking counter with its stored bookings and capacity."""
+    from app.extensions import db
+    from app.models import Event, Booking
+
+    problems = []
+    with app.app_context():
+        for event_id in event_ids:
+            event = db.session.get(Event, event_id)
+            db.session.refresh(event)
+            stored = Booking.query.filter_by(event_id=event_id).count()
+            if stored > event.capacity or (event.bookings or 0) != stored:
+                problems.append({'event_id': event_id, 'capacity': event.capacity,
+                                 'counter': event.bookings, 'stored': stored})
+    return problems
+
+# Scenarios
+
+def _login(request):
+    status, _, _ = request('POST', '/login', {'username': ADMIN_USERNAME, 'password': ADMIN_PASSWORD})
+    if status != 302:
+        fail(f'admin login failed with status {status}')
+
+def _book(request, event_id, i):
+    status, location, size = request('POST', f'/event/{event_id}/book', {
+        'name': f'Gast {i}', 'email': f'storm{i}@example.com', 'phone': '0123456789'
+    })
+    if status == 302 and 'success=true' in location:
+        return 'booked', status, size
+    if status == 302 and urlparse(location).path == '/':
+        return 'sold_out', status, size
+    return 'error', status, size
+
+def _run(driver, threads, requests, action, admin=False):
+    """Call ``action(request, i)`` ``requests`` times from ``threads`` threads."""
+    local = threading.local()
+
+    def one(i):
+        if not hasattr(local, 'request'):
+            local.request = driver.client()
+            if admin:
+                _login(local.request)
+        started = time.perf_counter()
+        try:
+            outcome, status, size = action(local.request, i)
+        except Exception:
+            outcome, status, size = 'error', 'exception', 0
+        return outcome, status, size, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    outcomes = Counter(outcome for outcome, _, _, _ in results)
+    return {
+        'requests': requests,
+        'threads': threads,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(requests / elapsed, 1) if elapsed else None,
+        'errors': outcomes.pop('error', 0),
+        'outcomes': dict(outcomes),
+        'status_codes': dict(Counter(str(status) for _, status, _, _ in results)),
+        'bytes': sum(size for _, _, size, _ in results),
+        **latency_summary([latency for _, _, _, latency in results]),
+    }
+
+def _ok(status):
+    return status < 400
+
+def scenario_browse(driver, app, seeded, args):
+    def action(request, i):
+        status, _, size = request('GET', '/')
+        return ('ok' if _ok(status) else 'error'), status, size
+    return _run(driver, args.threads, args.requests, action)
+
+def scenario_storm(driver, app, seeded, args):
+    event_id = seeded['storm_event_id']
+    result = _run(driver, args.threads, args.storm_requests, lambda request, i: _book(request, event_id, i))
+    expected = min(args.storm_capacity, args.storm_requests)
+    result['capacity'] = args.storm_capacity
+    result['checks'] = {
+        'expected_bookings': expected,
+        'exact_bookings': result['outcomes'].get('booked', 0) == expected,
+        'oversold': oversell_check(app, [event_id]),
+    }
+    return result
+
+def scenario_export(driver, app, seeded, args):
+    event_id = seeded['export_event_id']
+
+    def action(request, i):
+        status, _, size = request('GET', f'/event/{event_id}/export?format={args.export_format}')
+        return ('ok' if status == 200 else 'error'), status, size
+    result = _run(driver, min(args.threads, args.export_requests), args.export_requests, action, admin=True)
+    result['rows'] = args.export_bookings
+    return result
+
+def scenario_mixed(driver, app, seeded, args):
+    event_ids = seeded['browse_event_ids']
+    rng = random.Random(42)
+    plan = rng.choices(['index', 'api', 'book', 'registrations'], weights=[70, 10, 15, 5], k=args.requests)
+    plan_events = [rng.choice(event_ids) for _ in plan]
+    anonymous_local = threading.local()
+
+    def action(request, i):
+        kind = plan[i]
+        if kind == 'book':
+            outcome, status, size = _book(request, plan_events[i], 100000 + i)
+            return ('error' if outcome == 'error' else kind), status, size
+        if kind == 'registrations':
+            status, _, size = request('GET', f'/event/{plan_events[i]}/registrations')
+        else:
+            # Visitors are anonymous; only the admin pages use the logged-in session
+            if not hasattr(anonymous_local, 'request'):
+                anonymous_local.request = driver.client()
+            path = '/' if kind == 'index' else '/events/?limit=20'
+            status, _, size = anonymous_local.request('GET', path)
+        return (kind if _ok(status) else 'error'), status, size
+
+    result = _run(driver, args.threads, args.requests, action, admin=True)
+    result['checks'] = {'oversold': oversell_check(app, event_ids)}
+    return result
+
+def _passed(result):
+    checks = result.get('checks', {})
+    return result['errors'] == 0 and not checks.get('oversold') and checks.get('exact_bookings', True)
+
+def compare(results, baseline_path):
+    """Relative change of throughput and latency against an earlier result file."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    deltas = {}
+    for name, result in results['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        deltas[name] = {
+            key: round(result[key] / before[key], 3)
+            for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms')
+            if result.get(key) and before.get(key)
+        }
+    return {'baseline': baseline_path, 'baseline_commit': baseline.get('commit'), 'ratios': deltas}
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma separated subset of ' + ', '.join(SCENARIOS))
+    parser.add_argument('--target', choices=('testclient', 'gunicorn'), default='testclient')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    parser.add_argument('--worker-threads', type=int, default=2, help='Threads per gunicorn worker')
+    parser.add_argument('--threads', type=int, default=16, help='Concurrent clients')
+    parser.add_argument('--requests', type=int, default=1000, help='Requests for browse and mixed')
+    parser.add_argument('--events', type=int, default=200, help='Visible events to seed')
+    parser.add_argument('--storm-requests', type=int, default=500)
+    parser.add_argument('--storm-capacity', type=int, default=100)
+    parser.add_argument('--export-bookings', type=int, default=20000)
+    parser.add_argument('--export-requests', type=int, default=10)
+    parser.add_argument('--export-format', choices=('xlsx', 'csv', 'ndjson'), default='csv')
+    parser.add_argument('--db', help='SQLite file to use (default: temporary file)')
+    parser.add_argument('--output', help='Also write the JSON results to this file')
+    parser.add_argument('--compare', help='Earlier result file to compare against')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    db_path = prepare_environment(args.db, ADMIN_NOTIFICATION_MODE='immediate')
+    os.environ.setdefault('METRICS_DB', os.path.join(os.path.dirname(db_path), 'metrics.db'))
+    app = create_benchmark_app()
+    seeded = seed(app, args.events, args.storm_capacity, args.export_bookings)
+
+    if args.target == 'gunicorn':
+        driver = GunicornDriver(args.workers, args.worker_threads)
+    else:
+        driver = TestClientDriver(app)
+
+    results = {
+        'commit': _git_commit(),
+        'target': args.target,
+        'workers': args.workers if args.target == 'gunicorn' else None,
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'scenarios': {},
+    }
+    runners = {'browse': scenario_browse, 'storm': scenario_storm, 'export': scenario_export, 'mixed': scenario_mixed}
+    try:
+        for name in scenarios:
+            result = runners[name](driver, app, seeded, args)
+            result['passed'] = _passed(result)
+            results['scenarios'][name] = result
+    finally:
+        driver.close()
+
+    if args.compare:
+        results['comparison'] = compare(results, args.compare)
+    emit(results, args.output)
+
+    failed = [name for name, result in results['scenarios'].items() if not result['passed']]
+    if failed:
+        fail(f"scenarios with errors or failed checks: {', '.join(failed)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Compare booking throughput with and without the SQLite tuning profile.
+
+Each profile gets a fresh database that several worker processes (like
+gunicorn workers) book into concurrently, each with a few threads.
+
+Usage:
+    python -m benchmarks.sqlite_profile --processes 4 --threads 2 --requests 400
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .common import prepare_environment, create_benchmark_app, latency_summary, emit
+
+def _setup(db_path, tuning, capacity):
+    prepare_environment(db_path, SQLITE_TUNING=tuning)
+    from .booking_contention import create_event
+    return create_event(create_benchmark_app(), capacity)
+
+def _worker(db_path, tuning, event_id, offset, count, threads, start_at):
+    prepare_environment(db_path, SQLITE_TUNING=tuning)
+    from .booking_contention import book_once
+    app = create_benchmark_app()
+
+    def book(i):
+        return book_once(app.test_client(), event_id, i)
+
+    # Wait until every process has imported the app, then start together
+    time.sleep(max(0.0, start_at - time.time()))
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        outcomes = list(pool.map(book, range(offset, offset + count)))
+    return outcomes, started, time.time()
+
+def run_profile(tuning, processes, threads, requests, warmup=5.0):
+    """Run one measurement in fresh spawned processes; the parent never imports the app."""
+    db_path = os.path.join(tempfile.mkdtemp(prefix='eventbocker-bench-'), 'data.db')
+    context = multiprocessing.get_context('spawn')
+
+    with context.Pool(1) as pool:
+        event_id = pool.apply(_setup, (db_path, tuning, requests))
+
+    per_process = requests // processes
+    start_at = time.time() + warmup
+    with context.Pool(processes) as pool:
+        results = pool.starmap(_worker, [
+            (db_path, tuning, event_id, n * per_process, per_process, threads, start_at)
+            for n in range(processes)
+        ])
+
+    outcomes = [outcome for chunk, _, _ in results for outcome in chunk]
+    elapsed = max(finished for _, _, finished in results) - min(started for _, started, _ in results)
+    booked = sum(1 for outcome, _ in outcomes if outcome == 'booked')
+    return {
+        'sqlite_tuning': tuning,
+        'processes': processes,
+        'threads': threads,
+        'requests': len(outcomes),
+        'booked': booked,
+        'errors': len(outcomes) - booked,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(outcomes) / elapsed, 1) if elapsed else None,
+        **latency_summary([latency for _, latency in outcomes]),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=2)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--warmup', type=float, default=5.0, help='Seconds allowed for workers to start')
+    parser.add_argument('--output', help='Also write the JSON results to this file')
+    args = parser.parse_args()
+
+    baseline = run_profile(False, args.processes, args.threads, args.requests, args.warmup)
+    tuned = run_profile(True, args.processes, args.threads, args.requests, args.warmup)
+    speedup = None
+    if baseline['throughput_rps'] and tuned['throughput_rps']:
+        speedup = round(tuned['throughput_rps'] / baseline['throughput_rps'], 2)
+    emit({'baseline': baseline, 'tuned': tuned, 'speedup': speedup}, args.output)
+
+if __name__ == '__main__':
+    main()
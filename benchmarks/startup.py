@@ -0,0 +1,85 @@
+"""Measure how long a fresh worker needs to import the app and serve its first request.
+
+Each run starts a new interpreter that imports ``wsgi`` (as gunicorn does)
+and sends one request to the index page. Reported per phase as the median
+over all runs, plus database connections opened during the import (must be
+zero) and which heavy optional modules the import already loaded.
+
+Usage:
+    python -m benchmarks.startup --runs 10 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from .common import prepare_environment, create_benchmark_app, emit, fail
+
+HEAVY_MODULES = ('openpyxl', 'mailjet_rest', 'requests')
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+connections = []
+event.listen(Pool, 'connect', lambda *args: connections.append(1))
+from wsgi import app
+imported = time.perf_counter()
+import_connections = len(connections)
+heavy = [name for name in %r if name in sys.modules]
+client = app.test_client()
+status = client.get('/').status_code
+first = time.perf_counter()
+client.get('/')
+second = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_request_ms': (first - imported) * 1000,
+    'second_request_ms': (second - first) * 1000,
+    'import_db_connections': import_connections,
+    'heavy_modules': heavy,
+    'status': status,
+}))
+""" % (HEAVY_MODULES,)
+
+def run_once(root):
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=root, env=dict(os.environ),
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help='Also write the JSON results to this file')
+    args = parser.parse_args()
+
+    # The schema is created once up front, like the entrypoint does before gunicorn starts
+    prepare_environment()
+    create_benchmark_app()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    runs = [run_once(root) for _ in range(args.runs)]
+    results = {'runs': args.runs}
+    for key in ('import_ms', 'first_request_ms', 'second_request_ms', 'process_ms'):
+        values = [run[key] for run in runs]
+        results[key] = round(statistics.median(values), 1)
+        results[key.replace('_ms', '_min_ms')] = round(min(values), 1)
+    results['startup_ms'] = round(results['import_ms'] + results['first_request_ms'], 1)
+    results['import_db_connections'] = max(run['import_db_connections'] for run in runs)
+    results['heavy_modules'] = sorted({name for run in runs for name in run['heavy_modules']})
+    results['statuses'] = sorted({run['status'] for run in runs})
+    emit(results, args.output)
+
+    if results['import_db_connections']:
+        fail(f"importing the app opened {results['import_db_connections']} database connection(s)")
+    if results['statuses'] != [200]:
+        fail(f"first request returned {results['statuses']}")
+
+if __name__ == '__main__':
+    main()
@@ -29,14 +29,34 @@ trap 'error_handler ${LINENO} $?' ERR
 handle_database() {
     log "Managing database using init_migrations.py..."
     python init_migrations.py
+    log "Indexing uploaded files..."
+    flask rescan-files
+}
+
+start_outbox_dispatcher() {
+    # Booking emails are only queued by the web workers; unless they run the
+    # in-process worker, one dispatcher next to gunicorn sends them
+    if [ "${EMAIL_OUTBOX_WORKER:-False}" = "True" ] || [ "${EMAIL_OUTBOX_WORKER:-False}" = "true" ]; then
+        log "Outbox is drained by the application workers"
+        return
+    fi
+    log "Starting email outbox dispatcher..."
+    (
+        while true; do
+            EMAIL_OUTBOX_WORKER=False flask dispatch-outbox --watch \
+                --interval "${EMAIL_OUTBOX_INTERVAL:-5}" || log "Outbox dispatcher exited, restarting in 5s"
+            sleep 5
+        done
+    ) &
 }
 
 start_production_server() {
+    start_outbox_dispatcher
     log "Starting production server with gunicorn..."
     exec gunicorn \
         --bind "0.0.0.0:${PORT:-5001}" \
         --workers 4 \
-        --threads 2 \
+        --threads "${GUNICORN_THREADS:-2}" \
         --timeout 60 \
         --access-logfile - \
         --error-logfile - \
@@ -4,27 +4,50 @@ Database Migration Manager
 
 This module handles database migrations, backups, and data restoration for the Flask application.
 It provides a robust way to:
-1. Backup existing database data
-2. Manage database schema migrations
-3. Restore data after migrations
+1. Apply pending Alembic revisions from migrations/versions incrementally
+2. Skip all work when the schema is already current
+3. Bring databases without a usable migration history (none, or a revision
+   outside the shipped chain) under version control, streaming a backup to
+   disk and restoring it with bulk inserts when needed
 4. Handle different environments (development, docker)
 """
 
 import os
 import sys
+import glob
+import gzip
 import shutil
 import logging
 import json
-from typing import Dict, Any, List, Optional
+import argparse
+from typing import Dict, Any, List
 from datetime import datetime
-from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from sqlalchemy import text
+from sqlalchemy import MetaData, Table, DateTime, Boolean, Integer, Float, inspect, select, func
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Output goes through the handler that create_app() installs on the root
+# logger (see app/utils/logging_setup.py); a handler of our own would print
+# every record twice
 logger = logging.getLogger(__name__)
+# Alembic's logging setup lowers the root level; keep this module's messages
+logger.setLevel(logging.DEBUG)
+
+# Rows fetched from the database and inserted per statement during backup/restore
+BATCH_SIZE = 1000
+
+# Number of backups kept in instance/backups
+KEEP_BACKUPS = 5
+
+# Backup format: one gzip NDJSON file per table plus a manifest
+BACKUP_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+GZIP_LEVEL = 6
+
+# Root of the revision chain shipped in migrations/versions. Revisions outside
+# this chain were generated by the former runner on every start (each with
+# down_revision = None) and are moved to migrations/stale_versions.
+BASE_REVISION = '0001'
+STALE_VERSIONS_DIR = 'stale_versions'
 
 class DatabaseConfig:
     """Configuration manager for database settings."""
@@ -47,137 +70,177 @@ class DatabaseConfig:
         os.environ['DATABASE_URL'] = self.db_uri
         logger.debug(f"Database URI: {self.db_uri}")
 
+def _type_name(column_type) -> str:
+    """Portable type tag stored in the backup header."""
+    if isinstance(column_type, DateTime):
+        return 'datetime'
+    if isinstance(column_type, Boolean):
+        return 'boolean'
+    if isinstance(column_type, Integer):
+        return 'integer'
+    if isinstance(column_type, Float):
+        return 'float'
+    return 'string'
+
 class DatabaseBackup:
-    """Handles database backup and restore operations."""
+    """
+    Streams database contents to disk.
+
+    A backup is a directory with one ``<table>.ndjson.gz`` file per table. The
+    first line of each file is a header with the column names and their types,
+    every following line is one row as a JSON array in header column order.
+    """
     
     def __init__(self, db: SQLAlchemy):
         self.db = db
     
-    def export_tables(self, tables: Optional[List[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
-        """Export data from specified tables or all tables if none specified."""
-        data = {}
-        if tables is None:
-            tables = self.db.metadata.tables.keys()
-        
-        for table in tables:
-            try:
-                result = self.db.session.execute(text(f'SELECT * FROM {table}')).fetchall()
-                data[table] = [dict(row._mapping) for row in result]
-                logger.info(f'Exported {len(data[table])} rows from {table}')
-            except Exception as e:
-                logger.error(f'Failed to export table {table}: {str(e)}')
-        
-        return data
+    def _tables(self, connection) -> List[Table]:
+        """Model tables present in the database, reflected with their actual columns."""
+        existing = set(inspect(connection).get_table_names())
+        return [Table(table.name, MetaData(), autoload_with=connection)
+                for table in self.db.metadata.sorted_tables if table.name in existing]
     
-    def save_to_file(self, data: Dict[str, List[Dict[str, Any]]], backup_path: str) -> None:
-        """Save backup data to a JSON file."""
-        try:
-            with open(backup_path, 'w') as f:
-                json.dump(data, f, default=str)
-            logger.info(f'Backup saved to {backup_path}')
-        except Exception as e:
-            logger.error(f'Failed to save backup: {str(e)}')
-            raise
+    def stream_to_dir(self, backup_dir: str) -> Dict[str, int]:
+        """Write every table to its own gzip NDJSON file, reading in batches."""
+        os.makedirs(backup_dir, exist_ok=True)
+        counts = {}
+        with self.db.engine.connect() as connection:
+            order = []
+            for table in self._tables(connection):
+                counts[table.name] = self._dump_table(connection, table, backup_dir)
+                order.append(table.name)
+                logger.info(f'Exported {counts[table.name]} rows from {table.name}')
+        with open(os.path.join(backup_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump({'format_version': BACKUP_FORMAT_VERSION, 'tables': order, 'rows': counts}, f)
+        logger.info(f'Backup saved to {backup_dir}')
+        return counts
     
-    def load_from_file(self, backup_path: str) -> Dict[str, Any]:
-        """Load backup data from a JSON file."""
-        try:
-            with open(backup_path, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f'Failed to load backup: {str(e)}')
-            raise
+    def _dump_table(self, connection, table: Table, backup_dir: str) -> int:
+        columns = list(table.columns)
+        header = {
+            'format_version': BACKUP_FORMAT_VERSION,
+            'table': table.name,
+            'columns': [{'name': column.name, 'type': _type_name(column.type)} for column in columns]
+        }
+        datetime_positions = [i for i, column in enumerate(columns) if isinstance(column.type, DateTime)]
+        
+        count = 0
+        path = os.path.join(backup_dir, f'{table.name}.ndjson.gz')
+        with gzip.open(path, 'wt', encoding='utf-8', compresslevel=GZIP_LEVEL) as f:
+            f.write(json.dumps(header) + '\n')
+            result = connection.execution_options(stream_results=True, yield_per=BATCH_SIZE).execute(
+                select(table).order_by(*table.primary_key.columns))
+            for partition in result.partitions():
+                lines = []
+                for row in partition:
+                    values = list(row)
+                    for i in datetime_positions:
+                        if values[i] is not None:
+                            values[i] = values[i].isoformat()
+                    lines.append(json.dumps(values))
+                f.write('\n'.join(lines) + '\n')
+                count += len(lines)
+        return count
 
 class DatabaseRestore:
-    """Handles database restoration process."""
+    """
+    Restores a backup written by ``DatabaseBackup`` with batched inserts.
+
+    Into empty tables rows keep their primary keys. Into tables that already
+    contain rows, new keys are allocated after the current maximum and the
+    old-to-new mapping is kept in memory to rewrite foreign keys of later
+    tables; users are matched by username.
+    """
     
     def __init__(self, db: SQLAlchemy):
-        from app.models.models import User, Event, Booking
         self.db = db
-        self.User = User
-        self.Event = Event
-        self.Booking = Booking
-    
-    def restore_data(self, data: Dict[str, Any]) -> None:
-        """Restore database from backup data with proper foreign key handling."""
-        try:
-            # Clear existing data
-            self._clear_tables()
-            
-            # Restore data with proper order
-            id_maps = self._restore_users(data)
-            id_maps.update(self._restore_events(data))
-            self._restore_bookings(data, id_maps)
-            
-            self.db.session.commit()
-            logger.info("Data restoration completed successfully")
-        except Exception as e:
-            logger.error(f"Error during restoration: {str(e)}")
-            self.db.session.rollback()
-            raise
     
-    def _clear_tables(self) -> None:
-        """Clear all tables in reverse dependency order."""
-        for table in reversed(self.db.metadata.sorted_tables):
-            self.db.session.execute(table.delete())
-    
-    def _restore_users(self, data: Dict[str, Any]) -> Dict[str, Dict[int, int]]:
-        """Restore user data and return ID mappings."""
-        id_maps = {'user': {}}
-        if 'user' not in data:
-            return id_maps
-        
-        for row in data['user']:
-            old_id = row.pop('id')
-            username = row.get('username')
-            existing_user = self.User.query.filter_by(username=username).first()
-            
-            if existing_user:
-                id_maps['user'][old_id] = existing_user.id
-                continue
-            
-            user = self.User(**row)
-            self.db.session.add(user)
-            self.db.session.flush()
-            id_maps['user'][old_id] = user.id
+    def _read(self, path: str):
+        """Return (header, iterator over rows as dicts with decoded values)."""
+        f = gzip.open(path, 'rt', encoding='utf-8')
+        header = json.loads(f.readline())
+        names = [column['name'] for column in header['columns']]
+        datetime_names = [column['name'] for column in header['columns'] if column['type'] == 'datetime']
         
-        return id_maps
+        def rows():
+            with f:
+                for line in f:
+                    row = dict(zip(names, json.loads(line)))
+                    for name in datetime_names:
+                        if row[name] is not None:
+                            row[name] = datetime.fromisoformat(row[name])
+                    yield row
+        return header, rows()
     
-    def _restore_events(self, data: Dict[str, Any]) -> Dict[str, Dict[int, int]]:
-        """Restore event data and return ID mappings."""
-        id_maps = {'event': {}}
-        if 'event' not in data:
-            return id_maps
+    def restore_from_dir(self, backup_dir: str) -> Dict[str, int]:
+        """Insert all rows of a backup into the current schema inside one transaction."""
+        with open(os.path.join(backup_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        tables = {table.name: table for table in self.db.metadata.sorted_tables}
+        id_maps: Dict[str, Dict[int, int]] = {}
+        counts = {}
         
-        for row in data['event']:
-            old_id = row.pop('id')
-            event = self.Event(**row)
-            self.db.session.add(event)
-            self.db.session.flush()
-            id_maps['event'][old_id] = event.id
-        
-        return id_maps
+        with self.db.engine.begin() as connection:
+            for name in manifest['tables']:
+                table = tables.get(name)
+                if table is None:
+                    logger.warning(f'Skipping table {name}, it no longer exists')
+                    continue
+                header, rows = self._read(os.path.join(backup_dir, f'{name}.ndjson.gz'))
+                counts[name] = self._restore_table(connection, table, rows, id_maps)
+                logger.info(f'Restored {counts[name]} rows into {name}')
+        return counts
     
-    def _restore_bookings(self, data: Dict[str, Any], id_maps: Dict[str, Dict[int, int]]) -> None:
-        """Restore booking data using ID mappings."""
-        if 'booking' not in data:
-            return
+    def _restore_table(self, connection, table: Table, rows, id_maps: Dict[str, Dict[int, int]]) -> int:
+        pk = table.c.id if 'id' in table.c else None
+        next_id = connection.execute(select(func.max(pk))).scalar() if pk is not None else None
+        remap = next_id is not None
+        id_map = id_maps.setdefault(table.name, {})
+        
+        existing_users = {}
+        if table.name == 'user' and remap:
+            existing_users = dict(connection.execute(select(table.c.username, table.c.id)).all())
         
-        for row in data['booking']:
-            old_id = row.pop('id')
-            if 'event_id' in row and row['event_id'] in id_maps['event']:
-                row['event_id'] = id_maps['event'][row['event_id']]
-            booking = self.Booking(**row)
-            self.db.session.add(booking)
+        foreign_keys = [(fk.parent.name, fk.column.table.name) for fk in table.foreign_keys]
+        count = 0
+        batch = []
+        for row in rows:
+            row = {key: value for key, value in row.items() if key in table.c}
+            for column, target in foreign_keys:
+                if row.get(column) is not None and row[column] in id_maps.get(target, {}):
+                    row[column] = id_maps[target][row[column]]
+            
+            if remap and pk is not None:
+                old_id = row.pop('id')
+                if table.name == 'user' and row.get('username') in existing_users:
+                    id_map[old_id] = existing_users[row['username']]
+                    continue
+                next_id += 1
+                row['id'] = next_id
+                id_map[old_id] = next_id
+            
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                connection.execute(table.insert(), batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            connection.execute(table.insert(), batch)
+            count += len(batch)
+        return count
 
 class MigrationManager:
     """Manages the database migration process."""
     
     def __init__(self):
+        # Configure the database location before the app reads its configuration
+        self.config = DatabaseConfig()
+        
         # Import app modules
         try:
             from app.models.models import db
             from app.app import create_app
+            from app.extensions import init_migrate
             self.db = db
             self.create_app = create_app
         except Exception as e:
@@ -185,51 +248,142 @@ class MigrationManager:
             raise
         
         # Initialize components
-        self.config = DatabaseConfig()
         self.app = self.create_app()
+        init_migrate(self.app)
+        self.migrations_dir = os.path.join(self.config.project_root, 'migrations')
+        self.backups_dir = os.path.join(self.config.instance_path, 'backups')
         self.backup = DatabaseBackup(self.db)
         self.restore = DatabaseRestore(self.db)
-        self.migrate = Migrate(self.app, self.db)
+    
+    def _load_script(self) -> None:
+        """Read the revisions and split them into the shipped chain and stale ones."""
+        from alembic.script import ScriptDirectory
+        config = self.app.extensions['migrate'].migrate.get_config(self.migrations_dir)
+        self.script = ScriptDirectory.from_config(config)
+        self.shipped = set()
+        for head in self.script.get_heads():
+            lineage = [rev.revision for rev in self.script.iterate_revisions(head, 'base')]
+            if BASE_REVISION in lineage:
+                self.shipped.update(lineage)
+    
+    def _set_aside_stale_revisions(self) -> bool:
+        """Move revisions outside the shipped chain out of migrations/versions."""
+        stale_dir = os.path.join(self.migrations_dir, STALE_VERSIONS_DIR)
+        moved = False
+        for rev in self.script.walk_revisions():
+            if rev.revision in self.shipped:
+                continue
+            try:
+                os.makedirs(stale_dir, exist_ok=True)
+                shutil.move(rev.path, os.path.join(stale_dir, os.path.basename(rev.path)))
+                logger.warning(f"Moved stale revision {rev.revision} to {stale_dir}")
+                moved = True
+            except OSError as e:
+                logger.warning(f"Could not move stale revision {rev.path}, ignoring it: {e}")
+        return moved
+    
+    def _heads(self) -> List[str]:
+        """Heads of the shipped revision chain."""
+        self._load_script()
+        if self._set_aside_stale_revisions():
+            self._load_script()
+        return [head for head in self.script.get_heads() if head in self.shipped]
+    
+    def _clear_version_table(self) -> None:
+        """Forget recorded revisions, e.g. a stale one, before stamping or upgrading from scratch."""
+        with self.db.engine.begin() as connection:
+            if 'alembic_version' in inspect(connection).get_table_names():
+                connection.exec_driver_sql('DELETE FROM alembic_version')
+    
+    def _state(self):
+        """Return (current revisions, application tables) of the database."""
+        from alembic.migration import MigrationContext
+        with self.db.engine.connect() as connection:
+            current = list(MigrationContext.configure(connection).get_current_heads())
+            tables = [name for name in inspect(connection).get_table_names() if name != 'alembic_version']
+        return current, tables
+    
+    def _schema_matches_models(self) -> bool:
+        """True if the database already has exactly the schema of the models."""
+        from alembic.migration import MigrationContext
+        from alembic.autogenerate import compare_metadata
+        from app.models.models import include_schema_name
+        with self.db.engine.connect() as connection:
+            context = MigrationContext.configure(connection, opts={'include_name': include_schema_name})
+            diff = compare_metadata(context, self.db.metadata)
+        # SQLite does not reflect unique constraint names reliably; ignore those
+        diff = [op for op in diff if not (isinstance(op, tuple) and op[0] in ('add_constraint', 'remove_constraint'))]
+        if diff:
+            logger.info(f"Schema differs from models in {len(diff)} places")
+            logger.debug(f"Schema differences: {diff}")
+        return not diff
+    
+    def _backup_to_disk(self) -> str:
+        path = os.path.join(self.backups_dir, f"backup-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+        self.backup.stream_to_dir(path)
+        for old in sorted(glob.glob(os.path.join(self.backups_dir, 'backup-*')))[:-KEEP_BACKUPS]:
+            shutil.rmtree(old, ignore_errors=True)
+        return path
+    
+    def _drop_everything(self) -> None:
+        from app.models.models import is_search_index_table
+        # Dropping the FTS5 table also removes its shadow tables
+        with self.db.engine.begin() as connection:
+            connection.exec_driver_sql('DROP TABLE IF EXISTS event_fts')
+        metadata = MetaData()
+        metadata.reflect(bind=self.db.engine, only=lambda name, _: not is_search_index_table(name))
+        metadata.drop_all(bind=self.db.engine)
+    
+    def status(self) -> Dict[str, Any]:
+        """Describe the migration state of the database."""
+        with self.app.app_context():
+            heads = self._heads()
+            current, tables = self._state()
+        return {'database': self.config.db_uri, 'current': current, 'heads': heads,
+                'up_to_date': set(current) == set(heads)}
     
     def run_migration(self) -> bool:
         """Execute the migration process."""
+        from flask_migrate import upgrade, stamp
         try:
             with self.app.app_context():
-                # Backup existing data
-                if os.path.exists(self.config.db_path):
-                    logger.info("Backing up existing data...")
-                    data = self.backup.export_tables()
-                else:
-                    data = None
+                heads = self._heads()
+                current, tables = self._state()
+                # Target the shipped head explicitly, stale revisions that could
+                # not be moved would otherwise make "head" ambiguous
+                target = heads[0] if len(heads) == 1 else 'heads'
                 
-                # Clean existing migrations
-                migrations_dir = 'migrations'
-                if os.path.exists(migrations_dir):
-                    logger.info("Cleaning existing migrations...")
-                    for root, dirs, files in os.walk(migrations_dir, topdown=False):
-                        for name in files:
-                            try:
-                                os.remove(os.path.join(root, name))
-                            except OSError as e:
-                                logger.warning(f"Could not remove file {name}: {e}")
-                        for name in dirs:
-                            try:
-                                os.rmdir(os.path.join(root, name))
-                            except OSError as e:
-                                logger.warning(f"Could not remove directory {name}: {e}")
+                if not tables:
+                    logger.info("Empty database, creating schema from migrations...")
+                    self._clear_version_table()
+                    upgrade(directory=self.migrations_dir, revision=target)
+                elif set(current) == set(heads):
+                    logger.info(f"Schema is up to date ({', '.join(heads)}), nothing to do")
+                elif current and all(rev in self.shipped for rev in current):
+                    backup_path = self._backup_to_disk()
+                    logger.info(f"Applying pending migrations {', '.join(current)} -> {', '.join(heads)} "
+                                f"(backup at {backup_path})")
+                    upgrade(directory=self.migrations_dir, revision=target)
+                elif self._schema_matches_models():
+                    logger.info("Schema matches the models but has no migration history, stamping head")
+                    self._clear_version_table()
+                    stamp(directory=self.migrations_dir, revision=target)
                 else:
-                    os.makedirs(migrations_dir, exist_ok=True)
+                    logger.info("Database has no usable migration history, rebuilding schema...")
+                    backup_path = self._backup_to_disk()
+                    self.db.session.remove()
+                    self._drop_everything()
+                    upgrade(directory=self.migrations_dir, revision=target)
+                    logger.info("Restoring data from backup...")
+                    self.restore.restore_from_dir(backup_path)
                 
-                # Initialize new migrations
-                logger.info("Initializing migrations...")
-                self._run_flask_command('db init')
-                self._run_flask_command('db migrate -m "migration"')
-                self._run_flask_command('db upgrade')
+                # Databases stamped without running the revisions lack the search index
+                from app.models.models import create_event_search_index
+                with self.db.engine.begin() as connection:
+                    create_event_search_index(connection)
                 
-                # Restore data if we had a backup
-                if data:
-                    logger.info("Restoring data from backup...")
-                    self.restore.restore_data(data)
+                from app.database import ensure_admin_user
+                ensure_admin_user()
                 
                 logger.info("Migration completed successfully")
                 return True
@@ -238,24 +392,16 @@ class MigrationManager:
             logger.error(f"Migration failed: {str(e)}", exc_info=True)
             return False
 
-    def _run_flask_command(self, command: str) -> bool:
-        """Run a Flask CLI command."""
-        try:
-            with self.app.app_context():
-                if command.startswith('db '):
-                    from flask.cli import ScriptInfo
-                    from flask_migrate.cli import db
-                    info = ScriptInfo(create_app=lambda info: self.app)
-                    args = command.split()[1:]
-                    db.main(args=args, obj=info)
-                return True
-        except Exception as e:
-            logger.error(f"Failed to run command '{command}': {str(e)}")
-            return False
-
 def main():
     """Main entry point for database migration."""
+    parser = argparse.ArgumentParser(description='Apply database migrations.')
+    parser.add_argument('--status', action='store_true', help='Only show the current and head revisions')
+    args = parser.parse_args()
+    
     manager = MigrationManager()
+    if args.status:
+        print(json.dumps(manager.status(), indent=2))
+        sys.exit(0)
     success = manager.run_migration()
     sys.exit(0 if success else 1)
 
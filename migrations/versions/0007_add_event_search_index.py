@@ -0,0 +1,52 @@
+"""add event search index
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 04:05:11.630482
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+# FTS5 table over the event text columns, synced by triggers (see
+# EVENT_SEARCH_DDL in app/models/models.py). Batch migrations that recreate
+# the event table drop these triggers and must create them again.
+def upgrade():
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS event_fts USING fts5("
+        "title, description, room, address, content='event', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS event_fts_ai AFTER INSERT ON event BEGIN "
+        "INSERT INTO event_fts (rowid, title, description, room, address) "
+        "VALUES (new.id, new.title, new.description, new.room, new.address); END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS event_fts_ad AFTER DELETE ON event BEGIN "
+        "INSERT INTO event_fts (event_fts, rowid, title, description, room, address) "
+        "VALUES ('delete', old.id, old.title, old.description, old.room, old.address); END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS event_fts_au AFTER UPDATE OF title, description, room, address ON event BEGIN "
+        "INSERT INTO event_fts (event_fts, rowid, title, description, room, address) "
+        "VALUES ('delete', old.id, old.title, old.description, old.room, old.address); "
+        "INSERT INTO event_fts (rowid, title, description, room, address) "
+        "VALUES (new.id, new.title, new.description, new.room, new.address); END"
+    )
+    op.execute("INSERT INTO event_fts (event_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS event_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS event_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS event_fts_ai")
+    op.execute("DROP TABLE IF EXISTS event_fts")
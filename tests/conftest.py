@@ -0,0 +1,52 @@
+"""Shared fixtures: one application on a scratch SQLite database per test run.
+
+The configuration is read when ``app.config`` is imported, so the environment
+is set up here before anything from ``app`` is imported.
+"""
+import os
+import tempfile
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix='eventbocker-tests-')
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(_TMP, 'data.db')}",
+    'ARCHIVE_DATABASE_URL': f"sqlite:///{os.path.join(_TMP, 'archive.db')}",
+    'MAILJET_BACKEND': 'fake',
+    'MAIL_USERNAME': 'test@example.com',
+    'ADMIN_EMAIL': 'admin@example.com',
+    'EMAIL_OUTBOX_WORKER': 'False',
+    'DISABLE_EMAILS': 'False',
+    'LOG_LEVEL': 'WARNING',
+})
+
+from app import create_app
+from app.database import init_database, ensure_admin_user
+from app.extensions import db
+
+@pytest.fixture(scope='session')
+def _app():
+    app = create_app()
+    app.config['TESTING'] = True
+    # Keep version files, metrics and uploads out of the checkout's instance folder
+    app.instance_path = os.path.join(_TMP, 'instance')
+    app.config['UPLOAD_FOLDER'] = os.path.join(app.instance_path, 'uploads')
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    with app.app_context():
+        init_database()
+    return app
+
+@pytest.fixture
+def app(_app):
+    """The application inside an app context; all rows are removed afterwards."""
+    from app.utils.email import EmailService
+
+    EmailService._instance = None
+    with _app.app_context():
+        yield _app
+        db.session.remove()
+        with db.engine.begin() as connection:
+            for table in reversed(db.metadata.sorted_tables):
+                connection.execute(table.delete())
+            connection.exec_driver_sql("INSERT INTO event_fts(event_fts) VALUES('rebuild')")
+        ensure_admin_user()
+    EmailService._instance = None
@@ -0,0 +1,59 @@
+"""Waiting room of events with an admission limit."""
+import threading
+import pytest
+from app.utils import admission
+
+EVENT_ID = 1
+LIMIT = 3
+
+@pytest.fixture
+def tickets_db(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'ADMISSION_DB', str(tmp_path / 'admission.db'))
+    return app
+
+def _states(tokens):
+    return [admission.ticket_status(token)['state'] for token in tokens]
+
+def test_admits_at_most_the_limit_in_ticket_order(tickets_db):
+    tokens = []
+    for _ in range(10):
+        tokens.append(admission.join(EVENT_ID, LIMIT))
+        assert admission.active_admissions(EVENT_ID) <= LIMIT
+
+    assert _states(tokens) == ['admitted'] * LIMIT + ['waiting'] * 7
+    assert [admission.ticket_status(token)['position'] for token in tokens[LIMIT:]] == list(range(1, 8))
+
+    for done, token in enumerate(tokens):
+        admission.finish(token)
+        assert admission.active_admissions(EVENT_ID) <= LIMIT
+        expected = ['done'] * (done + 1) + ['admitted'] * min(LIMIT, len(tokens) - done - 1)
+        expected += ['waiting'] * (len(tokens) - len(expected))
+        assert _states(tokens) == expected
+
+def test_concurrent_joins_never_exceed_the_limit(tickets_db):
+    app = tickets_db
+    tokens, peaks, errors = [], [], []
+    lock = threading.Lock()
+
+    def visitor():
+        try:
+            with app.app_context():
+                token = admission.join(EVENT_ID, LIMIT)
+                admission.ticket_status(token)
+                active = admission.active_admissions(EVENT_ID)
+                with lock:
+                    tokens.append(token)
+                    peaks.append(active)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=visitor) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert max(peaks) <= LIMIT
+    assert admission.active_admissions(EVENT_ID) == LIMIT
+    assert _states(tokens).count('admitted') == LIMIT
@@ -0,0 +1,8 @@
+"""Settings from config.json."""
+from app.config import Config, apply_json_config, json_config
+
+def test_config_class_uses_the_json_mapping():
+    settings = {}
+    apply_json_config(settings, json_config)
+    assert settings
+    assert {name: getattr(Config, name) for name in settings} == settings
@@ -0,0 +1,10 @@
+"""SQLite connection profile."""
+from app.extensions import db
+
+def test_sqlite_profile_applies_to_every_bind(app):
+    for bind_key, engine in db.engines.items():
+        with engine.connect() as connection:
+            busy_timeout = connection.exec_driver_sql('PRAGMA busy_timeout').scalar()
+            journal_mode = connection.exec_driver_sql('PRAGMA journal_mode').scalar()
+        assert busy_timeout == app.config['SQLITE_BUSY_TIMEOUT'], bind_key
+        assert journal_mode == app.config['SQLITE_JOURNAL_MODE'].lower(), bind_key
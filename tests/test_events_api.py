@@ -0,0 +1,46 @@
+"""Conditional GET on the JSON event listing."""
+import time
+from datetime import datetime, timedelta, timezone
+from app.extensions import db
+from app.models import Event
+
+def _event(title, days):
+    event = Event(title=title, date=datetime.now(timezone.utc) + timedelta(days=days), capacity=10, price=0)
+    db.session.add(event)
+    return event
+
+def _wait_for_next_second():
+    # HTTP dates have a resolution of one second
+    time.sleep(1.05 - time.time() % 1)
+
+def test_if_modified_since_alone_sees_deleted_events(app, client):
+    first, second = _event('Konzert', 2), _event('Lesung', 3)
+    db.session.commit()
+    response = client.get('/events/')
+    assert len(response.json['events']) == 2
+    last_modified = response.headers['Last-Modified']
+    assert client.get('/events/', headers={'If-Modified-Since': last_modified}).status_code == 304
+
+    _wait_for_next_second()
+    db.session.delete(second)
+    db.session.commit()
+
+    response = client.get('/events/', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 200
+    assert [event['title'] for event in response.json['events']] == ['Konzert']
+
+def test_if_modified_since_alone_sees_started_events(app, client):
+    _event('Konzert', 2)
+    db.session.add(Event(title='Lesung', date=datetime.now().astimezone() + timedelta(seconds=1.5),
+                         capacity=10, price=0))
+    db.session.commit()
+    response = client.get('/events/')
+    assert len(response.json['events']) == 2
+    last_modified = response.headers['Last-Modified']
+
+    # The event starts without any write to the database
+    time.sleep(2)
+
+    response = client.get('/events/', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 200
+    assert [event['title'] for event in response.json['events']] == ['Konzert']
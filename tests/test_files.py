@@ -0,0 +1,32 @@
+"""Keyset pagination of the file list."""
+import re
+from datetime import datetime, timedelta, timezone
+from app.extensions import db
+from app.models import StoredFile
+
+def _names(response):
+    return re.findall(r'<td>(datei-\d+\.txt)</td>', response.get_data(as_text=True))
+
+def _link(response, direction):
+    match = re.search(rf'href="(/files\?{direction}=[^"]+)"', response.get_data(as_text=True))
+    return match.group(1) if match else None
+
+def test_file_list_pages_forward_and_back(app, client):
+    app.config['FILES_PER_PAGE'] = 2
+    base = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    # Two files share each timestamp, so pages must break ties on the id
+    for i in range(5):
+        db.session.add(StoredFile(name=f'datei-{i}.txt', size=1, modified_at=base + timedelta(minutes=i // 2)))
+    db.session.commit()
+
+    pages = [client.get('/files')]
+    while _link(pages[-1], 'after'):
+        pages.append(client.get(_link(pages[-1], 'after')))
+    assert [_names(page) for page in pages] == [
+        ['datei-4.txt', 'datei-3.txt'], ['datei-2.txt', 'datei-1.txt'], ['datei-0.txt']
+    ]
+    assert _link(pages[0], 'before') is None
+
+    back = client.get(_link(pages[-1], 'before'))
+    assert _names(back) == _names(pages[1])
+    assert _names(client.get(_link(back, 'before'))) == _names(pages[0])
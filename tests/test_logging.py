@@ -0,0 +1,31 @@
+"""Logging setup shared by the app and init_migrations.py."""
+import logging
+import os
+import subprocess
+import sys
+from flask import Flask
+from app.utils.logging_setup import configure_logging
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_root_logger_follows_log_level(app):
+    root = logging.getLogger()
+    previous = root.level
+    other = Flask('other')
+    other.config['LOG_LEVEL'] = 'INFO'
+    try:
+        configure_logging(other)
+        assert root.level == logging.INFO
+        assert logging.getLogger('werkzeug').isEnabledFor(logging.INFO)
+    finally:
+        root.setLevel(previous)
+
+def test_init_migrations_logs_through_the_queue_only():
+    # init_migrations.py is imported before it creates the app, as in production
+    script = ('import logging, init_migrations\n'
+              'from app.app import create_app\n'
+              'create_app()\n'
+              'print(len(logging.getLogger().handlers))\n')
+    result = subprocess.run([sys.executable, '-c', script], cwd=PROJECT_ROOT,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == '1'
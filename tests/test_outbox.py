@@ -0,0 +1,112 @@
+"""Booking emails go through the outbox: queued with the booking, sent by the dispatcher."""
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from app.extensions import db
+from app.models import Event, Booking, EmailOutbox
+from app.utils import metrics, outbox
+from app.utils.email import EmailService, enqueue_email
+
+def _fake_client():
+    return EmailService.get_instance().client
+
+def _clock(monkeypatch, when):
+    """Let the dispatcher run at ``when``."""
+    monkeypatch.setattr(outbox, 'get_utc_now', lambda: when)
+
+def _queue(subject='Hallo'):
+    entry = enqueue_email(subject, ['gast@example.com'], 'Text', '<p>HTML</p>')
+    db.session.commit()
+    return entry.id
+
+def test_booking_commits_emails_with_the_booking(app, client):
+    event = Event(title='Lesung', date=datetime.now(timezone.utc) + timedelta(days=3), capacity=5, price=0)
+    db.session.add(event)
+    db.session.commit()
+
+    response = client.post(f'/event/{event.id}/book',
+                           data={'name': 'Gast', 'email': 'gast@example.com', 'phone': '0401234'})
+
+    assert response.status_code == 302
+    assert Booking.query.count() == 1
+    entries = EmailOutbox.query.all()
+    assert len(entries) == 2
+    assert {entry.status for entry in entries} == {'pending'}
+    assert _fake_client().messages == []
+
+    stats = outbox.dispatch_pending()
+
+    assert stats['sent'] == 2
+    assert {entry.status for entry in EmailOutbox.query} == {'sent'}
+    recipients = {message['To'][0]['Email'] for message in _fake_client().messages}
+    assert recipients == {'gast@example.com', 'admin@example.com'}
+
+def test_failed_send_is_retried_after_backoff(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'EMAIL_OUTBOX_BACKOFF_SECONDS', 30)
+    entry_id = _queue()
+    now = datetime.now(timezone.utc)
+    _fake_client().fail_next = 1
+
+    _clock(monkeypatch, now)
+    assert outbox.dispatch_pending()['retried'] == 1
+    entry = db.session.get(EmailOutbox, entry_id)
+    assert (entry.status, entry.attempts) == ('pending', 1)
+    assert 'Fake Mailjet failure' in entry.last_error
+
+    # Still backing off
+    _clock(monkeypatch, now + timedelta(seconds=10))
+    assert outbox.dispatch_pending()['sent'] == 0
+
+    _clock(monkeypatch, now + timedelta(seconds=31))
+    assert outbox.dispatch_pending()['sent'] == 1
+    db.session.refresh(entry)
+    assert entry.status == 'sent' and entry.last_error is None
+    assert len(_fake_client().messages) == 1
+
+def test_entry_fails_permanently_after_max_attempts(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 2)
+    entry_id = _queue()
+    now = datetime.now(timezone.utc)
+    _fake_client().fail_next = 5
+
+    _clock(monkeypatch, now)
+    assert outbox.dispatch_pending()['retried'] == 1
+    _clock(monkeypatch, now + timedelta(hours=2))
+    assert outbox.dispatch_pending()['failed'] == 1
+
+    entry = db.session.get(EmailOutbox, entry_id)
+    assert (entry.status, entry.attempts) == ('failed', 2)
+    _clock(monkeypatch, now + timedelta(days=1))
+    assert outbox.dispatch_pending() == {'sent': 0, 'retried': 0, 'failed': 0, 'digests': 0}
+
+def test_claimed_entry_is_reclaimed_after_lease_expiry(app, monkeypatch):
+    entry_id = _queue()
+    now = datetime.now(timezone.utc)
+    # A dispatcher claimed the entry and died before sending it
+    assert outbox._claim([entry_id], now) == [entry_id]
+
+    _clock(monkeypatch, now + timedelta(seconds=1))
+    assert outbox.dispatch_pending()['sent'] == 0
+
+    _clock(monkeypatch, now + outbox.CLAIM_LEASE + timedelta(seconds=1))
+    assert outbox.dispatch_pending()['sent'] == 1
+    assert db.session.get(EmailOutbox, entry_id).status == 'sent'
+    assert len(_fake_client().messages) == 1
+
+def _flushed_messages(app):
+    connection = sqlite3.connect(metrics._db_path(app))
+    try:
+        row = connection.execute("SELECT value FROM metric WHERE name = 'eventbocker_email_messages_total'").fetchone()
+    finally:
+        connection.close()
+    return row[0] if row else 0
+
+def test_dispatch_command_flushes_email_metrics(app):
+    metrics.flush(app)
+    before = _flushed_messages(app)
+    _queue()
+
+    result = app.test_cli_runner().invoke(args=['dispatch-outbox'])
+
+    assert result.exit_code == 0, result.output
+    assert 'Sent: 1' in result.output
+    assert _flushed_messages(app) == before + 1
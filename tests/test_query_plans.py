@@ -0,0 +1,6 @@
+"""The hot queries must be answered from indexes."""
+from app.utils.query_plans import check_query_plans
+
+def test_hot_queries_use_indexes(app):
+    full_scans = {name: plan for name, plan, full_scan in check_query_plans() if full_scan}
+    assert full_scans == {}
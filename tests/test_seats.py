@@ -0,0 +1,24 @@
+"""Polling the live seat counts."""
+import time
+from datetime import datetime, timedelta, timezone
+from app.extensions import db
+from app.models import Event
+from app.utils import seat_updates
+
+def test_seats_etag_depends_only_on_the_counts(app, client):
+    event = Event(title='Lesung', date=datetime.now(timezone.utc) + timedelta(days=3), capacity=5, price=0)
+    db.session.add(event)
+    db.session.commit()
+    seat_updates.notify()
+
+    deadline = time.monotonic() + 5
+    response = client.get('/events/seats')
+    while response.json['seats'] != {str(event.id): 5} and time.monotonic() < deadline:
+        time.sleep(0.1)
+        response = client.get('/events/seats')
+    assert response.json['seats'] == {str(event.id): 5}
+
+    # Another worker with the same counts computes the same tag
+    etag = response.headers['ETag'].strip('"')
+    assert etag == seat_updates.snapshot_tag({event.id: 5})
+    assert client.get('/events/seats', headers={'If-None-Match': f'"{etag}"'}).status_code == 304